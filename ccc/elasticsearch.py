@@ -13,10 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
 import datetime
 import functools
 import os
 import json
+import threading
+import time
 
 import elasticsearch
 
@@ -88,6 +91,50 @@ def _metadata_dict():
     return meta_dict
 
 
+@functools.lru_cache()
+def _metadata_json():
+    return json.dumps(_metadata_dict())
+
+
+def _inject_metadata(document_json: str):
+    '''
+    adds the `cc_meta` attribute to the given serialised document (w/o parsing it)
+    '''
+    if '"cc_meta"' in document_json:
+        # replace existing attribute (rare - fall back to parsing)
+        document = json.loads(document_json)
+        document['cc_meta'] = _metadata_dict()
+        return json.dumps(document)
+
+    document_json = document_json.rstrip()
+    if document_json == '{}':
+        return '{"cc_meta": ' + _metadata_json() + '}'
+    return document_json[:-1] + ', "cc_meta": ' + _metadata_json() + '}'
+
+
+def _inject_metadata_into_bulk_body(body: str):
+    '''
+    adds the `cc_meta` attribute to all documents to be indexed in the given bulk request body.
+    Only action lines are parsed; documents are patched as text.
+    '''
+    lines = []
+    expect_source = False
+    inject_into_source = False
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        if expect_source:
+            lines.append(_inject_metadata(line) if inject_into_source else line)
+            expect_source = False
+            continue
+        action = next(iter(json.loads(line)))
+        # all actions but delete are followed by a source line (update: partial document)
+        expect_source = action != 'delete'
+        inject_into_source = action in ('index', 'create')
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
 class ElasticSearchClient(object):
     def __init__(
         self,
@@ -135,19 +182,196 @@ class ElasticSearchClient(object):
         util.check_type(body, str)
 
         if inject_metadata and _metadata_dict():
-            def inject_meta(line):
-                parsed = json.loads(line)
-                if 'index' not in parsed:
-                    parsed['cc_meta'] = md
-                    return json.dumps(parsed)
-                return line
-
-            md = _metadata_dict()
-            patched_body = '\n'.join([inject_meta(line) for line in body.splitlines()])
-            body = patched_body
+            body = _inject_metadata_into_bulk_body(body)
 
         return self._api.bulk(
             body=body,
             *args,
             **kwargs,
         )
+
+    def bulk_indexer(self, index: str, **kwargs) -> 'BulkIndexer':
+        return BulkIndexer(elasticsearch_client=self, index=index, **kwargs)
+
+
+class BulkIndexer(object):
+    '''
+    buffers documents and stores them using bulk requests.
+
+    Documents are serialised once when added (`cc_meta` is injected into the serialised form).
+    Buffered documents are sent from a background thread once `max_documents` or `max_bytes`
+    is reached, and every `flush_interval_seconds` otherwise. Documents rejected in the bulk
+    response with a retryable status (e.g. 429 - too many requests) are retried with exponential
+    backoff, up to `max_attempts` times. Remaining documents are flushed upon `close` (which is
+    also done before the interpreter exits).
+
+    Example:
+        indexer = elasticsearch_client.bulk_indexer(index='build_metrics')
+        for metric in metrics:
+            indexer.add(metric)
+        indexer.close()
+    '''
+    RETRYABLE_STATUS_CODES = (429, 502, 503, 504)
+
+    def __init__(
+        self,
+        elasticsearch_client: ElasticSearchClient,
+        index: str,
+        inject_metadata: bool=True,
+        max_documents: int=1000,
+        max_bytes: int=5 * 1024 * 1024,
+        flush_interval_seconds: float=5,
+        max_attempts: int=3,
+        retry_backoff_seconds: float=1,
+    ):
+        self._client = util.not_none(elasticsearch_client)
+        self.index = util.not_empty(index)
+        self.inject_metadata = inject_metadata
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+        self._action_lines = {} # index: serialised action
+        self._buffer = [] # [(action line, source line)]
+        self._buffered_bytes = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._flush_thread = None
+        self._closed = False
+
+        self.indexed_count = 0
+        self.failed_count = 0
+
+    def _action_line(self, index: str):
+        action_line = self._action_lines.get(index)
+        if not action_line:
+            action_line = json.dumps({'index': {'_index': index, '_type': '_doc'}})
+            self._action_lines[index] = action_line
+        return action_line
+
+    def add(self, document: dict, index: str=None):
+        '''
+        adds the given document to the buffer (to be stored in the given index, defaulting to
+        the indexer's index)
+        '''
+        util.check_type(document, dict)
+        source_line = json.dumps(document)
+        if self.inject_metadata and _metadata_dict():
+            source_line = _inject_metadata(source_line)
+        item = (self._action_line(index or self.index), source_line)
+        item_size = len(item[0]) + len(item[1]) + 2
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('bulk indexer was closed')
+            self._buffer.append(item)
+            self._buffered_bytes += item_size
+            buffer_full = len(self._buffer) >= self.max_documents or \
+                self._buffered_bytes >= self.max_bytes
+            # producers outrun the background thread - flush synchronously (backpressure)
+            buffer_overflown = self._buffered_bytes >= 2 * self.max_bytes
+            if not self._flush_thread:
+                self._flush_thread = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flush_thread.start()
+                atexit.register(self.close)
+
+        if buffer_overflown:
+            self.flush()
+        elif buffer_full:
+            self._flush_requested.set()
+
+    def flush(self):
+        '''
+        stores all buffered documents (blocks until done)
+        '''
+        with self._flush_lock:
+            with self._lock:
+                items = self._buffer
+                self._buffer = []
+                self._buffered_bytes = 0
+            for batch in self._batches(items):
+                self._store(batch)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._flush_requested.set()
+        if self._flush_thread:
+            self._flush_thread.join()
+            atexit.unregister(self.close)
+        self.flush()
+
+    def _flush_periodically(self):
+        while not self._closed:
+            self._flush_requested.wait(timeout=self.flush_interval_seconds)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                util.warning('failed to store documents in index {i}: {e}'.format(
+                    i=self.index,
+                    e=e,
+                ))
+
+    def _batches(self, items):
+        batch = []
+        batch_bytes = 0
+        for item in items:
+            item_size = len(item[0]) + len(item[1]) + 2
+            if batch and (
+                len(batch) >= self.max_documents or batch_bytes + item_size > self.max_bytes
+            ):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append(item)
+            batch_bytes += item_size
+        if batch:
+            yield batch
+
+    def _store(self, items):
+        for attempt in range(1, self.max_attempts + 1):
+            body = ''.join(action + '\n' + source + '\n' for action, source in items)
+            try:
+                response = self._client._api.bulk(body=body)
+            except elasticsearch.TransportError as e:
+                if attempt == self.max_attempts:
+                    self._count(failed=len(items))
+                    util.warning('failed to store {n} documents: {e}'.format(n=len(items), e=e))
+                    return
+                self._sleep(self.retry_backoff_seconds * 2 ** (attempt - 1))
+                continue
+
+            if not response.get('errors'):
+                self._count(indexed=len(items))
+                return
+
+            retry_items = []
+            indexed = failed = 0
+            for item, result in zip(items, response['items']):
+                status = next(iter(result.values())).get('status', 500)
+                if status < 300:
+                    indexed += 1
+                elif status in self.RETRYABLE_STATUS_CODES and attempt < self.max_attempts:
+                    retry_items.append(item)
+                else:
+                    failed += 1
+                    util.warning('failed to store document: {r}'.format(r=result))
+            self._count(indexed=indexed, failed=failed)
+            if not retry_items:
+                return
+            items = retry_items
+            self._sleep(self.retry_backoff_seconds * 2 ** (attempt - 1))
+
+    def _count(self, indexed: int=0, failed: int=0):
+        with self._lock:
+            self.indexed_count += indexed
+            self.failed_count += failed
+
+    def _sleep(self, seconds: float):
+        time.sleep(seconds)
@@ -35,7 +35,8 @@ def assign_github_team_to_repo(
     github_cfg_name: str,
     github_org_name: str,
     auth_token: CliHint(help="Token from an org admin user. Token must have 'admin:org' scope"),
-    team_name: str='ci'
+    team_name: str='ci',
+    dry_run: bool=False,
 ):
     '''
     Assign team 'team_name' to all repositories in organization 'github_org_name' and
@@ -44,6 +45,8 @@ def assign_github_team_to_repo(
     The token of the technical github user must have the privilege to create webhooks
     (scope admin:repo_hook)
     'auth_token'  must grant 'admin:org' privileges.
+    If 'dry_run' is set, no changes are made; the repositories the team would be assigned to
+    are reported instead.
     '''
     cfg_factory = ctx().cfg_factory()
     github_cfg = cfg_factory.github(github_cfg_name)
@@ -56,23 +59,25 @@ def assign_github_team_to_repo(
         github_cfg=github_cfg,
     )
 
-    _create_team(
-        github=github,
-        organization_name=github_org_name,
-        team_name=team_name
-    )
+    if not dry_run:
+        _create_team(
+            github=github,
+            organization_name=github_org_name,
+            team_name=team_name
+        )
 
-    _add_user_to_team(
-        github=github,
-        organization_name=github_org_name,
-        team_name=team_name,
-        user_name=github_username
-    )
+        _add_user_to_team(
+            github=github,
+            organization_name=github_org_name,
+            team_name=team_name,
+            user_name=github_username
+        )
 
     _add_all_repos_to_team(
         github=github,
         organization_name=github_org_name,
-        team_name=team_name
+        team_name=team_name,
+        dry_run=dry_run,
     )
 
 
@@ -82,7 +87,8 @@ def generate_release_notes_cli(
     github_repository_owner: str,
     github_repository_name: str,
     repository_branch: str,
-    commit_range: str=None
+    commit_range: str=None,
+    cache_file: str=None,
 ):
     github_cfg = ctx().cfg_factory().github(github_cfg_name)
 
@@ -105,7 +111,8 @@ def generate_release_notes_cli(
         github_helper=helper,
         git_helper=git_helper,
         repository_branch=repository_branch,
-        commit_range=commit_range
+        commit_range=commit_range,
+        cache_file=cache_file,
     ).to_markdown()
 
 
@@ -115,7 +122,8 @@ def release_note_blocks_cli(
     github_repository_owner: str,
     github_repository_name: str,
     repository_branch: str=None,
-    commit_range: str=None
+    commit_range: str=None,
+    cache_file: str=None,
 ):
     github_cfg = ctx().cfg_factory().github(github_cfg_name)
 
@@ -138,5 +146,6 @@ def release_note_blocks_cli(
         github_helper=helper,
         git_helper=git_helper,
         repository_branch=repository_branch,
-        commit_range=commit_range
+        commit_range=commit_range,
+        cache_file=cache_file,
     ).release_note_blocks()
@@ -46,6 +46,9 @@ def upload_product_images(
     cve_threshold: int=7,
     ignore_if_triaged: bool=True,
     reference_group_ids: [int]=[],
+    vulnerability_report_file: CliHint(
+        help='optional file to write all vulnerabilities to (.json or .csv)',
+    )=None,
 ):
     cfg_factory = ctx().cfg_factory()
     protecode_cfg = cfg_factory.protecode(protecode_cfg_name)
@@ -63,6 +66,7 @@ def upload_product_images(
         ignore_if_triaged=ignore_if_triaged,
         processing_mode=processing_mode,
         reference_group_ids=reference_group_ids,
+        vulnerability_report_file=vulnerability_report_file,
     )
 
 
@@ -231,11 +235,13 @@ def retrieve_component_descriptor(
 
 def resolve_component_descriptor(
     component_descriptor_file: CliHints.existing_file(),
+    cache_dir: CliHint(help='directory to cache retrieved component descriptors in')=None,
 ):
     cfg_factory = ctx().cfg_factory()
 
     resolver = ComponentDescriptorResolver(
         cfg_factory=cfg_factory,
+        cache_dir=cache_dir,
     )
 
     with open(component_descriptor_file) as f:
@@ -165,6 +165,7 @@ class PipelineStep(ModelBase):
         self._script_type = script_type
         self._outputs_dict = {}
         self._inputs_dict = {}
+        self._caches_dict = {}
         self._publish_to_dict = {}
         super().__init__(*args, **kwargs)
 
@@ -267,6 +268,24 @@ class PipelineStep(ModelBase):
             raise ValueError('input already exists: ' + str(name))
         self._inputs_dict[name] = variable_name
 
+    def caches(self):
+        '''
+        returns the step's caches ({name: path}). Caches are directories whose contents are
+        retained between builds (on the same worker) - there is no guarantee they are populated.
+        '''
+        return self._caches_dict
+
+    def cache(self, name):
+        return self.caches()[name]
+
+    def add_cache(self, name, path):
+        util.not_none(name)
+        util.not_empty(path)
+
+        if name in self._caches_dict:
+            raise ValueError('cache already exists: ' + str(name))
+        self._caches_dict[name] = path
+
     def variables(self):
         return self.raw.get('vars')
 
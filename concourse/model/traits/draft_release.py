@@ -71,6 +71,8 @@ class DraftReleaseTraitTransformer(TraitTransformer):
             script_type=ScriptType.PYTHON3,
         )
         self.release_step.set_timeout(duration_string='10m')
+        # retain extracted release notes between builds
+        self.release_step.add_cache(name='release_notes_cache_dir', path='release-notes-cache')
         yield self.release_step
 
     def process_pipeline_args(self, pipeline_args: 'JobVariant'):
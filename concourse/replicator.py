@@ -359,10 +359,20 @@ class ReplicationResultProcessor(object):
         )
 
         all_notifications_succeeded = True
+        notifications = []
         for failed_descriptor in failed_descriptors:
             warning(failed_descriptor.definition_descriptor.pipeline_name)
             try:
-                self._notify_broken_definition_owners(failed_descriptor)
+                notifications.append(self._notify_broken_definition_owners(failed_descriptor))
+            except Exception:
+                warning('an error occurred whilst trying to send error notifications')
+                traceback.print_exc()
+                all_notifications_succeeded = False
+
+        # mails are sent in the background - wait for their delivery
+        for notification in notifications:
+            try:
+                notification.result()
             except Exception:
                 warning('an error occurred whilst trying to send error notifications')
                 traceback.print_exc()
@@ -411,13 +421,14 @@ class ReplicationResultProcessor(object):
 
         info(f'Sending notification e-mail to {recipients} ({main_repo["path"]})')
         email_cfg = self._cfg_set.email()
-        _send_mail(
+        return _send_mail(
             email_cfg=email_cfg,
             recipients=recipients,
             subject='Your pipeline definition in {repo} is erroneous'.format(
                 repo=main_repo['path'],
             ),
             mail_template='Error details:\n' + str(failed_descriptor.error_details),
+            wait=False,
         )
 
     def _initialise_new_pipeline_resources(self, concourse_api, results):
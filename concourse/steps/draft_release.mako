@@ -8,7 +8,9 @@ version_file = job_step.input('version_path') + '/version'
 repo = job_variant.main_repository()
 draft_release_trait = job_variant.trait('draft_release')
 version_operation = draft_release_trait._preprocess()
+release_notes_cache_dir = job_step.cache('release_notes_cache_dir')
 %>
+import os
 import version
 import pathlib
 
@@ -57,7 +59,8 @@ git_helper = GitHelper.from_githubrepobranch(
 release_notes_md = ReleaseNotes.create(
     github_helper=helper,
     git_helper=git_helper,
-    repository_branch='${repo.branch()}'
+    repository_branch='${repo.branch()}',
+    cache_file=os.path.join('${release_notes_cache_dir}', 'release_notes.json'),
 ).to_markdown()
 
 draft_name = draft_release_name_for_version(processed_version)
@@ -12,11 +12,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from github3 import GitHub
 from github3.exceptions import NotFoundError
 
-from github.util import GitHubRepositoryHelper
+from github.util import GitHubRepositoryHelper, team_member_names, user_email_address
 
 from util import existing_dir, existing_file, not_none, warning
 
@@ -38,7 +39,7 @@ class CodeownersEnumerator(object):
     def enumerate_local_repo(self, repo_dir: str):
         repo_dir = existing_dir(Path(repo_dir))
         if not repo_dir.joinpath('.git').is_dir():
-            raise ValueError('not a git root directory: {r}'.format(self.repo_dir))
+            raise ValueError('not a git root directory: {r}'.format(r=repo_dir))
 
         for path in self.CODEOWNERS_PATHS:
             codeowners_file = repo_dir.joinpath(path)
@@ -74,13 +75,6 @@ class CodeownersEnumerator(object):
             yield from filter(bool, github_ids)
 
 
-def _first(iterable):
-    try:
-        return next(iterable)
-    except StopIteration:
-        return None
-
-
 class CodeOwnerEntryResolver(object):
     '''
     Resolves GitHub CODEOWNERS entries [0] into email addresses.
@@ -88,40 +82,74 @@ class CodeOwnerEntryResolver(object):
     The github3.py api object needs to be pre-authenticated with the privilege to read
     organisation and team memberhip data.
 
+    User email addresses and team memberships are cached (see `github.util`), so resolving
+    the same entries repeatedly (e.g. for many components) does not repeat the lookups.
+
     [0] https://help.github.com/articles/about-codeowners/
     '''
 
-    def __init__(self, github_api: GitHub):
+    def __init__(self, github_api: GitHub, max_workers: int=8):
         self.github_api = not_none(github_api)
+        self.max_workers = max_workers
+        self._unknown_user_names = set()
 
     def _determine_email_address(self, github_user_name: str):
         not_none(github_user_name)
-        user = self.github_api.user(github_user_name)
-        return user.email
+        if github_user_name.lower() in self._unknown_user_names:
+            return None
+        try:
+            return user_email_address(self.github_api, github_user_name)
+        except NotFoundError:
+            # e.g. stale CODEOWNERS entries - skip (do not abort resolution)
+            warning('GitHub user {u} does not exist'.format(u=github_user_name))
+            self._unknown_user_names.add(github_user_name.lower())
+            return None
+
+    def _determine_email_addresses(self, github_user_names):
+        '''
+        returns a list of (user name, email address) pairs, preserving the given order. Users
+        are looked-up concurrently.
+        '''
+        github_user_names = list(github_user_names)
+        if len(github_user_names) < 2:
+            return list(zip(
+                github_user_names,
+                map(self._determine_email_address, github_user_names),
+            ))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(zip(
+                github_user_names,
+                executor.map(self._determine_email_address, github_user_names),
+            ))
 
     def _resolve_team_members(self, github_team_name: str):
         not_none(github_team_name)
         org_name, team_name = github_team_name.split('/') # always of form 'org/name'
-        organisation = self.github_api.organization(org_name)
-        # unfortunately, we have to look-up the team (no api to retrieve it by name)
-        team_or_none = _first(filter(lambda team: team.name == team_name, organisation.teams()))
-        if not team_or_none:
+        member_names = team_member_names(self.github_api, org_name, team_name)
+        if member_names is None:
             warning('failed to lookup team {t}'.format(t=team_name))
-            return []
-        for member in map(self.github_api.user, team_or_none.members()):
-            if member.email:
-                yield member.email
+            return
+        for member_name, email_address in self._determine_email_addresses(member_names):
+            if email_address:
+                yield email_address
             else:
-                warning(f'no email found for GitHub user {member}')
+                warning(f'no email found for GitHub user {member_name}')
 
     def resolve_email_addresses(self, codeowners_entries):
         '''
         returns a generator yielding the resolved email addresses for the given iterable of
         github codeowners entries.
         '''
+        codeowners_entries = list(codeowners_entries)
+        # look-up all referenced users at once (results are cached)
+        self._determine_email_addresses(
+            entry[1:] for entry in codeowners_entries
+            if entry.startswith('@') and '/' not in entry
+        )
+
         for codeowner_entry in codeowners_entries:
             if '@' not in codeowner_entry:
-                warning('invalid codeowners-entry: {e}'.format(codeowner_entry))
+                warning('invalid codeowners-entry: {e}'.format(e=codeowner_entry))
                 continue
             if not codeowner_entry.startswith('@'):
                 yield codeowner_entry # plain email address
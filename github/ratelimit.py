@@ -0,0 +1,259 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import hashlib
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from util import warning
+
+
+class RateLimitBudget(object):
+    '''
+    tracks the GitHub API request budget of one token on one GitHub instance, and schedules
+    requests accordingly (thread-safe; shared between all sessions using the same token).
+
+    The remaining quota is read from the `X-RateLimit-*` response headers. While more than
+    `low_watermark` (fraction of the limit) remains, requests are not throttled. Below it,
+    requests are paced by a token bucket that spreads the remaining quota evenly until the
+    quota is reset. Once only `reserve` requests remain, requests are held back until reset.
+
+    "Secondary" rate limits (a.k.a. abuse detection; signalled by 403/429 responses w/
+    `Retry-After` header or a corresponding error message) block all requests for the
+    requested time, or, if no time was given, with exponential backoff.
+    '''
+    def __init__(
+        self,
+        host: str,
+        low_watermark: float=0.2,
+        reserve: int=10,
+        burst: int=10,
+        max_wait_seconds: float=900,
+        clock=time.time,
+    ):
+        self.host = host
+        self.low_watermark = low_watermark
+        self.reserve = reserve
+        self.burst = burst
+        self.max_wait_seconds = max_wait_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # quota, as reported by GitHub
+        self._limit = None
+        self._remaining = None
+        self._reset_at = None
+
+        # token bucket (only used while below low watermark)
+        self._rate = None # tokens per second; None: not throttled
+        self._tokens = 0.0
+        self._last_refill = None
+
+        self._blocked_until = 0.0
+        self._secondary_limit_backoff = 0
+
+        # metrics
+        self._request_count = 0
+        self._throttled_request_count = 0
+        self._total_wait_seconds = 0.0
+        self._secondary_limit_count = 0
+
+    def acquire(self) -> float:
+        '''
+        reserves budget for one request and returns the time (in seconds) the caller must
+        wait before actually issuing it
+        '''
+        with self._lock:
+            now = self._clock()
+            wait_seconds = max(0.0, self._blocked_until - now)
+
+            if self._rate:
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._last_refill) * self._rate,
+                )
+                self._last_refill = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait_seconds = max(wait_seconds, -self._tokens / self._rate)
+
+            wait_seconds = min(wait_seconds, self.max_wait_seconds)
+
+            self._request_count += 1
+            if wait_seconds > 0:
+                self._throttled_request_count += 1
+                self._total_wait_seconds += wait_seconds
+
+            return wait_seconds
+
+    def update(self, response: requests.Response) -> bool:
+        '''
+        updates the budget from the given response. Returns `True` iff the request was
+        rejected due to rate limiting and should be retried (after calling `acquire` again).
+        '''
+        with self._lock:
+            now = self._clock()
+            self._update_quota(response.headers, now)
+
+            if response.status_code not in (403, 429):
+                self._secondary_limit_backoff = 0
+                return False
+
+            if self._is_secondary_limit(response):
+                retry_after = response.headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    backoff = int(retry_after)
+                else:
+                    backoff = min(max(self._secondary_limit_backoff * 2, 60), self.max_wait_seconds)
+                self._secondary_limit_backoff = backoff
+                self._secondary_limit_count += 1
+                self._blocked_until = max(self._blocked_until, now + backoff)
+                return True
+
+            if self._remaining == 0:
+                # primary limit exhausted - retry after reset (unless reset is too far off)
+                return self._reset_at - now <= self.max_wait_seconds
+
+            return False # "ordinary" 403 (e.g. missing permissions)
+
+    def _is_secondary_limit(self, response):
+        if 'Retry-After' in response.headers:
+            return True
+        try:
+            message = response.json().get('message', '').lower()
+        except ValueError:
+            return False
+        return 'secondary rate limit' in message or 'abuse' in message
+
+    def _update_quota(self, headers, now):
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            limit = int(headers['X-RateLimit-Limit'])
+            reset_at = float(headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return # e.g. rate limiting is disabled on GitHub Enterprise
+
+        if reset_at == self._reset_at and remaining > self._remaining:
+            return # stale (concurrent responses may arrive out of order)
+
+        self._limit = limit
+        self._remaining = remaining
+        self._reset_at = reset_at
+        seconds_to_reset = max(reset_at - now, 1.0)
+
+        if remaining <= self.reserve:
+            self._blocked_until = max(self._blocked_until, reset_at)
+            self._rate = None
+        elif remaining < limit * self.low_watermark:
+            if not self._rate:
+                self._tokens = 1.0
+                self._last_refill = now
+            self._rate = (remaining - self.reserve) / seconds_to_reset
+        else:
+            self._rate = None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            return {
+                'host': self.host,
+                'limit': self._limit,
+                'remaining': self._remaining,
+                'reset_at': self._reset_at,
+                'throttle_rate': self._rate,
+                'blocked_seconds': max(0.0, self._blocked_until - now),
+                'request_count': self._request_count,
+                'throttled_request_count': self._throttled_request_count,
+                'total_wait_seconds': self._total_wait_seconds,
+                'secondary_limit_count': self._secondary_limit_count,
+            }
+
+
+_budgets = {} # (host, token digest): RateLimitBudget
+_budgets_lock = threading.Lock()
+
+
+def budget_for(host: str, auth_token: str) -> RateLimitBudget:
+    '''
+    returns the (shared) rate limit budget for the given GitHub host and token
+    '''
+    # do not keep tokens around in clear text
+    token_digest = hashlib.sha256((auth_token or '').encode('utf-8')).hexdigest()
+    with _budgets_lock:
+        key = (host, token_digest)
+        if key not in _budgets:
+            _budgets[key] = RateLimitBudget(host=host)
+        return _budgets[key]
+
+
+def metrics() -> [dict]:
+    '''
+    returns the current metrics of all rate limit budgets
+    '''
+    with _budgets_lock:
+        budgets = list(_budgets.values())
+    return [budget.metrics() for budget in budgets]
+
+
+def _is_replayable(body):
+    return body is None or isinstance(body, (bytes, str))
+
+
+class RateLimitedHTTPAdapter(HTTPAdapter):
+    '''
+    a `HTTPAdapter` that schedules requests according to the given `RateLimitBudget`, and
+    retries requests rejected due to rate limiting (unless their body cannot be replayed)
+    '''
+    def __init__(self, budget: RateLimitBudget, max_rate_limit_retries: int=3, *args, **kwargs):
+        self.budget = budget
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self._sleep = time.sleep
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, *args, **kwargs):
+        for attempt in range(self.max_rate_limit_retries + 1):
+            wait_seconds = self.budget.acquire()
+            if wait_seconds > 0:
+                self._sleep(wait_seconds)
+
+            response = super().send(request, *args, **kwargs)
+
+            should_retry = self.budget.update(response)
+            if not should_retry or attempt == self.max_rate_limit_retries:
+                return response
+            if not _is_replayable(request.body):
+                # streamed (or file) bodies were already consumed - a retry would send no body
+                return response
+
+            warning(
+                f'GitHub rate limit hit (host: {self.budget.host}, url: {request.url}). '
+                f'Retries so far: {attempt}. Retrying ...'
+            )
+            response.close()
+
+
+def rate_limited_adapter_ctor(host: str, auth_token: str):
+    '''
+    returns a constructor for `RateLimitedHTTPAdapter`s sharing the budget for the given
+    GitHub host and token (suitable for `http_requests.mount_default_adapter`)
+    '''
+    return functools.partial(
+        RateLimitedHTTPAdapter,
+        budget_for(host=host, auth_token=auth_token),
+    )
@@ -0,0 +1,147 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import tempfile
+import threading
+
+from github.release_notes.model import (
+    ReleaseNoteBlock,
+    reference_type_for_type_identifier,
+)
+from product.model import ComponentName
+from util import verbose
+
+
+class ReleaseNotesCache(object):
+    '''
+    a cache of release note blocks extracted from commits and pull requests.
+
+    Entries are keyed by commit sha, resp. by pull request number and last modification
+    timestamp. As those identify immutable texts, entries never need to be invalidated.
+    Additionally, the last known modification timestamp of each pull request and the time up to
+    which modifications of a repository's pull requests were seen are stored as plain values, so
+    unmodified pull requests need not be retrieved again (see `get_value`).
+
+    If a `cache_file` is given, the cache is read from it upon creation and written back by
+    `store`. Only entries used since the cache was loaded are written back, so the file only
+    retains the release notes of the most recently processed range.
+    '''
+    def __init__(self, cache_file: str=None):
+        self._cache_file = cache_file
+        self._entries = {} # key: [serialised ReleaseNoteBlock]
+        self._used_keys = set()
+        self._lock = threading.Lock()
+
+        if cache_file and os.path.isfile(cache_file):
+            with open(cache_file) as f:
+                self._entries = json.load(f)
+            verbose('read {n} cached release note entries from {f}'.format(
+                n=len(self._entries),
+                f=cache_file,
+            ))
+
+    @staticmethod
+    def commit_key(repo_path: str, commit_sha: str):
+        return '{r}:commit:{c}'.format(r=repo_path, c=commit_sha)
+
+    @staticmethod
+    def pull_request_key(repo_path: str, pr_number: str, updated_at: str):
+        return '{r}:pull:{n}:{u}'.format(r=repo_path, n=pr_number, u=updated_at)
+
+    @staticmethod
+    def pull_request_updated_at_key(repo_path: str, pr_number: str):
+        return '{r}:pull:{n}'.format(r=repo_path, n=pr_number)
+
+    @staticmethod
+    def pull_requests_synced_at_key(repo_path: str):
+        return '{r}:pulls-synced-at'.format(r=repo_path)
+
+    def is_persistent(self):
+        return bool(self._cache_file)
+
+    def get(self, key: str, cn_current_repo: ComponentName):
+        '''
+        returns the cached release note blocks for the given key, or `None` if absent
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._used_keys.add(key)
+
+        return [_deserialise_block(block, cn_current_repo) for block in entry]
+
+    def put(self, key: str, release_note_blocks: [ReleaseNoteBlock]):
+        entry = [_serialise_block(block) for block in release_note_blocks]
+        with self._lock:
+            self._entries[key] = entry
+            self._used_keys.add(key)
+
+    def get_value(self, key: str):
+        '''
+        returns the plain value (e.g. a timestamp) stored for the given key, or `None` if absent
+        '''
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._used_keys.add(key)
+            return value
+
+    def put_value(self, key: str, value):
+        with self._lock:
+            self._entries[key] = value
+            self._used_keys.add(key)
+
+    def store(self):
+        if not self._cache_file:
+            return
+
+        with self._lock:
+            entries = {key: self._entries[key] for key in self._used_keys}
+
+        cache_dir = os.path.dirname(os.path.abspath(self._cache_file))
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self._cache_file)
+
+
+def _serialise_block(block: ReleaseNoteBlock) -> dict:
+    reference_type = block.reference.type
+    return {
+        'category_id': block.category_id,
+        'target_group_id': block.target_group_id,
+        'text': block.text,
+        'reference_type': reference_type.identifier if reference_type else None,
+        'reference_id': block.reference.identifier,
+        'user_login': block.user_login,
+        'source_repo': block.cn_source_repo.name(),
+    }
+
+
+def _deserialise_block(raw: dict, cn_current_repo: ComponentName) -> ReleaseNoteBlock:
+    return ReleaseNoteBlock(
+        category_id=raw['category_id'],
+        target_group_id=raw['target_group_id'],
+        text=raw['text'],
+        reference_type=reference_type_for_type_identifier(raw['reference_type']),
+        reference_id=raw['reference_id'],
+        user_login=raw['user_login'],
+        source_repo=raw['source_repo'],
+        cn_current_repo=cn_current_repo,
+    )
@@ -73,61 +73,57 @@ class Renderer(object):
         self.rls_note_objs = release_note_objs
 
     def render(self)->str:
-        origin_nodes = _\
-            .chain(self.rls_note_objs)\
-            .sort_by(lambda rls_note_obj: rls_note_obj.cn_source_repo.github_repo())\
-            .uniq_by(lambda rls_note_obj: rls_note_obj.cn_source_repo.name())\
-            .map(lambda rls_note_obj: TitleNode(
-                identifier=rls_note_obj.cn_source_repo.name(),
-                title='[{origin_name}]'.format(
-                    origin_name=rls_note_obj.cn_source_repo.github_repo()
-                ),
+        # group release notes in a single pass: origin -> category -> target group -> notes
+        # (dicts retain insertion order, i.e. the order in which release notes occur)
+        origin_repos = {} # origin name: github repo
+        grouped_rls_note_objs = {}
+        for rls_note_obj in self.rls_note_objs:
+            origin_name = rls_note_obj.cn_source_repo.name()
+            categories = grouped_rls_note_objs.get(origin_name)
+            if categories is None:
+                categories = grouped_rls_note_objs[origin_name] = {}
+                origin_repos[origin_name] = rls_note_obj.cn_source_repo.github_repo()
+            categories \
+                .setdefault(rls_note_obj.category_id, {}) \
+                .setdefault(rls_note_obj.target_group_id, []) \
+                .append(rls_note_obj)
+
+        # origins are ordered by repository name (sort is stable, so equally-named
+        # repositories retain the order of their first occurrence)
+        origin_names = sorted(grouped_rls_note_objs.keys(), key=lambda name: origin_repos[name])
+
+        release_note_lines = list()
+        for origin_name in origin_names:
+            origin_node = TitleNode(
+                identifier=origin_name,
+                title='[{origin_name}]'.format(origin_name=origin_repos[origin_name]),
                 nodes=CATEGORIES,
                 matches_rls_note_field_path='cn_source_repo.name' # path points to a function
-            ))\
-            .value()
-
-        release_note_lines = self._to_release_note_lines(
-            nodes=origin_nodes,
-            level=1,
-            rls_note_objs=self.rls_note_objs
-        )
+            )
+            release_note_lines.append(self._title(origin_node, 1))
+            release_note_lines.extend(
+                self._category_lines(categories=grouped_rls_note_objs[origin_name], level=2)
+            )
 
         if not release_note_lines:
             return 'no release notes available'
         return '\n'.join(release_note_lines)
 
-    def _to_release_note_lines(
-        self,
-        nodes: [TitleNode],
-        level: int,
-        rls_note_objs: [ReleaseNote]
-    ) -> [str]:
+    def _category_lines(self, categories: dict, level: int) -> [str]:
         lines = list()
-        for node in nodes:
-            filtered_rls_note_objects = _.filter(
-                rls_note_objs,
-                lambda rls_note_obj:
-                    node.identifier == get_or_call(rls_note_obj, node.matches_rls_note_field_path)
-            )
-            if not filtered_rls_note_objects:
+        for category_node in CATEGORIES:
+            target_groups = categories.get(category_node.identifier)
+            if not target_groups:
                 continue
-            if node.nodes:
-                release_note_lines = self._to_release_note_lines(
-                    nodes=node.nodes,
-                    level=level + 1,
-                    rls_note_objs=filtered_rls_note_objects
-                )
-                lines.append(self._title(node, level))
-                lines.extend(release_note_lines)
-            else:
-                bullet_points = self._to_bullet_points(
-                    tag=node.title,
-                    rls_note_objs=filtered_rls_note_objects
-                )
+            lines.append(self._title(category_node, level))
+            for target_group_node in category_node.nodes:
+                rls_note_objs = target_groups.get(target_group_node.identifier)
+                if not rls_note_objs:
+                    continue
                 # title is used as bullet point tag -> no need for additional title
-                lines.extend(bullet_points)
-
+                lines.extend(
+                    self._to_bullet_points(tag=target_group_node.title, rls_note_objs=rls_note_objs)
+                )
         return lines
 
     def _header_suffix(
@@ -239,13 +235,12 @@ class Renderer(object):
         for rls_note_obj in rls_note_objs:
             for i, rls_note_line in enumerate(rls_note_obj.text.splitlines()):
                 # trim '*' or '-' bullet points
-                rls_note_line = _\
-                    .chain(rls_note_line)\
-                    .trim()\
-                    .reg_exp_replace(r'^\* ', '')\
-                    .reg_exp_replace(r'^- ', '')\
-                    .trim()\
-                    .value()
+                rls_note_line = rls_note_line.strip()
+                if rls_note_line.startswith('* '):
+                    rls_note_line = rls_note_line[2:]
+                if rls_note_line.startswith('- '):
+                    rls_note_line = rls_note_line[2:]
+                rls_note_line = rls_note_line.strip()
 
                 if not rls_note_line:
                     continue
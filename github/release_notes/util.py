@@ -14,8 +14,11 @@
 # limitations under the License.
 
 from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 import git
+import os
 from git.exc import GitError
+from github3.exceptions import NotFoundError
 from github.util import GitHubRepositoryHelper
 from pydash import _
 import re
@@ -32,6 +35,7 @@ from github.release_notes.model import (
     REF_TYPE_PULL_REQUEST,
     REF_TYPE_COMMIT
 )
+from github.release_notes.cache import ReleaseNotesCache
 from github.release_notes.renderer import MarkdownRenderer
 from gitutil import GitHelper
 from util import info, warning, fail, verbose, existing_dir, ctx
@@ -39,6 +43,9 @@ from product.model import ComponentName
 from model.base import ModelValidationError
 from slack.util import SlackHelper
 
+# if set, release notes are cached in the given file unless another one is passed explicitly
+CACHE_FILE_ENV_VAR = 'CC_RELEASE_NOTES_CACHE_FILE'
+
 
 def fetch_release_notes(
     github_repository_owner: str,
@@ -47,13 +54,15 @@ def fetch_release_notes(
     repo_dir: str,
     github_helper: GitHubRepositoryHelper,
     repository_branch: str,
+    cache_file: str=None,
 ):
     repo_path = github_repo_path(owner=github_repository_owner, name=github_repository_name)
     git_helper = GitHelper(repo=repo_dir, github_cfg=github_cfg, github_repo_path=repo_path)
     return ReleaseNotes.create(
         github_helper=github_helper,
         git_helper=git_helper,
-        repository_branch=repository_branch
+        repository_branch=repository_branch,
+        cache_file=cache_file,
     )
 
 
@@ -97,14 +106,26 @@ class ReleaseNotes(object):
         github_helper: GitHubRepositoryHelper,
         git_helper: GitHelper,
         repository_branch: str=None,
-        commit_range: str=None
+        commit_range: str=None,
+        cache_file: str=None,
     ):
+        '''
+        @param cache_file: optional file to cache extracted release notes in (defaults to
+                           the value of `CC_RELEASE_NOTES_CACHE_FILE`). Subsequent runs will
+                           only extract release notes from new commits and modified pull
+                           requests.
+        '''
+        cache_file = cache_file or os.environ.get(CACHE_FILE_ENV_VAR)
+        cache = ReleaseNotesCache(cache_file=cache_file) if cache_file else None
         release_note_objs = _rls_note_objs(
             github_helper=github_helper,
             git_helper=git_helper,
             repository_branch=repository_branch,
-            commit_range=commit_range
+            commit_range=commit_range,
+            cache=cache,
         )
+        if cache:
+            cache.store()
         return ReleaseNotes(release_note_objs)
 
     def to_markdown(self,
@@ -137,23 +158,44 @@ def _rls_note_objs(
     github_helper: GitHubRepositoryHelper,
     git_helper: GitHelper,
     repository_branch: str=None,
-    commit_range: str=None
+    commit_range: str=None,
+    cache: ReleaseNotesCache=None,
 ) -> [ReleaseNote]:
+    cache = cache or _default_cache
     cn_current_repo = ComponentName.from_github_repo_url(github_helper.repository.html_url)
+    repo_path = github_repo_path(owner=github_helper.owner, name=github_helper.repository_name)
 
     if not commit_range:
         commit_range = calculate_range(repository_branch, git_helper, github_helper)
     info('Fetching release notes from revision range: {range}'.format(
         range=commit_range
     ))
-    commits = commits_in_range(git_helper.repo, commit_range, repository_branch)
-    pr_numbers = fetch_pr_numbers_from_commits(commits)
+    # collect PR numbers and release notes from commits in a single pass over the git log
+    pr_numbers = set()
+    release_note_objs_commits = list()
+    for commit in commits_in_range(git_helper.repo, commit_range, repository_branch):
+        pr_number = pr_number_from_subject(commit.subject)
+        if pr_number:
+            pr_numbers.add(pr_number)
+
+        cache_key = ReleaseNotesCache.commit_key(repo_path=repo_path, commit_sha=commit.hash)
+        release_notes_commit = cache.get(cache_key, cn_current_repo)
+        if release_notes_commit is None:
+            release_notes_commit = release_notes_from_commit(commit, cn_current_repo)
+            cache.put(cache_key, release_notes_commit)
+        release_note_objs_commits.extend(release_notes_commit)
+
     verbose('Merged pull request numbers in range {range}: {pr_numbers}'.format(
         range=commit_range,
         pr_numbers=pr_numbers
     ))
-    release_note_objs = fetch_release_notes_from_prs(github_helper, pr_numbers, cn_current_repo)
-    release_note_objs.extend(fetch_release_notes_from_commits(commits, cn_current_repo))
+    release_note_objs = fetch_release_notes_from_prs(
+        github_helper,
+        pr_numbers,
+        cn_current_repo,
+        cache=cache,
+    )
+    release_note_objs.extend(release_note_objs_commits)
 
     return release_note_objs
 
@@ -187,8 +229,14 @@ def calculate_range(
 
 def release_tags(
     github_helper: GitHubRepositoryHelper,
-    repo: git.Repo
-) -> [str]:
+    repo: git.Repo,
+    merged_into: str=None,
+) -> typing.Dict[str, str]:
+    '''
+    returns a dict {commit_sha: tag_name} of the local tags that are GitHub release tags
+    (and valid semver versions). If `merged_into` is given, only tags reachable from that
+    revision are considered.
+    '''
     def is_valid_semver(tag_name):
         try:
             parse_version_info(tag_name)
@@ -197,20 +245,22 @@ def release_tags(
             warning('{tag} is not a valid SemVer string'.format(tag=tag_name))
             return False
 
-    release_tags = github_helper.release_tags()
-    # you can remove the directive to disable the undefined-variable error once pylint is updated
-    # with fix https://github.com/PyCQA/pylint/commit/db01112f7e4beadf7cd99c5f9237d580309f0494
-    # included
-    # pylint: disable=undefined-variable
-    tags = _ \
-        .chain(repo.tags) \
-        .map(lambda tag: {"tag": tag.name, "commit": tag.commit.hexsha}) \
-        .filter(lambda item: _.find(release_tags, lambda el: el == item['tag'])) \
-        .filter(lambda item: is_valid_semver(item['tag'])) \
-        .key_by('commit') \
-        .map_values('tag') \
-        .value()
-    # pylint: enable=undefined-variable
+    github_release_tags = set(github_helper.release_tags())
+
+    # '*objectname' is the peeled (commit) sha for annotated tags, and empty otherwise
+    args = ['--format=%(objectname) %(*objectname) %(refname:short)']
+    if merged_into:
+        args.extend(('--merged', merged_into))
+    args.append('refs/tags')
+
+    tags = {}
+    for line in repo.git.for_each_ref(*args).splitlines():
+        object_sha, peeled_sha, tag_name = line.split(' ', 2)
+        if tag_name not in github_release_tags:
+            continue
+        if not is_valid_semver(tag_name):
+            continue
+        tags[peeled_sha or object_sha] = tag_name
     return tags
 
 
@@ -219,49 +269,39 @@ def reachable_release_tags_from_commit(
     repo: git.Repo,
     commit: git.objects.Commit
 ) -> [str]:
-    tags = release_tags(github_helper, repo)
-
-    visited = set()
-    queue = list()
-    queue.append(commit)
-    visited.add(commit.hexsha)
-
-    reachable_tags = list()
-
-    while queue:
-        commit = queue.pop(0)
-        if commit.hexsha in tags:
-            reachable_tags.append(tags[commit.hexsha])
-        not_visited_parents = _.filter(commit.parents,
-            lambda parent_commit: parent_commit.hexsha not in visited
-        )
-        if not_visited_parents:
-            queue.extend(not_visited_parents)
-            visited |= set(_.map(not_visited_parents, lambda commit: commit.hexsha))
+    tags = release_tags(github_helper, repo, merged_into=commit.hexsha)
 
+    reachable_tags = list(tags.values())
     reachable_tags.sort(key=lambda t: parse_version_info(t), reverse=True)
 
     if not reachable_tags:
         warning('no release tag found, falling back to root commit')
-        root_commits = repo.iter_commits(rev=commit, max_parents=0)
-        root_commit = next(root_commits, None)
-        if not root_commit:
+        root_commits = repo.git.rev_list('--max-parents=0', commit.hexsha).split()
+        if not root_commits:
             fail('could not determine root commit from rev {rev}'.format(rev=commit.hexsha))
-        if next(root_commits, None):
+        if len(root_commits) > 1:
             fail(
                 'cannot determine range for release notes. Repository has multiple root commits. '
                 'Specify range via commit_range parameter.'
             )
-        reachable_tags.append(root_commit.hexsha)
+        reachable_tags.append(root_commits[0])
 
     return reachable_tags
 
 
+# field separator used for git log output (records are separated by NUL, see `git log -z`)
+_GIT_LOG_FIELD_SEPARATOR = '\x1f'
+
+
 def commits_in_range(
     repo: git.Repo,
     commit_range: str,
     repository_branch: str=None
-):
+) -> typing.Iterable[Commit]:
+    '''
+    yields the commits in the given range. The output of `git log` is parsed while it is
+    being read, so it is never held in memory as a whole.
+    '''
     args = [commit_range]
     if repository_branch:
         args.append(repository_branch)
@@ -271,34 +311,61 @@ def commits_in_range(
         "%s",   # subject
         "%B"    # raw body
     ]
-    pretty_format = '%x00'.join(GIT_FORMAT_KEYS) # field separator
-    pretty_format += '%x01' #line ending
+    pretty_format = '%x1f'.join(GIT_FORMAT_KEYS) # field separator
+
+    git_log = repo.git.log(*args, z=True, pretty=pretty_format, as_process=True)
+    yield from commits_from_log_stream(git_log.stdout)
+    git_log.wait() # raises if git failed
+
+
+def _split_stream(stream, separator: bytes, chunk_size: int=64 * 1024):
+    remainder = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        *records, remainder = (remainder + chunk).split(separator)
+        yield from records
+    if remainder:
+        yield remainder
+
+
+def commits_from_log_stream(stream) -> typing.Iterable[Commit]:
+    '''
+    parses the output of `git log -z` (with hash, subject and raw body separated by
+    `_GIT_LOG_FIELD_SEPARATOR`) from the given binary stream and yields `Commit`s
+    '''
+    for record in _split_stream(stream, separator=b'\x00'):
+        fields = record.decode('utf-8', errors='replace').split(_GIT_LOG_FIELD_SEPARATOR, 2)
+        if len(fields) != 3:
+            continue
+        commit_hash, subject, message = fields
+        yield Commit(
+            hash=commit_hash.strip(),
+            subject=subject,
+            message=message,
+        )
 
-    kwargs = {'pretty': pretty_format}
-    git_logs = _.split(repo.git.log(*args, **kwargs), '\x01')
 
-    return commits_from_logs(git_logs)
+_GIT_LOG_ENTRY_PATTERN = re.compile(
+    r"(?P<commit_hash>\S+?)\x00(?P<commit_subject>.*)\x00(?P<commit_message>.*)",
+    re.MULTILINE | re.DOTALL
+)
 
 
 def commits_from_logs(
     git_logs: [str]
 ) -> [Commit]:
-    r = re.compile(
-        r"(?P<commit_hash>\S+?)\x00(?P<commit_subject>.*)\x00(?P<commit_message>.*)",
-        re.MULTILINE | re.DOTALL
-    )
-
-    commits = _\
-        .chain(git_logs) \
-        .map(lambda c: r.search(c)) \
-        .filter(lambda m: m is not None) \
-        .map(lambda m: m.groupdict()) \
-        .map(lambda g: Commit(
-            hash=g['commit_hash'],
-            subject=g['commit_subject'],
-            message=g['commit_message']
-        )) \
-        .value()
+    commits = list()
+    for git_log in git_logs:
+        m = _GIT_LOG_ENTRY_PATTERN.search(git_log)
+        if not m:
+            continue
+        commits.append(Commit(
+            hash=m.group('commit_hash'),
+            subject=m.group('commit_subject'),
+            message=m.group('commit_message'),
+        ))
     return commits
 
 
@@ -315,36 +382,175 @@ def fetch_pr_numbers_from_commits(
     return pr_numbers
 
 
+_MERGE_COMMIT_PR_NUMBER_PATTERN = re.compile(r"Merge pull request #(\d+)")
+_SQUASH_COMMIT_PR_NUMBER_PATTERN = re.compile(r" \(#(\d+)\)$")
+
+
 def pr_number_from_subject(commit_subject: str):
-    pr_number = _.head(re.findall(r"Merge pull request #(\d+)", commit_subject))
-    if not pr_number: # Squash commit
-        pr_number = _.head(re.findall(r" \(#(\d+)\)$", commit_subject))
-    return pr_number
+    m = _MERGE_COMMIT_PR_NUMBER_PATTERN.search(commit_subject)
+    if not m: # Squash commit
+        m = _SQUASH_COMMIT_PR_NUMBER_PATTERN.search(commit_subject)
+    return m.group(1) if m else None
+
+
+def fetch_pull_requests(
+    github_helper: GitHubRepositoryHelper,
+    pr_numbers: typing.Iterable[str],
+    max_workers: int=8,
+) -> typing.Iterable[dict]:
+    '''
+    retrieves the pull requests with the given numbers (concurrently, one request each) and
+    yields them as dicts, ordered by number. Unknown pull requests are skipped.
+    '''
+    def fetch_pull_request(pr_number):
+        try:
+            return github_helper.repository.pull_request(int(pr_number)).as_dict()
+        except NotFoundError:
+            warning('pull request #{n} not found'.format(n=pr_number))
+            return None
+
+    pr_numbers = sorted(set(pr_numbers), key=int)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for pr_dict in executor.map(fetch_pull_request, pr_numbers):
+            if pr_dict:
+                yield pr_dict
+
+
+# in-process cache used if no explicit cache is passed
+_default_cache = ReleaseNotesCache()
+
+
+def release_notes_from_pr(
+    github_helper: GitHubRepositoryHelper,
+    pr_dict: dict,
+    cn_current_repo: ComponentName,
+    cache: ReleaseNotesCache=None,
+) -> [ReleaseNote]:
+    cache = cache or _default_cache
+    pr_number = str(pr_dict['number'])
+    repo_path = github_repo_path(owner=github_helper.owner, name=github_helper.repository_name)
+    cache_key = ReleaseNotesCache.pull_request_key(
+        repo_path=repo_path,
+        pr_number=pr_number,
+        updated_at=pr_dict.get('updated_at'),
+    )
+    release_notes_pr = cache.get(cache_key, cn_current_repo)
+    if release_notes_pr is not None:
+        return release_notes_pr
+
+    release_notes_pr = extract_release_notes(
+        reference_id=pr_number,
+        text=pr_dict['body'],
+        user_login=_.get(pr_dict, 'user.login'),
+        cn_current_repo=cn_current_repo,
+        reference_type=REF_TYPE_PULL_REQUEST
+    )
+    cache.put(cache_key, release_notes_pr)
+    cache.put_value(
+        ReleaseNotesCache.pull_request_updated_at_key(repo_path=repo_path, pr_number=pr_number),
+        pr_dict.get('updated_at'),
+    )
+    return release_notes_pr
+
+
+def pull_requests_updated_since(
+    github_helper: GitHubRepositoryHelper,
+    updated_since: str,
+) -> typing.Iterable[dict]:
+    '''
+    yields the closed pull requests modified at or after the given (ISO 8601) timestamp as dicts,
+    most recently modified first. Only as many pages as required are retrieved.
+    '''
+    for pull_request in github_helper.repository.pull_requests(
+        state='closed',
+        sort='updated',
+        direction='desc',
+    ):
+        pr_dict = pull_request.as_dict()
+        if pr_dict['updated_at'] < updated_since:
+            return
+        yield pr_dict
+
+
+def _cached_pull_request_dicts(
+    github_helper: GitHubRepositoryHelper,
+    pr_numbers: typing.Set[str],
+    cache: ReleaseNotesCache,
+):
+    '''
+    determines the pull requests that need not be retrieved, as they are known to be unmodified
+    since they were cached (or as they were modified, and thus returned from a listing of recently
+    modified pull requests, which is cheaper than retrieving each of them).
+
+    returns a tuple of ({pr number: pr dict}, sync timestamp to store)
+    '''
+    repo_path = github_repo_path(owner=github_helper.owner, name=github_helper.repository_name)
+    synced_at = cache.get_value(ReleaseNotesCache.pull_requests_synced_at_key(repo_path))
+    if not synced_at:
+        return {}, None
+
+    pr_dicts = {}
+    new_synced_at = synced_at
+    for pr_dict in pull_requests_updated_since(github_helper, updated_since=synced_at):
+        new_synced_at = max(new_synced_at, pr_dict['updated_at'])
+        if str(pr_dict['number']) in pr_numbers:
+            pr_dicts[str(pr_dict['number'])] = pr_dict
+
+    # all other cached pull requests were not modified since they were cached
+    for pr_number in pr_numbers:
+        if pr_number in pr_dicts:
+            continue
+        updated_at = cache.get_value(
+            ReleaseNotesCache.pull_request_updated_at_key(repo_path=repo_path, pr_number=pr_number)
+        )
+        if updated_at and cache.get_value(ReleaseNotesCache.pull_request_key(
+            repo_path=repo_path,
+            pr_number=pr_number,
+            updated_at=updated_at,
+        )) is not None:
+            # only number and timestamp are required to look up cached release notes
+            pr_dicts[pr_number] = {'number': pr_number, 'updated_at': updated_at}
+
+    return pr_dicts, new_synced_at
 
 
 def fetch_release_notes_from_prs(
     github_helper: GitHubRepositoryHelper,
     pr_numbers_in_range: typing.Set[str],
-    cn_current_repo: ComponentName
+    cn_current_repo: ComponentName,
+    cache: ReleaseNotesCache=None,
 ) -> [ReleaseNote]:
-    # we should consider adding a release-note label to the PRs
-    # to reduce the number of search results
-    prs_iter = github_helper.search_issues_in_repo('type:pull is:closed')
+    '''
+    returns the release notes from the given pull requests. If a persistent cache is given,
+    only pull requests that are unknown to it are retrieved individually. Cached pull requests
+    modified since the last run are determined by listing the recently modified pull requests.
+    '''
+    pr_numbers_in_range = {str(pr_number) for pr_number in pr_numbers_in_range}
+    pr_dicts = {}
+    synced_at = None
+    if cache and cache.is_persistent():
+        pr_dicts, synced_at = _cached_pull_request_dicts(
+            github_helper=github_helper,
+            pr_numbers=pr_numbers_in_range,
+            cache=cache,
+        )
 
-    release_notes = list()
-    for pr_iter in prs_iter:
-        pr_dict = pr_iter.as_dict()
+    for pr_dict in fetch_pull_requests(github_helper, pr_numbers_in_range - pr_dicts.keys()):
+        pr_dicts[str(pr_dict['number'])] = pr_dict
+        if not synced_at or pr_dict['updated_at'] > synced_at:
+            synced_at = pr_dict['updated_at']
 
-        pr_number = str(pr_dict['number'])
-        if pr_number not in pr_numbers_in_range:
-            continue
+    if cache and cache.is_persistent() and synced_at:
+        repo_path = github_repo_path(owner=github_helper.owner, name=github_helper.repository_name)
+        cache.put_value(ReleaseNotesCache.pull_requests_synced_at_key(repo_path), synced_at)
 
-        release_notes_pr = extract_release_notes(
-            reference_id=pr_number,
-            text=pr_dict['body'],
-            user_login=_.get(pr_dict, 'user.login'),
+    release_notes = list()
+    for pr_number in sorted(pr_dicts, key=int):
+        release_notes_pr = release_notes_from_pr(
+            github_helper=github_helper,
+            pr_dict=pr_dicts[pr_number],
             cn_current_repo=cn_current_repo,
-            reference_type=REF_TYPE_PULL_REQUEST
+            cache=cache,
         )
         if not release_notes_pr:
             continue
@@ -353,26 +559,37 @@ def fetch_release_notes_from_prs(
     return release_notes
 
 
+def release_notes_from_commit(
+    commit: Commit,
+    cn_current_repo: ComponentName
+) -> [ReleaseNote]:
+    return extract_release_notes(
+        reference_id=commit.hash,
+        text=commit.message,
+        user_login=None, # we do not have the gitHub user at hand
+        cn_current_repo=cn_current_repo,
+        reference_type=REF_TYPE_COMMIT
+    )
+
+
 def fetch_release_notes_from_commits(
     commits: [Commit],
     cn_current_repo: ComponentName
 ):
     release_notes = list()
     for commit in commits:
-        release_notes_commit = extract_release_notes(
-            reference_id=commit.hash,
-            text=commit.message,
-            user_login=None, # we do not have the gitHub user at hand
-            cn_current_repo=cn_current_repo,
-            reference_type=REF_TYPE_COMMIT
-        )
-        if not release_notes_commit:
-            continue
-
-        release_notes.extend(release_notes_commit)
+        release_notes.extend(release_notes_from_commit(commit, cn_current_repo))
     return release_notes
 
 
+_RELEASE_NOTE_BLOCK_PATTERN = re.compile(
+    r"``` *(?P<category>improvement|noteworthy|action) (?P<target_group>user|operator)"
+    r"( (?P<source_repo>\S+/\S+/\S+)(( (?P<reference_type>#|\$)(?P<reference_id>\S+))?"
+    r"( @(?P<user>\S+))?)( .*?)?|( .*?)?)\r?\n(?P<text>.*?)\n```",
+    re.MULTILINE | re.DOTALL
+)
+
+
 def extract_release_notes(
     reference_type: ReferenceType,
     text: str,
@@ -390,16 +607,11 @@ def extract_release_notes(
     cn_current_repo -- component name of the current repository
     """
     release_notes = list()
-    if not text:
+    # cheap pre-check: most texts do not contain any code block at all
+    if not text or '```' not in text:
         return release_notes
 
-    r = re.compile(
-        r"``` *(?P<category>improvement|noteworthy|action) (?P<target_group>user|operator)"
-        r"( (?P<source_repo>\S+/\S+/\S+)(( (?P<reference_type>#|\$)(?P<reference_id>\S+))?"
-        r"( @(?P<user>\S+))?)( .*?)?|( .*?)?)\r?\n(?P<text>.*?)\n```",
-        re.MULTILINE | re.DOTALL
-    )
-    for m in r.finditer(text):
+    for m in _RELEASE_NOTE_BLOCK_PATTERN.finditer(text):
         code_block = m.groupdict()
         try:
             rls_note_block = release_note_block(
@@ -414,7 +626,7 @@ def extract_release_notes(
             release_notes.append(rls_note_block)
         except ModelValidationError:
             warning('skipping invalid origin repository: {source_repo}'.format(
-                source_repo=source_repo
+                source_repo=code_block.get('source_repo')
             ))
             continue
     return release_notes
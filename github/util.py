@@ -16,11 +16,17 @@
 import datetime
 import enum
 import functools
-import io
+import json
+import os
 import re
 import semver
 import sys
+import tempfile
+import threading
+import time
 import urllib.parse
+import yaml
+from concurrent.futures import ThreadPoolExecutor
 from pydash import _
 
 import requests
@@ -33,7 +39,9 @@ from github3.orgs import Team
 
 import util
 import product.model
+import version
 
+from github.ratelimit import rate_limited_adapter_ctor
 from http_requests import mount_default_adapter, log_stack_trace_information
 from product.model import DependencyBase
 from model.github import GithubConfig
@@ -42,6 +50,15 @@ from model.github import GithubConfig
 log_github_access = False
 
 
+# release version indices per repository (API URL)
+_release_version_indices = util.TTLCache(ttl_seconds=600)
+# public email addresses of GitHub users per (API URL, user name)
+# (see load_user_email_addresses / store_user_email_addresses for persisting them)
+_user_email_addresses = util.TTLCache(ttl_seconds=3600)
+# login names of GitHub team members per (API URL, organisation name, team name)
+_team_member_names = util.TTLCache(ttl_seconds=600)
+
+
 class RepoPermission(enum.Enum):
     PULL = "pull"
     PUSH = "push"
@@ -162,20 +179,17 @@ class UpgradePullRequest(object):
         - the destination version is greater than the greatest reference component version
         '''
         # find matching component versions
-        reference_refs = sorted(
-            [
-                rc for rc in
+        reference_versions = version.VersionIndex(
+            versions=(
+                rc.version() for rc in
                 reference_component.dependencies().references(type_name=self.reference_type_name)
                 if rc.name() == self.ref_name
-            ],
-            key=lambda r: semver.parse_version_info(r.version())
+            ),
         )
-        if not reference_refs:
+        greatest_reference_version = reference_versions.latest()
+        if greatest_reference_version is None:
             return False # special case: we have a new reference
 
-        # sorted will return the greatest version last
-        greatest_reference_version = semver.parse_version_info(reference_refs[-1].version())
-
         # PR is obsolete if same or newer component version is already configured in reference
         return greatest_reference_version >= semver.parse_version_info(self.to_ref.version())
 
@@ -413,19 +427,11 @@ class GitHubRepositoryHelper(RepositoryHelperBase):
         util.not_none(release_tag)
         util.not_none(asset_label)
 
-        release = self.repository.release_from_tag(release_tag)
-        for asset in release.assets():
-            if asset.label == asset_label or asset.name == asset_label:
-                break
-        else:
-            response = requests.Response()
-            response.status_code = 404
-            response.json = lambda: {'message':'no asset with label {} found'.format(asset_label)}
-            raise NotFoundError(resp=response)
+        asset_ids = _release_asset_ids(self.repository, release_tag)
+        asset_id = _asset_id_by_label(asset_ids, asset_label)
 
-        buffer = io.BytesIO()
-        asset.download(buffer)
-        return buffer.getvalue().decode()
+        with _open_release_asset(self.repository, asset_id) as response:
+            return response.content.decode()
 
     def release_versions(self):
         for tag_name in self.release_tags():
@@ -434,6 +440,17 @@ class GitHubRepositoryHelper(RepositoryHelperBase):
             except ValueError:
                 pass # ignore
 
+    def release_version_index(self) -> version.VersionIndex:
+        '''
+        returns a `VersionIndex` of this repository's (semver) release versions. Indices are
+        shared between helper instances for the same repository and expire after
+        `_release_version_indices.ttl_seconds`.
+        '''
+        return _release_version_indices.get_or_compute(
+            self.repository.url,
+            lambda: version.VersionIndex(versions=self.release_versions()),
+        )
+
     def release_tags(self):
         return _ \
             .chain(self.repository.releases()) \
@@ -452,6 +469,140 @@ class GitHubRepositoryHelper(RepositoryHelperBase):
         return search_result
 
 
+def _not_found_error(message: str):
+    response = requests.Response()
+    response.status_code = 404
+    response.json = lambda: {'message': message}
+    return NotFoundError(resp=response)
+
+
+def _release_asset_ids(repository, release_tag: str):
+    '''
+    returns a dict {asset_label_or_name: asset_id} for the release with the given tag, using
+    a single API request (the release representation already contains all its assets).
+    '''
+    url = '{r}/releases/tags/{t}'.format(
+        r=repository.url,
+        t=urllib.parse.quote(release_tag, safe=''),
+    )
+    response = repository.session.get(url)
+    if response.status_code == 404:
+        raise NotFoundError(resp=response)
+    response.raise_for_status()
+
+    asset_ids = {}
+    for asset in response.json()['assets']:
+        asset_ids[asset['name']] = asset['id']
+        if asset.get('label'):
+            asset_ids[asset['label']] = asset['id']
+    return asset_ids
+
+
+def _asset_id_by_label(asset_ids: dict, asset_label: str):
+    try:
+        return asset_ids[asset_label]
+    except KeyError:
+        raise _not_found_error('no asset with label {} found'.format(asset_label))
+
+
+def _open_release_asset(repository, asset_id):
+    '''
+    returns a streaming response for the contents of the release asset with the given id.
+    The caller is responsible for closing the response.
+    '''
+    url = '{r}/releases/assets/{i}'.format(r=repository.url, i=asset_id)
+    response = repository.session.get(
+        url,
+        headers={'Accept': 'application/octet-stream'},
+        stream=True,
+    )
+    if response.status_code >= 400:
+        try:
+            # exceptions are created from the response body - read it before closing
+            if response.status_code == 404:
+                raise NotFoundError(resp=response)
+            response.content
+            response.raise_for_status()
+        finally:
+            response.close()
+    # transparently decompress transfer-encoded contents when reading from `raw`
+    response.raw.decode_content = True
+    return response
+
+
+class ReleaseAssetFetcher(object):
+    '''
+    retrieves the contents of GitHub release assets.
+
+    Repository objects are cached per (host, owner, name). The asset ids of already seen
+    releases are kept in an index shared between all instances, so retrieving an asset from a
+    known release costs exactly one request (the download itself).
+
+    Instances are thread-safe.
+    '''
+    _asset_ids = {} # (host, owner, name): {release_tag: {asset_label_or_name: asset_id}}
+    _asset_ids_lock = threading.Lock()
+
+    def __init__(self, github_api_lookup):
+        '''
+        @param github_api_lookup: callable returning a `GitHub` object for a given host name
+        '''
+        self._github_api_lookup = util.not_none(github_api_lookup)
+        self._repositories = {}
+        self._repositories_lock = threading.Lock()
+
+    def repository(self, host: str, owner: str, name: str):
+        key = (host, owner, name)
+        with self._repositories_lock:
+            if key in self._repositories:
+                return self._repositories[key]
+
+        github_api = self._github_api_lookup(host)
+        try:
+            repository = github_api.repository(owner, name)
+        except NotFoundError as nfe:
+            raise RuntimeError(f'failed to retrieve repository {owner}/{name}', nfe)
+
+        with self._repositories_lock:
+            return self._repositories.setdefault(key, repository)
+
+    def _asset_id(self, repository, key, release_tag: str, asset_label: str):
+        with self._asset_ids_lock:
+            asset_ids = self._asset_ids.get(key, {}).get(release_tag)
+
+        if asset_ids is None:
+            asset_ids = _release_asset_ids(repository, release_tag)
+            with self._asset_ids_lock:
+                self._asset_ids.setdefault(key, {})[release_tag] = asset_ids
+
+        return _asset_id_by_label(asset_ids, asset_label)
+
+    def _open_asset(self, host: str, owner: str, name: str, release_tag: str, asset_label: str):
+        key = (host, owner, name)
+        repository = self.repository(host=host, owner=owner, name=name)
+        asset_id = self._asset_id(repository, key, release_tag, asset_label)
+        try:
+            return _open_release_asset(repository, asset_id)
+        except NotFoundError:
+            # asset might have been replaced since it was indexed - retry once w/ fresh index
+            with self._asset_ids_lock:
+                self._asset_ids.get(key, {}).pop(release_tag, None)
+            asset_id = self._asset_id(repository, key, release_tag, asset_label)
+            return _open_release_asset(repository, asset_id)
+
+    def asset_contents(self, host: str, owner: str, name: str, release_tag: str, asset_label: str):
+        with self._open_asset(host, owner, name, release_tag, asset_label) as response:
+            return response.content.decode()
+
+    def asset_yaml(self, host: str, owner: str, name: str, release_tag: str, asset_label: str):
+        '''
+        returns the parsed contents of the given YAML release asset. The asset is parsed while
+        it is being downloaded, without buffering it as a whole.
+        '''
+        with self._open_asset(host, owner, name, release_tag, asset_label) as response:
+            return yaml.safe_load(response.raw)
+
+
 def github_api_ctor(github_url: str, verify_ssl: bool=True):
     '''returns the appropriate github3.GitHub constructor for the given github URL
 
@@ -497,7 +648,13 @@ def _create_github_api_object(
     if not github_api:
         util.fail("Could not connect to GitHub-instance {url}".format(url=github_url))
 
-    session = mount_default_adapter(github_api.session)
+    session = mount_default_adapter(
+        github_api.session,
+        http_adapter_ctor=rate_limited_adapter_ctor(
+            host=urllib.parse.urlparse(github_url).hostname,
+            auth_token=github_auth_token,
+        ),
+    )
 
     if log_github_access:
         session.hooks['response'] = log_stack_trace_information
@@ -518,29 +675,113 @@ def branches(
 def retrieve_email_addresses(
     github_cfg: GithubConfig,
     github_users: [str],
-    out_file: str=None
+    out_file: str=None,
+    cache_file: str=None,
+    max_workers: int=8,
+    cache_ttl_seconds: float=24 * 3600,
 ):
+    '''
+    writes the public email addresses of the given GitHub users to `out_file` (or stdout),
+    preserving the order of the given users. Users (and email addresses) are written only once;
+    users are looked-up concurrently, unknown users are skipped.
+
+    If `cache_file` is given, email addresses are read from (and stored to) it (see
+    `load_user_email_addresses`). Email addresses retrieved for the cache file expire after
+    `cache_ttl_seconds` (instead of the default of one hour used for in-process caching).
+    '''
     github = _create_github_api_object(github_cfg=github_cfg)
 
+    user_names = []
+    seen_user_names = set()
+    for user_name in github_users:
+        # GitHub user names are case-insensitive
+        if user_name.lower() not in seen_user_names:
+            seen_user_names.add(user_name.lower())
+            user_names.append(user_name)
+
+    if cache_file:
+        load_user_email_addresses(cache_file=cache_file)
+
     def retrieve_email(username: str):
-        user = github.user(username)
-        return user.email
+        try:
+            return user_email_address(
+                github,
+                username,
+                ttl_seconds=cache_ttl_seconds if cache_file else None,
+            )
+        except NotFoundError:
+            util.warning('GitHub user {u} does not exist'.format(u=username))
+            return None
 
-    fh = open(out_file, 'w') if out_file else sys.stdout
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        email_addresses = list(executor.map(retrieve_email, user_names))
 
-    email_addresses_count = 0
+    if cache_file:
+        store_user_email_addresses(cache_file=cache_file)
 
-    for email_address in filter(None, map(retrieve_email, github_users)):
+    fh = open(out_file, 'w') if out_file else sys.stdout
+
+    written_email_addresses = set()
+    for email_address in filter(None, email_addresses):
+        if email_address in written_email_addresses:
+            continue
         fh.write(email_address + '\n')
-        email_addresses_count += 1
+        written_email_addresses.add(email_address)
+
+    if out_file:
+        fh.close()
 
     util.verbose('retrieved {sc} email address(es) from {uc} user(s)'.format(
-        sc=email_addresses_count,
-        uc=len(github_users)
+        sc=len(written_email_addresses),
+        uc=len(user_names)
     )
     )
 
 
+def load_user_email_addresses(cache_file: str):
+    '''
+    adds the user email addresses stored in the given file (see `store_user_email_addresses`)
+    to the cache used by `user_email_address` (and thus also by CODEOWNERS resolution).
+    Absent files are ignored.
+    '''
+    if not os.path.isfile(cache_file):
+        return
+    with open(cache_file) as f:
+        entries = json.load(f)
+
+    now = time.time()
+    for entry in entries:
+        ttl_seconds = entry['expiry'] - now
+        if ttl_seconds > 0:
+            _user_email_addresses.put(
+                (entry['api_url'], entry['user_name']),
+                entry['email'],
+                ttl_seconds=ttl_seconds,
+            )
+    util.verbose('read {n} cached user email address(es) from {f}'.format(
+        n=len(entries),
+        f=cache_file,
+    ))
+
+
+def store_user_email_addresses(cache_file: str):
+    '''
+    writes all (unexpired) cached user email addresses to the given file
+    '''
+    now = time.time()
+    entries = [
+        {'api_url': api_url, 'user_name': user_name, 'email': email, 'expiry': now + ttl_seconds}
+        for (api_url, user_name), ttl_seconds, email in _user_email_addresses.items()
+    ]
+
+    cache_dir = os.path.dirname(os.path.abspath(cache_file))
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(entries, f)
+    os.replace(tmp_path, cache_file)
+
+
 def _create_team(
     github: GitHub,
     organization_name: str,
@@ -599,34 +840,139 @@ def _add_all_repos_to_team(
     github: GitHub,
     organization_name: str,
     team_name: str,
-    permission: RepoPermission=RepoPermission.ADMIN
+    permission: RepoPermission=RepoPermission.ADMIN,
+    dry_run: bool=False,
+    max_workers: int=4,
 ):
-    '''Add all repos found in `organization_name` to the given `team_name`'''
+    '''Add all repos found in `organization_name` to the given `team_name`
+
+    The team's repositories are retrieved once and compared to the organisation's repositories.
+    Missing repositories are added concurrently (requests are throttled according to the GitHub
+    rate limit, see `github.ratelimit`). If `dry_run` is set, missing repositories are only
+    reported.
+
+    @return list of the full names of the repositories (to be) added
+    '''
     # passed GitHub object must have org admin authorization to assign team to repo with admin rights
     organization = github.organization(organization_name)
     team = _retrieve_team_by_name_or_none(organization, team_name)
-    if not team:
+    if not team and not dry_run:
         util.fail("Team {name} does not exist".format(name=team_name))
 
-    for repo in organization.repositories():
-        if team.has_repository(repo.full_name):
-            util.verbose("Team {teamnname} already assigned to repo {reponame}".format(
-                teamnname=team_name,
-                reponame=repo.full_name
+    team_repo_names = {repo.full_name.lower() for repo in team.repositories()} if team else set()
+    repo_names = [repo.full_name for repo in organization.repositories()]
+    missing_repo_names = [name for name in repo_names if name.lower() not in team_repo_names]
+
+    util.verbose("Team {teamname} is assigned to {a} of {r} repositories".format(
+        teamname=team_name,
+        a=len(repo_names) - len(missing_repo_names),
+        r=len(repo_names),
+    ))
+
+    if dry_run:
+        for repo_name in missing_repo_names:
+            util.info("Would add team {teamname} to repository {reponame}".format(
+                teamname=team_name,
+                reponame=repo_name,
             ))
-            continue
+        util.info("{c} repositories would be added to team {teamname} (dry-run)".format(
+            c=len(missing_repo_names),
+            teamname=team_name,
+        ))
+        return missing_repo_names
+
+    def add_repository(repo_name):
+        return team.add_repository(repository=repo_name, permission=permission.value)
 
-        team.add_repository(repository=repo.full_name, permission=permission.value)
-        util.info("Added team {teamname} to repository {reponame}".format(
+    failed_repo_names = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for repo_name, added in zip(
+            missing_repo_names,
+            executor.map(add_repository, missing_repo_names),
+        ):
+            if added:
+                util.info("Added team {teamname} to repository {reponame}".format(
+                    teamname=team_name,
+                    reponame=repo_name
+                ))
+            else:
+                failed_repo_names.append(repo_name)
+
+    if failed_repo_names:
+        util.fail("Could not add team {teamname} to repositories {reponames}".format(
             teamname=team_name,
-            reponame=repo.full_name
+            reponames=', '.join(failed_repo_names),
         ))
 
+    return missing_repo_names
+
+
+def _team_slug(team_name: str):
+    # GitHub derives team slugs from team names (special characters are replaced by dashes)
+    return re.sub(r'[^a-z0-9_]+', '-', team_name.lower()).strip('-')
+
 
 def _retrieve_team_by_name_or_none(
     organization: github3.orgs.Organization,
     team_name: str
 ) -> Team:
+    team = _retrieve_team_by_slug_or_none(organization, _team_slug(team_name))
+    if team and team.name == team_name:
+        return team
+    # slug does not match the name (e.g. after renaming the team) - look through all teams
+    return _find_team_by_name_or_none(organization, team_name)
+
 
+def _find_team_by_name_or_none(
+    organization: github3.orgs.Organization,
+    team_name: str
+) -> Team:
     team_list = list(filter(lambda t: t.name == team_name, organization.teams()))
     return team_list[0] if team_list else None
+
+
+def _retrieve_team_by_slug_or_none(
+    organization: github3.orgs.Organization,
+    team_slug: str
+) -> Team:
+    try:
+        return organization.team_by_name(team_slug)
+    except NotFoundError:
+        return None
+
+
+def _api_url(github_api: GitHub):
+    return github_api.session.base_url
+
+
+def user_email_address(github_api: GitHub, user_name: str, ttl_seconds: float=None):
+    '''
+    returns the public email address of the given GitHub user (or `None` if the user did not
+    publish one). Results are cached for all api objects talking to the same GitHub instance
+    (for `ttl_seconds`, defaulting to one hour).
+    '''
+    return _user_email_addresses.get_or_compute(
+        (_api_url(github_api), user_name.lower()),
+        lambda: github_api.user(user_name).email,
+        ttl_seconds=ttl_seconds,
+    )
+
+
+def team_member_names(github_api: GitHub, organization_name: str, team_name: str):
+    '''
+    returns the login names of the members of the given team (or `None` if there is no such
+    team). The team is looked-up by its slug; teams whose slug differs from their name are found
+    by listing all teams of the organisation as a fallback. Results are cached.
+    '''
+    def retrieve_member_names():
+        organization = github_api.organization(organization_name)
+        team = _retrieve_team_by_slug_or_none(organization, team_name) or \
+            _find_team_by_name_or_none(organization, team_name)
+        if not team:
+            return None
+        return [member.login for member in team.members()]
+
+    return _team_member_names.get_or_compute(
+        (_api_url(github_api), organization_name.lower(), team_name.lower()),
+        retrieve_member_names,
+    )
@@ -13,18 +13,107 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import contextlib
+import fcntl
 import functools
+import io
 import os
+import re
+import stat
 import subprocess
+import threading
 import urllib.parse
 
 import git
 import git.objects.util
+from gitdb.base import IStream
+from gitdb.typ import str_blob_type, str_tree_type
+from gitdb.util import hex_to_bin
 
 from github.util import GitHubRepoBranch
 
-from util import not_empty, not_none, existing_dir, fail, random_str, urljoin
+from util import not_empty, not_none, existing_dir, fail, random_str, urljoin, verbose
+
+
+# if set, clones are made from (and refresh) bare mirrors kept in this directory
+MIRROR_CACHE_DIR_ENV_VAR = 'CC_GIT_MIRROR_CACHE_DIR'
+
+# git tree entry modes
+_FILE_MODE = 0o100644
+_EXECUTABLE_MODE = 0o100755
+_SYMLINK_MODE = 0o120000
+_GITLINK_MODE = 0o160000
+_TREE_MODE = stat.S_IFDIR
+# raw tree entry: <octal mode> <name>\0<20 bytes binary sha>
+_TREE_ENTRY_PATTERN = re.compile(rb'([0-7]+) ([^\0]*)\0(.{20})', re.DOTALL)
+
+
+class MirrorCache(object):
+    '''
+    a cache of bare mirror repositories kept in a local directory, keyed by repository URL
+    (w/o credentials). Mirrors are created on first use and refreshed using incremental fetches
+    afterwards. Clones may borrow objects from a mirror (`git clone --reference`), so only
+    objects not yet present in the mirror are transferred via network.
+
+    Mirrors are locked during updates, so a cache directory may be shared between processes.
+    '''
+    # only mirror branches and tags (GitHub also advertises e.g. refs/pull/*)
+    REFSPECS = ('+refs/heads/*:refs/heads/*', '+refs/tags/*:refs/tags/*')
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = existing_dir(cache_dir)
+        self._lock = threading.Lock()
+        self._mirror_locks = {} # mirror_dir: threading.Lock
+
+    def mirror_dir(self, url: str) -> str:
+        return os.path.join(
+            self.cache_dir,
+            urllib.parse.quote(_url_without_credentials(url), safe='') + '.git',
+        )
+
+    @contextlib.contextmanager
+    def _locked(self, mirror_dir: str):
+        with self._lock:
+            mirror_lock = self._mirror_locks.setdefault(mirror_dir, threading.Lock())
+        with mirror_lock, open(mirror_dir + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update(self, url: str) -> str:
+        '''
+        creates or refreshes the mirror of the repository with the given url
+        @return the path to the (bare) mirror repository
+        '''
+        mirror_dir = self.mirror_dir(url)
+        with self._locked(mirror_dir):
+            if not os.path.isdir(mirror_dir):
+                verbose(f'creating git mirror {mirror_dir}')
+                git.Git().init('--bare', '--quiet', mirror_dir)
+            # pass the url (which may contain credentials) only on the command line, so it is
+            # not persisted in the mirror's configuration
+            git.Git(mirror_dir).fetch('--quiet', '--prune', url, *self.REFSPECS)
+        return mirror_dir
+
+
+def default_mirror_cache():
+    '''
+    returns a `MirrorCache` for the directory configured via `CC_GIT_MIRROR_CACHE_DIR`
+    (or `None` if unset)
+    '''
+    cache_dir = os.environ.get(MIRROR_CACHE_DIR_ENV_VAR)
+    if not cache_dir:
+        return None
+    return _mirror_cache(os.path.abspath(cache_dir))
+
+
+@functools.lru_cache()
+def _mirror_cache(cache_dir: str):
+    os.makedirs(cache_dir, exist_ok=True)
+    return MirrorCache(cache_dir=cache_dir)
 
 
 class GitHelper(object):
@@ -43,11 +132,35 @@ class GitHelper(object):
         github_cfg,
         github_repo_path: str,
         checkout_branch: str = None,
+        depth: int = None,
+        filter_spec: str = None,
+        mirror_cache: MirrorCache = None,
+        dissociate: bool = True,
     ) -> 'GitHelper':
+        '''clones the given repository into the given directory
+
+        @param depth: if set, only the given number of commits is fetched (shallow clone)
+        @param filter_spec: if set, a partial clone is made (e.g. 'blob:none' to omit all blobs
+            not needed for the checkout)
+        @param mirror_cache: mirror to borrow objects from; defaults to `default_mirror_cache()`.
+            Not used for shallow or partial clones.
+        @param dissociate: whether to copy borrowed objects from the mirror into the clone (so the
+            clone stays usable if the mirror is removed)
+        '''
         url = url_with_credentials(github_cfg, github_repo_path)
         args = ['--quiet']
         if checkout_branch is not None:
             args += ['--branch', checkout_branch, '--single-branch']
+        if depth is not None:
+            args += ['--depth', str(depth)]
+        if filter_spec is not None:
+            args += ['--filter', filter_spec]
+        if mirror_cache is None:
+            mirror_cache = default_mirror_cache()
+        if mirror_cache and depth is None and filter_spec is None:
+            args += ['--reference', mirror_cache.update(url)]
+            if dissociate:
+                args.append('--dissociate')
         args += [url, target_directory]
         git.Git().clone(*args)
         return GitHelper(
@@ -90,17 +203,82 @@ class GitHelper(object):
         finally:
             self.repo.delete_remote(remote)
 
+    def _changed_paths(self):
+        '''returns all paths that differ between head and worktree (including renamed and
+        untracked files, but not ignored ones)
+        '''
+        output = git.cmd.Git(self.repo.working_tree_dir).status(
+            '--porcelain=1', '-z', '--untracked-files=all',
+        )
+        tokens = iter(output.split('\x00'))
+        for token in tokens:
+            if not token:
+                continue
+            yield token[3:].rstrip('/')
+            if token[0] in 'RC':
+                yield next(tokens) # source path of a rename / copy
+
+    def _write_worktree_entries(self, paths):
+        '''writes the worktree contents of the given paths to the object database
+
+        @return dict {path: (binsha, mode)}; deleted paths are mapped to `None`
+        '''
+        work_dir = self.repo.working_tree_dir
+        entries = {}
+        file_paths = []
+        for path in paths:
+            abs_path = os.path.join(work_dir, path)
+            if not os.path.lexists(abs_path):
+                entries[path] = None
+                continue
+            mode = os.lstat(abs_path).st_mode
+            if stat.S_ISLNK(mode):
+                entries[path] = (
+                    _store_blob(self.repo.odb, os.fsencode(os.readlink(abs_path))),
+                    _SYMLINK_MODE,
+                )
+            elif stat.S_ISDIR(mode):
+                # submodule or nested repository - record its head commit
+                entries[path] = (git.Repo(abs_path).head.commit.binsha, _GITLINK_MODE)
+            else:
+                entries[path] = (None, _EXECUTABLE_MODE if mode & stat.S_IXUSR else _FILE_MODE)
+                file_paths.append(path)
+
+        if file_paths:
+            # write all blobs with a single process (honouring filters, e.g. crlf conversion)
+            # We must keep a reference to auto_interrupt as it closes all streams to the
+            # subprocess on finalisation
+            auto_interrupt = git.cmd.Git(work_dir).hash_object(
+                '-w', '--stdin-paths', istream=subprocess.PIPE, as_process=True,
+            )
+            process = auto_interrupt.proc
+            stdout, stderr = process.communicate(input='\n'.join(file_paths).encode())
+            if process.returncode != 0:
+                fail('failed to write blobs: {e}'.format(e=stderr.decode('utf-8')))
+            hexshas = stdout.decode('utf-8').split()
+            for path, hexsha in zip(file_paths, hexshas):
+                entries[path] = (hex_to_bin(hexsha), entries[path][1])
+
+        return entries
+
     def index_to_commit(self, message, parent_commits=None):
         '''moves all diffs from worktree to a new commit without modifying branches
 
+        Only changed entries are written to the object database; unchanged (sub-)trees of
+        head are reused. The index is not modified.
+
         @param parent_commits: optional iterable of parent commits; head is used if absent
         @return the git.Commit object representing the newly created commit
         '''
         if not parent_commits:
             parent_commits = [self.repo.head.commit]
-        # add all changes
-        git.cmd.Git(self.repo.working_tree_dir).add('.')
-        tree = self.repo.index.write_tree()
+        changed_entries = self._write_worktree_entries(self._changed_paths())
+        tree = patch_tree(
+            odb=self.repo.odb,
+            tree_binsha=self.repo.head.commit.tree.binsha,
+            changes=changed_entries,
+        )
+        tree = git.Tree(self.repo, tree, path='')
 
         if self.github_cfg:
             credentials = self.github_cfg.credentials()
@@ -121,7 +299,6 @@ class GitHelper(object):
             parent_commits=parent_commits,
             message=message
         )
-        self.repo.index.reset()
         return commit
 
     def _stash_changes(self):
@@ -157,9 +334,10 @@ class GitHelper(object):
         self.repo.git.rebase('--quiet', commit_ish)
 
     def fetch_head(self, ref: str):
-        with self._authenticated_remote() as remote:
-            fetch_result = remote.fetch(ref)[0]
-            return fetch_result.commit
+        # fetch from url directly (w/o adding a temporary remote)
+        url = url_with_credentials(self.github_cfg, self.github_repo_path)
+        self.repo.git.fetch('--quiet', url, ref)
+        return self.repo.commit('FETCH_HEAD')
 
 
 def url_with_credentials(github_cfg, github_repo_path):
@@ -177,6 +355,16 @@ def url_with_credentials(github_cfg, github_repo_path):
     return url
 
 
+def _url_without_credentials(url: str):
+    parsed_url = urllib.parse.urlparse(url)
+    if not parsed_url.username and not parsed_url.password:
+        return url
+    netloc = parsed_url.hostname
+    if parsed_url.port:
+        netloc += f':{parsed_url.port}'
+    return urllib.parse.urlunparse(parsed_url._replace(netloc=netloc))
+
+
 def update_submodule(
     repo_path: str,
     tree_ish: str,
@@ -230,27 +418,24 @@ def update_submodule(
     repo = git.Repo(repo_path)
     _ensure_submodule_exists(repo, submodule_path)
 
-    # Create mk-tree-parseable string-representation from given tree-ish.
+    # write the patched tree to the object database (only the root tree changes)
     tree = repo.tree(tree_ish)
-    tree_representation = _serialise_and_update_submodule(tree, submodule_path, commit_hash)
-
-    # Pass the patched tree to git mk-tree using GitPython. We cannot do this in GitPython
-    # directly as it does not support arbitrary tree manipulation.
-    # We must keep a reference to auto_interrupt as it closes all streams to the subprocess
-    # on finalisation
-    auto_interrupt = repo.git.mktree(istream = subprocess.PIPE, as_process=True)
-    process = auto_interrupt.proc
-    stdout, _= process.communicate(input=tree_representation.encode())
-
-    # returned string is byte-encoded and newline-terminated
-    new_sha = stdout.decode('utf-8').strip()
+    new_tree = git.Tree(
+        repo,
+        patch_tree(
+            odb=repo.odb,
+            tree_binsha=tree.binsha,
+            changes={submodule_path: (hex_to_bin(commit_hash), _GITLINK_MODE)},
+        ),
+        path='',
+    )
 
     # Create a new commit in the repo's object database from the newly created tree.
     actor = git.Actor(author, email)
     parent_commit = repo.commit(tree_ish)
     commit = git.Commit.create_from_tree(
       repo = repo,
-      tree = new_sha,
+      tree = new_tree,
       parent_commits = [parent_commit],
       message='Upgrade submodule {s} to commit {c}'.format(
           s=submodule_path,
@@ -263,54 +448,93 @@ def update_submodule(
     return commit.hexsha
 
 
-def _serialise_and_update_submodule(
-    tree: git.Tree,
-    submodule_path: str,
-    commit_hash: str,
-):
-    '''Return a modified, serialised tree-representation in which the given submodule's entry is
-    altered such that it points to the specified commit hash.
-    The returned serialisation  format is understood by git mk-tree.
+def _store_blob(odb, data: bytes):
+    return odb.store(IStream(str_blob_type, len(data), io.BytesIO(data))).binsha
 
-    Returns
-    ------
-        str
-            An updated serialised git-tree with the updated submodule entry
+
+def _read_tree_entries(odb, tree_binsha: bytes):
+    '''returns the entries of the given tree as dict {name: (binsha, mode)} (names as bytes)
+
+    The raw tree format is parsed directly, as GitPython's parser (which validates each entry)
+    is too slow for large trees.
     '''
-    # GitPython offers no API to retrieve ls-tree representation
-    return '\n'.join([
-        _serialise_object_replace_submodule(
-            tree_element=tree_element,
-            submodule_path=submodule_path,
-            commit_hash=commit_hash,
-        ) for tree_element in tree]
-    )
+    data = odb.stream(tree_binsha).read()
+    return {
+        name: (binsha, int(mode, 8))
+        for mode, name, binsha in _TREE_ENTRY_PATTERN.findall(data)
+    }
+
+
+def _tree_entry_sort_key(item):
+    # git sorts tree entries by name, with trees sorted as if their name ended with '/'
+    name, (_, mode) = item
+    return name + b'/' if mode == _TREE_MODE else name
+
+
+def patch_tree(odb, tree_binsha: bytes, changes: dict, _subtree=False):
+    '''writes a copy of the given tree with the given changes applied to the object database
+
+    Only the trees containing changed entries are read and written; all other subtrees are
+    reused as they are.
+
+    @param tree_binsha: binary sha of the tree to patch (`None` for an empty tree)
+    @param changes: dict {path: (binsha, mode)}. Paths are relative to the tree and separated
+        by '/'. Entries mapped to `None` are removed (trees left empty are removed as well).
+    @return the binary sha of the written tree
+    '''
+    entries = _read_tree_entries(odb, tree_binsha) if tree_binsha is not None else {}
+
+    subtree_changes = collections.defaultdict(dict)
+    changed_names = set()
+    for path, entry in changes.items():
+        name, _, sub_path = path.partition('/')
+        name = name.encode('utf-8')
+        if sub_path:
+            subtree_changes[name][sub_path] = entry
+            continue
+        changed_names.add(name)
+        if entry is None:
+            entries.pop(name, None)
+        else:
+            entries[name] = entry
+
+    for name, sub_changes in subtree_changes.items():
+        entry = entries.get(name)
+        if entry and entry[1] != _TREE_MODE:
+            if name in changed_names:
+                continue # tree was replaced (remaining changes are removals of its entries)
+            entry = None # file was replaced by a tree
+        subtree_binsha = patch_tree(
+            odb=odb,
+            tree_binsha=entry[0] if entry else None,
+            changes=sub_changes,
+            _subtree=True,
+        )
+        if subtree_binsha is None:
+            entries.pop(name, None)
+        else:
+            entries[name] = (subtree_binsha, _TREE_MODE)
 
+    if _subtree and not entries:
+        return None
 
-def _serialise_object_replace_submodule(tree_element, submodule_path, commit_hash):
-    # GitPython uses the special type 'submodule' for submodules whereas git uses 'commit'.
-    if tree_element.type == 'submodule':
-        element_type = 'commit'
-        # Replace the hash the of the 'commit'-tree with the passed value if the submodule
-        # is at the specified path
-        if tree_element.path == submodule_path:
-            element_sha = commit_hash
-    else:
-        element_type = tree_element.type
-        element_sha = tree_element.hexsha
-
-    return '{mode} {type} {sha}\t{path}'.format(
-        sha=element_sha,
-        type=element_type,
-        # mode is a number in octal representation WITHOUT '0o' prefix
-        mode=format(tree_element.mode, 'o'),
-        path=tree_element.path,
+    tree_data = b''.join(
+        b'%o %s\0%s' % (mode, name, binsha)
+        for name, (binsha, mode) in sorted(entries.items(), key=_tree_entry_sort_key)
     )
+    return odb.store(IStream(str_tree_type, len(tree_data), io.BytesIO(tree_data))).binsha
 
 
 def _ensure_submodule_exists(repo: git.Repo, path: str):
-    '''Use GitPython to verify that a submodule with the given path exists in the repository.'''
-    for submodule in repo.submodules:
-        if submodule.path == path:
+    '''Verify that a submodule with the given path is declared in the repository's .gitmodules.'''
+    # read .gitmodules using git config (GitPython's submodule listing traverses the whole tree)
+    try:
+        submodule_paths = repo.git.config(
+            '--blob', 'HEAD:.gitmodules', '--get-regexp', r'^submodule\..*\.path$',
+        ).split('\n')
+    except git.exc.GitCommandError:
+        submodule_paths = () # no .gitmodules (or no submodules declared)
+    for submodule_path in submodule_paths:
+        if submodule_path.split(' ', 1)[-1] == path:
             return
     fail('No submodule with path {p} exists in the repository.'.format(p=path))
@@ -14,8 +14,15 @@
 # limitations under the License.
 from functools import wraps
 
-import traceback
+import atexit
+import collections
 import datetime
+import json
+import random
+import sys
+import threading
+import time
+import traceback
 import requests
 from requests.auth import HTTPBasicAuth
 from requests.adapters import HTTPAdapter
@@ -52,8 +59,9 @@ def mount_default_adapter(
     session: requests.Session,
     connection_pool_cache_size=10, # requests-library default
     max_pool_size=10, # requests-library default
+    http_adapter_ctor=HTTPAdapter,
 ):
-    default_http_adapter = HTTPAdapter(
+    default_http_adapter = http_adapter_ctor(
         pool_connections = connection_pool_cache_size,
         pool_maxsize = max_pool_size,
         max_retries = LoggingRetry(
@@ -74,35 +82,148 @@ def mount_default_adapter(
     return session
 
 
-def log_stack_trace_information(resp, *args, **kwargs):
+class StackTraceTelemetry(object):
     '''
-    This function stores the current stacktrace in elastic search.
-    It must not return anything, otherwise the return value is assumed to replace the response
+    collects the call sites (stack traces) of HTTP requests and stores them in
+    Elasticsearch, e.g. in order to find code issuing excessive amounts of GitHub requests.
+
+    Recording a request is cheap: the (unformatted) stack is appended to a bounded ring
+    buffer (if the buffer is full, the oldest entries are dropped). A background thread
+    periodically drains the buffer, aggregates the entries by stack signature into counts
+    and stores one document per signature using a single bulk request. Pending entries
+    are flushed upon interpreter exit.
     '''
-    try:
-        els_index = "github_access_stacktrace"
-        els_config = "sap_internal"
-
-        try:
-            elastic_cfg = ctx().cfg_factory().elasticsearch(els_config)
-        except KeyError:
-            # do nothing: external concourse does not have els config
+    def __init__(
+        self,
+        index: str='github_access_stacktrace',
+        elasticsearch_cfg_name: str='sap_internal',
+        sample_rate: float=1.0,
+        buffer_size: int=10000,
+        flush_interval_seconds: float=30,
+    ):
+        self.index = index
+        self.elasticsearch_cfg_name = elasticsearch_cfg_name
+        self.sample_rate = sample_rate
+        self.flush_interval_seconds = flush_interval_seconds
+
+        self._buffer = collections.deque(maxlen=buffer_size)
+        self._recorded_count = 0
+        self._lock = threading.Lock() # guards thread start and counters
+        self._flush_lock = threading.Lock()
+        self._flush_thread = None
+        self._elastic_client = None
+        self._disabled = False
+
+    def record(self, resp):
+        if self._disabled:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
             return
 
-        now = datetime.datetime.utcnow()
-        json_body = {
-            'date': now.isoformat(),
-            'url': resp.url,
-            'req_method': resp.request.method,
-            'stacktrace': traceback.format_stack()
-        }
-
-        elastic_client = ccc.elasticsearch.from_cfg(elasticsearch_cfg=elastic_cfg)
-        elastic_client.store_document(
-            index=els_index,
-            body=json_body
+        # do not look up source lines (done lazily upon flush, if at all)
+        stack = traceback.StackSummary.extract(
+            traceback.walk_stack(sys._getframe(1)),
+            lookup_lines=False,
         )
+        self._buffer.append((
+            datetime.datetime.utcnow(),
+            resp.request.method,
+            resp.url,
+            stack,
+        ))
+
+        with self._lock:
+            self._recorded_count += 1
+            if not self._flush_thread:
+                self._flush_thread = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flush_thread.start()
+                atexit.register(self.flush)
+
+    def _flush_periodically(self):
+        while not self._disabled:
+            time.sleep(self.flush_interval_seconds)
+            self.flush()
+
+    def _client(self):
+        # resolve cfg (and create client) only once
+        if not self._elastic_client:
+            try:
+                elastic_cfg = ctx().cfg_factory().elasticsearch(self.elasticsearch_cfg_name)
+            except KeyError:
+                # external concourse does not have els config - stop collecting
+                self._disabled = True
+                self._buffer.clear()
+                return None
+            self._elastic_client = ccc.elasticsearch.from_cfg(elasticsearch_cfg=elastic_cfg)
+        return self._elastic_client
+
+    def _drain(self):
+        entries = []
+        while True:
+            try:
+                entries.append(self._buffer.popleft())
+            except IndexError:
+                return entries
+
+    @staticmethod
+    def aggregate(entries) -> [dict]:
+        '''
+        aggregates the given entries by request method and stack signature, and returns one
+        document per signature
+        '''
+        aggregated = {}
+        for date, method, url, stack in entries:
+            signature = (method, tuple((f.filename, f.lineno, f.name) for f in stack))
+            document = aggregated.get(signature)
+            if document is None:
+                aggregated[signature] = {
+                    'date': date.isoformat(),
+                    'req_method': method,
+                    'url': url, # example
+                    'count': 1,
+                    'stacktrace': stack,
+                }
+            else:
+                document['count'] += 1
+                document['date'] = date.isoformat()
+
+        documents = list(aggregated.values())
+        for document in documents:
+            # format outermost frame first (like traceback.format_stack)
+            document['stacktrace'] = traceback.format_list(list(reversed(document['stacktrace'])))
+        return documents
+
+    def flush(self):
+        with self._flush_lock:
+            entries = self._drain()
+            if not entries:
+                return
+            try:
+                elastic_client = self._client()
+                if not elastic_client:
+                    return
+                documents = self.aggregate(entries)
+                action = json.dumps({'index': {'_index': self.index, '_type': '_doc'}})
+                body = '\n'.join(
+                    line for document in documents
+                    for line in (action, json.dumps(document))
+                ) + '\n'
+                elastic_client.store_bulk(body=body)
+            except Exception as e:
+                info(f'Could not store stack trace information: {e}')
+
+
+# collects call sites of GitHub requests (if enabled, see github.util.log_github_access)
+_github_access_telemetry = StackTraceTelemetry()
+
 
+def log_stack_trace_information(resp, *args, **kwargs):
+    '''
+    This function records the current stacktrace, to be stored in elastic search.
+    It must not return anything, otherwise the return value is assumed to replace the response
+    '''
+    try:
+        _github_access_telemetry.record(resp)
     except Exception as e:
         info(f'Could not log stack trace information: {e}')
 
@@ -0,0 +1,221 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import queue
+import smtplib
+import threading
+from concurrent.futures import Future
+
+from model.email import EmailConfig
+from util import verbose, warning
+
+_STOP = object()
+
+
+class MailDeliveryService(object):
+    '''
+    delivers mails via SMTP from a background thread, so callers are not blocked.
+
+    One authenticated SMTP connection is kept open and reused for all mails; queued mails are
+    sent in batches over it. The connection is closed after being idle for
+    `idle_timeout_seconds` and re-established (and the mail re-sent) if it is lost while
+    sending. Mails rejected by the server are not retried.
+
+    `submit` returns a `concurrent.futures.Future` for each mail. Queued mails are delivered
+    before the interpreter exits.
+    '''
+    def __init__(
+        self,
+        smtp_host: str,
+        username: str,
+        password: str,
+        use_tls: bool=False,
+        smtp_port: int=0,
+        batch_size: int=100,
+        idle_timeout_seconds: float=30,
+        max_attempts: int=3,
+        timeout_seconds: float=60,
+    ):
+        self.smtp_host = smtp_host
+        self.smtp_port = smtp_port
+        self.use_tls = use_tls
+        self.batch_size = batch_size
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.max_attempts = max_attempts
+        self.timeout_seconds = timeout_seconds
+        self._username = username
+        self._password = password
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._smtp = None
+        self.connection_count = 0
+        self.delivered_count = 0
+
+    def submit(self, msg, sender: str, recipients) -> Future:
+        '''
+        queues the given mail (an `email.message.Message` or a string) for delivery
+        @return a future whose result is the dict of refused recipients (see smtplib.sendmail)
+        '''
+        future = Future()
+        self._queue.put((msg, sender, list(recipients), future))
+        self._ensure_worker()
+        return future
+
+    def flush(self):
+        '''
+        blocks until all queued mails were processed
+        '''
+        self._queue.join()
+
+    def close(self):
+        '''
+        delivers all queued mails, then closes the connection and stops the background thread
+        '''
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if not thread:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._deliver_queued, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _deliver_queued(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_timeout_seconds)
+            except queue.Empty:
+                self._disconnect()
+                continue
+
+            batch = [item]
+            while item is not _STOP and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+
+            for item in batch:
+                try:
+                    if item is not _STOP:
+                        self._deliver(*item)
+                finally:
+                    self._queue.task_done()
+
+            if batch[-1] is _STOP:
+                self._disconnect()
+                return
+
+    def _deliver(self, msg, sender, recipients, future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            self._send(msg, sender, recipients, future)
+        except Exception as e:
+            # e.g. non-ascii addresses (UnicodeEncodeError) - must not stop the worker thread
+            self._reset()
+            future.set_exception(e)
+
+    def _send(self, msg, sender, recipients, future):
+        if not isinstance(msg, str):
+            msg = msg.as_string()
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                refused_recipients = self._connection().sendmail(sender, recipients, msg)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                # rejected by server - retrying will not help
+                self._reset()
+                future.set_exception(e)
+                return
+            except OSError as e: # includes connection losses (e.g. SMTPServerDisconnected)
+                self._disconnect()
+                if attempt == self.max_attempts:
+                    future.set_exception(e)
+                    return
+                warning('failed to send mail (attempt {a}): {e} - reconnecting'.format(
+                    a=attempt,
+                    e=e,
+                ))
+            else:
+                self.delivered_count += 1
+                future.set_result(refused_recipients)
+                return
+
+    def _connection(self):
+        if not self._smtp:
+            smtp_ctor = smtplib.SMTP_SSL if self.use_tls else smtplib.SMTP
+            smtp = smtp_ctor(self.smtp_host, self.smtp_port, timeout=self.timeout_seconds)
+            try:
+                smtp.login(user=self._username, password=self._password)
+            except BaseException:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self.connection_count += 1
+            verbose('connected to SMTP server {h}'.format(h=self.smtp_host))
+        return self._smtp
+
+    def _reset(self):
+        if not self._smtp:
+            return
+        try:
+            self._smtp.rset()
+        except Exception:
+            self._disconnect()
+
+    def _disconnect(self):
+        if not self._smtp:
+            return
+        smtp = self._smtp
+        self._smtp = None
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+
+_delivery_services = {}
+_delivery_services_lock = threading.Lock()
+
+
+def delivery_service(email_cfg: EmailConfig) -> MailDeliveryService:
+    '''
+    returns the (shared) delivery service for the given email cfg
+    '''
+    credentials = email_cfg.credentials()
+    key = (email_cfg.smtp_host(), bool(email_cfg.use_tls()), credentials.username())
+    with _delivery_services_lock:
+        service = _delivery_services.get(key)
+        if not service:
+            service = MailDeliveryService(
+                smtp_host=email_cfg.smtp_host(),
+                username=credentials.username(),
+                password=credentials.passwd(),
+                use_tls=bool(email_cfg.use_tls()),
+            )
+            _delivery_services[key] = service
+        return service
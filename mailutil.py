@@ -14,7 +14,6 @@
 # limitations under the License.
 
 import git
-import smtplib
 import typing
 
 from model.email import EmailConfig
@@ -29,6 +28,7 @@ from util import (
     CliHints,
 )
 from mail import template_mailer as mailer
+from mail.delivery import delivery_service
 import github.util
 from github.codeowners import CodeownersEnumerator, CodeOwnerEntryResolver
 import product.model
@@ -90,7 +90,15 @@ def _send_mail(
     replace_tokens: dict={},
     cc_recipients: typing.Iterable[str]=[],
     mimetype='text',
+    wait: bool=True,
+    timeout_seconds: float=600,
 ):
+    '''
+    sends the mail via the (shared) delivery service of the given email cfg, which reuses its
+    SMTP connection for subsequent mails. If `wait` is false, the mail is sent in the background
+    (the returned future may be used to wait for delivery). Otherwise, waits for at most
+    `timeout_seconds` (raising `concurrent.futures.TimeoutError` if exceeded).
+    '''
     not_none(email_cfg)
     not_empty(recipients)
     not_none(mail_template)
@@ -115,22 +123,16 @@ def _send_mail(
         mimetype=mimetype,
     )
 
-    if email_cfg.use_tls():
-        smtp_server = smtplib.SMTP_SSL(email_cfg.smtp_host())
-    else:
-        smtp_server = smtplib.SMTP(email_cfg.smtp_host())
-
-    credentials = email_cfg.credentials()
-    smtp_server.login(user=credentials.username(), password=credentials.passwd())
-
     recipients.update(cc_recipients)
 
-    mailer.send_mail(
-        smtp_server=smtp_server,
+    delivery = delivery_service(email_cfg).submit(
         msg=mail,
-        sender=credentials.username(),
-        recipients=recipients
+        sender=email_cfg.credentials().username(),
+        recipients=recipients,
     )
+    if wait:
+        delivery.result(timeout=timeout_seconds)
+    return delivery
 
 
 #TODO: refactor into class - MailHelper?
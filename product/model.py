@@ -84,25 +84,99 @@ class Product(ProductModelBase):
         super().__init__(*args, **kwargs)
         if 'components' not in self.raw:
             self.raw['components'] = []
+        self._component_index = _RawDictIndex(key_func=_name_and_version)
+        self._component_wrappers = {} # id(raw_dict): Component
 
     def _optional_attributes(self):
         return {'components'}
 
+    def _component_wrapper(self, raw_dict):
+        wrapper = self._component_wrappers.get(id(raw_dict))
+        # ids may be reused once a raw dict was freed - only reuse wrappers of the same dict
+        if wrapper is not None and wrapper.raw is raw_dict:
+            return wrapper
+
+        raw_components = self.raw['components']
+        if len(self._component_wrappers) >= len(raw_components):
+            # evict wrappers of components that were removed from the raw dict
+            current_ids = {id(raw_component) for raw_component in raw_components}
+            self._component_wrappers = {
+                raw_id: wrapper for raw_id, wrapper in self._component_wrappers.items()
+                if raw_id in current_ids
+            }
+        wrapper = Component(raw_dict=raw_dict)
+        self._component_wrappers[id(raw_dict)] = wrapper
+        return wrapper
+
     def components(self):
-        return (Component(raw_dict=raw_dict) for raw_dict in self.raw['components'])
+        return (self._component_wrapper(raw_dict) for raw_dict in self.raw['components'])
 
     def component(self, component_reference):
-        if not isinstance(component_reference, ComponentReference):
-            name, version = component_reference
-            component_reference = ComponentReference.create(name=name, version=version)
+        if isinstance(component_reference, ComponentReference):
+            key = (component_reference.name(), component_reference.version())
+        else:
+            key = tuple(component_reference)
 
-        return next(
-            filter(lambda c: c == component_reference, self.components()),
-            None
-        )
+        raw_dicts = self._component_index.lookup(self.raw['components'], key)
+        if not raw_dicts:
+            return None
+        return self._component_wrapper(raw_dicts[0])
 
     def add_component(self, component):
-        self.raw['components'].append(component.raw)
+        self._component_index.append(self.raw['components'], component.raw)
+
+
+def _name_and_version(raw_dict):
+    return (raw_dict.get('name'), raw_dict.get('version'))
+
+
+class _RawDictIndex(object):
+    '''
+    hash index over a list of raw dicts (as contained in a model element's `raw` dict).
+
+    The index is rebuilt whenever the indexed list was replaced or changed in length, or if
+    an entry returned by a lookup no longer matches its key (i.e. it was modified in place).
+    Misses are not re-validated (which would require a scan of all entries): entries whose key
+    was modified in place are only found by their new key once the index was rebuilt. Entries
+    should be added through `append` in order to keep the index up-to-date incrementally.
+
+    Not intended to be used outside of this module.
+    '''
+    def __init__(self, key_func):
+        self._key_func = key_func
+        self._raw_list = None
+        self._length = None
+        self._index = None
+
+    def _rebuild(self, raw_list):
+        index = {}
+        for raw_dict in raw_list:
+            index.setdefault(self._key_func(raw_dict), []).append(raw_dict)
+        self._index = index
+        self._raw_list = raw_list
+        self._length = len(raw_list)
+
+    def _current_index(self, raw_list):
+        if self._raw_list is not raw_list or self._length != len(raw_list):
+            self._rebuild(raw_list)
+        return self._index
+
+    def lookup(self, raw_list, key):
+        '''
+        returns the list of raw dicts from `raw_list` matching the given key (in list order)
+        '''
+        matches = self._current_index(raw_list).get(key, ())
+        if any(self._key_func(raw_dict) != key for raw_dict in matches):
+            # entry was modified in place - rebuild
+            self._rebuild(raw_list)
+            matches = self._index.get(key, ())
+        return matches
+
+    def append(self, raw_list, raw_dict):
+        index = self._current_index(raw_list)
+        raw_list.append(raw_dict)
+        index.setdefault(self._key_func(raw_dict), []).append(raw_dict)
+        self._length = len(raw_list)
 
 
 class ComponentName(object):
@@ -305,20 +379,36 @@ class Component(ComponentReference):
         super().__init__(*args, **kwargs)
         if not self.raw.get('dependencies'):
             self.raw['dependencies'] = {}
+        self._dependencies = None
 
     def _optional_attributes(self):
         return {'dependencies'}
 
     def dependencies(self):
-        return ComponentDependencies(raw_dict=self.raw['dependencies'])
+        if self._dependencies is None or self._dependencies.raw is not self.raw['dependencies']:
+            self._dependencies = ComponentDependencies(raw_dict=self.raw['dependencies'])
+        return self._dependencies
+
+
+# dependency type name: attribute name in ComponentDependencies' raw dict
+_DEPENDENCY_ATTRIBUTES = {
+    'container_image': 'container_images',
+    'component': 'components',
+    'web': 'web',
+    'generic': 'generic',
+}
 
 
 class ComponentDependencies(ModelBase):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        for attrib_name in ('container_images', 'components', 'web', 'generic'):
+        for attrib_name in _DEPENDENCY_ATTRIBUTES.values():
             if attrib_name not in self.raw:
                 self.raw[attrib_name] = []
+        self._indices = {
+            attrib_name: _RawDictIndex(key_func=_name_and_version)
+            for attrib_name in _DEPENDENCY_ATTRIBUTES.values()
+        }
 
     def _optional_attributes(self):
         return {'container_images', 'components', 'web', 'generic'}
@@ -337,35 +427,39 @@ class ComponentDependencies(ModelBase):
 
     def references(self, type_name: str):
         reference_ctor = reference_type(type_name).create
-        if type_name == 'container_image':
-            attrib = 'container_images'
-        elif type_name == 'component':
-            attrib = 'components'
-        elif type_name == 'web':
-            attrib = 'web'
-        elif type_name == 'generic':
-            attrib = 'generic'
-        else:
+        attrib = _DEPENDENCY_ATTRIBUTES.get(type_name)
+        if not attrib:
             raise ValueError('unknown refererence type: ' + str(type_name))
 
         for ref_dict in self.raw.get(attrib):
             yield reference_ctor(name=ref_dict['name'], version=ref_dict['version'])
 
+    def _contains(self, attrib_name, dependency):
+        matching_raw_dicts = self._indices[attrib_name].lookup(
+            self.raw[attrib_name],
+            (dependency.name(), dependency.version()),
+        )
+        if attrib_name == 'components':
+            # component references are considered equal if name and version match
+            return bool(matching_raw_dicts)
+        return any(raw_dict == dependency.raw for raw_dict in matching_raw_dicts)
+
+    def _add_dependency(self, attrib_name, dependency):
+        if self._contains(attrib_name, dependency):
+            return
+        self._indices[attrib_name].append(self.raw[attrib_name], dependency.raw)
+
     def add_container_image_dependency(self, container_image):
-        if container_image not in self.container_images():
-            self.raw['container_images'].append(container_image.raw)
+        self._add_dependency('container_images', container_image)
 
     def add_component_dependency(self, component_reference):
-        if component_reference not in self.components():
-            self.raw['components'].append(component_reference.raw)
+        self._add_dependency('components', component_reference)
 
     def add_web_dependency(self, web_dependency):
-        if web_dependency not in self.web_dependencies():
-            self.raw['web'].append(web_dependency.raw)
+        self._add_dependency('web', web_dependency)
 
     def add_generic_dependency(self, generic_dependency):
-        if generic_dependency not in self.generic_dependencies():
-            self.raw['generic'].append(generic_dependency.raw)
+        self._add_dependency('generic', generic_dependency)
 
 
 def reference_type(name: str):
@@ -12,14 +12,17 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from functools import partial
 import tempfile
+import threading
 
 from protecode.client import ProtecodeApi
 from protecode.model import (
     ProcessingStatus,
     AnalysisResult,
+    Triage,
     TriageScope,
 )
 from util import not_none, warning, check_type, info, urljoin
@@ -51,6 +54,7 @@ class ProtecodeUtil(object):
             group_id: int=None,
             upload_registry_prefix: str=None,
             reference_group_ids=(),
+            parallel_jobs: int=8,
     ):
         protecode_api.login()
         self._processing_mode = check_type(processing_mode, ProcessingMode)
@@ -58,6 +62,110 @@ class ProtecodeUtil(object):
         self._group_id = group_id
         self._upload_registry_prefix = upload_registry_prefix
         self._reference_group_ids = reference_group_ids
+        self._executor = ThreadPoolExecutor(max_workers=parallel_jobs)
+        # {group_id: {(component_name, image_reference_name): [AnalysisResult]}}
+        self._product_index = {}
+        self._product_index_lock = threading.Lock()
+
+    def close(self):
+        '''
+        stops the worker threads used for concurrent requests
+        '''
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def prefetch_products(self):
+        '''
+        retrieves the product listings of the target group and all reference groups (one
+        request per group) and indexes them by component and image reference name. Subsequent
+        lookups of existing products in those groups are answered from this index instead
+        of issuing a metadata query per image and group.
+        '''
+        group_ids = [self._group_id] + [
+            group_id for group_id in self._reference_group_ids if group_id != self._group_id
+        ]
+        for group_id, products in zip(
+            group_ids,
+            self._executor.map(lambda group_id: self._api.list_apps(group_id=group_id), group_ids),
+        ):
+            product_index = {}
+            for product in products:
+                custom_data = product.custom_data() or {}
+                key = (
+                    custom_data.get('COMPONENT_NAME'),
+                    custom_data.get('IMAGE_REFERENCE_NAME'),
+                )
+                product_index.setdefault(key, []).append(product)
+
+            with self._product_index_lock:
+                self._product_index[group_id] = product_index
+
+    def _existing_products(
+            self,
+            container_image: ContainerImage,
+            component: Component,
+            group_id: int,
+        ):
+        with self._product_index_lock:
+            product_index = self._product_index.get(group_id)
+
+        if product_index is None:
+            # group was not prefetched - fall back to query
+            metadata = self._metadata(
+                container_image=container_image,
+                component=component,
+                omit_version=True, # omit version when searching for existing app
+                # (only one component version must exist per group by our chosen definition)
+            )
+            return self._api.list_apps(
+                group_id=group_id,
+                custom_attribs=metadata
+            )
+
+        with self._product_index_lock:
+            return list(product_index.get((component.name(), container_image.name()), ()))
+
+    def _add_to_product_index(
+            self,
+            container_image: ContainerImage,
+            component: Component,
+            group_id: int,
+            product,
+        ):
+        with self._product_index_lock:
+            product_index = self._product_index.get(group_id)
+            if product_index is None:
+                return # group was not prefetched
+            key = (component.name(), container_image.name())
+            product_index.setdefault(key, []).append(product)
+
+    def _remove_from_product_index(
+            self,
+            container_image: ContainerImage,
+            component: Component,
+            group_id: int,
+            product_id: int,
+        ) -> bool:
+        '''
+        removes the given product from the index. Returns `False` if it was already removed
+        (i.e. another task is about to delete it), `True` otherwise.
+        '''
+        with self._product_index_lock:
+            product_index = self._product_index.get(group_id)
+            if product_index is None:
+                return True # group was not prefetched
+            key = (component.name(), container_image.name())
+            products = product_index.get(key, [])
+            remaining_products = [p for p in products if p.product_id() != product_id]
+            if len(remaining_products) == len(products):
+                return False
+            product_index[key] = remaining_products
+            return True
 
     def _image_ref_metadata(self, container_image, omit_version):
         metadata_dict = {
@@ -85,9 +193,10 @@ class ProtecodeUtil(object):
             c=component.name(),
         )
 
-    def _update_product_name(self, product_id: int, upload_name: str):
-        scan_result = self._api.scan_result_short(product_id=product_id)
-        current_name = scan_result.name()
+    def _update_product_name(self, product_id: int, upload_name: str, current_name: str=None):
+        if current_name is None:
+            scan_result = self._api.scan_result_short(product_id=product_id)
+            current_name = scan_result.name()
 
         if current_name == upload_name:
             return # nothing to do
@@ -110,18 +219,13 @@ class ProtecodeUtil(object):
             component: Component,
             group_id: int=None,
         ):
-        metadata = self._metadata(
-            container_image=container_image,
-            component=component,
-            omit_version=True, # omit version when searching for existing app
-            # (only one component version must exist per group by our chosen definition)
-        )
         if not group_id:
             group_id = self._group_id
 
-        existing_products = self._api.list_apps(
+        existing_products = self._existing_products(
+            container_image=container_image,
+            component=component,
             group_id=group_id,
-            custom_attribs=metadata
         )
         if len(existing_products) == 0:
             return None # no result existed yet
@@ -130,6 +234,13 @@ class ProtecodeUtil(object):
             warning('found more than one product for image {i}'.format(i=container_image))
             product_ids_to_rm = {p.product_id() for p in existing_products[1:]}
             for product_id in product_ids_to_rm:
+                if not self._remove_from_product_index(
+                    container_image=container_image,
+                    component=component,
+                    group_id=group_id,
+                    product_id=product_id,
+                ):
+                    continue # deleted by another task
                 self._api.delete_product(product_id)
                 info(f'deleted product with product_id: {product_id}')
 
@@ -139,7 +250,7 @@ class ProtecodeUtil(object):
 
         # update upload name to reflect new component version (if changed)
         upload_name = self._upload_name(container_image, component)
-        self._update_product_name(product_id, upload_name)
+        self._update_product_name(product_id, upload_name, current_name=product.name())
 
         # retrieve existing product's details (list of products contained only subset of data)
         product = self._api.scan_result(product_id=product_id)
@@ -190,7 +301,16 @@ class ProtecodeUtil(object):
             self,
             container_image: ContainerImage,
             component: Component,
+            wait_for_result: bool=True,
         ) -> UploadResult:
+        '''
+        uploads (or rescans) the given container image, if required by the configured
+        processing mode.
+
+        @param wait_for_result: if `False`, return as soon as the upload (or rescan) was
+            triggered. The returned `UploadResult` then has the status `UploadStatus.PENDING`,
+            and callers are responsible for polling for the final scan result.
+        '''
         metadata = self._metadata(
             container_image=container_image,
             component=component,
@@ -204,21 +324,6 @@ class ProtecodeUtil(object):
             container_image=container_image,
             component=component,
         )
-        reference_results = [
-            self.retrieve_scan_result(
-                container_image=container_image,
-                component=component,
-                group_id=group_id,
-            ) for group_id in self._reference_group_ids
-        ]
-        reference_results = [r for r in reference_results if r] # remove None entries
-        if scan_result:
-            reference_results.insert(0, scan_result)
-
-        # collect old triages in order to "transport" them after new upload (may be None)
-        triages = self._existing_triages(
-            analysis_results=reference_results,
-        )
 
         upload_action = self._determine_upload_action(
             container_image=container_image,
@@ -233,6 +338,25 @@ class ProtecodeUtil(object):
             )
 
         if upload_action.upload:
+            # reference results are only required in order to "transport" their triages
+            reference_results = [
+                r for r in self._executor.map(
+                    lambda group_id: self.retrieve_scan_result(
+                        container_image=container_image,
+                        component=component,
+                        group_id=group_id,
+                    ),
+                    self._reference_group_ids,
+                ) if r # remove None entries
+            ]
+            if scan_result:
+                reference_results.insert(0, scan_result)
+
+            # collect old triages in order to "transport" them after new upload (may be None)
+            triages = self._existing_triages(
+                analysis_results=reference_results,
+            )
+
             info(f'uploading to protecode: {container_image.image_reference()}')
             image_data_fh = retrieve_container_image(
                 container_image.image_reference(),
@@ -240,7 +364,9 @@ class ProtecodeUtil(object):
             )
             if self._upload_registry_prefix:
                 self.upload_image_to_container_registry(container_image, image_data_fh)
-            # keep old product_id (in order to delete after update)
+            # keep old scan result (its group triages need not be transported) and product_id
+            # (in order to delete after update)
+            previous_result = scan_result
             if scan_result:
                 product_id = scan_result.product_id()
             else:
@@ -260,29 +386,37 @@ class ProtecodeUtil(object):
                 )
             finally:
                 image_data_fh.close()
+            self._add_to_product_index(
+                container_image=container_image,
+                component=component,
+                group_id=self._group_id,
+                product=scan_result,
+            )
 
-            for triage in triages:
-                if triage.scope() is TriageScope.GROUP:
-                    self._api.add_triage(
-                        triage=triage,
-                        scope=TriageScope.GROUP,
-                        group_id=self._group_id,
-                    )
-                else:
-                    # hard-code scope for now
-                    self._api.add_triage(
-                        triage=triage,
-                        scope=TriageScope.RESULT,
-                        product_id=scan_result.product_id(),
-                    )
+            self._transport_triages(
+                triages=triages,
+                target_result=scan_result,
+                previous_result=previous_result,
+            )
 
             # rm (now outdated) scan result
-            if product_id:
+            if product_id and self._remove_from_product_index(
+                container_image=container_image,
+                component=component,
+                group_id=self._group_id,
+                product_id=product_id,
+            ):
                 self._api.delete_product(product_id=product_id)
 
         if upload_action.rescan:
             self._api.rescan(scan_result.product_id())
 
+        if not wait_for_result:
+            return upload_result(
+                status=UploadStatus.PENDING,
+                result=scan_result,
+            )
+
         result = self._api.wait_for_scan_result(product_id=scan_result.product_id())
 
         if result.status() == ProcessingStatus.BUSY:
@@ -301,6 +435,56 @@ class ProtecodeUtil(object):
             result=result
         )
 
+    def _transport_triages(
+            self,
+            triages,
+            target_result: AnalysisResult,
+            previous_result: AnalysisResult=None,
+        ):
+        '''
+        adds the given triages to the given target result. Triages are deduplicated by
+        (component, version, vulnerability, effective scope). Group-scoped triages already
+        present on the previous result in the target group (which also apply to the target
+        result) are skipped. The remaining triages are added concurrently.
+        '''
+        def triage_key(triage: Triage, scope: TriageScope):
+            return (
+                triage.component_name(),
+                triage.component_version(),
+                triage.vulnerability_id(),
+                scope,
+            )
+
+        existing_triage_keys = {
+            triage_key(triage, TriageScope.GROUP)
+            for triage in self._existing_triages(
+                analysis_results=(previous_result,) if previous_result else (),
+            )
+            if triage.scope() is TriageScope.GROUP
+        }
+
+        triages_to_add = {}
+        for triage in triages:
+            if triage.scope() is TriageScope.GROUP:
+                add_triage_kwargs = {
+                    'scope': TriageScope.GROUP,
+                    'group_id': self._group_id,
+                }
+            else:
+                # hard-code scope for now
+                add_triage_kwargs = {
+                    'scope': TriageScope.RESULT,
+                    'product_id': target_result.product_id(),
+                }
+            key = triage_key(triage, add_triage_kwargs['scope'])
+            if key in existing_triage_keys or key in triages_to_add:
+                continue
+            triages_to_add[key] = partial(self._api.add_triage, triage=triage, **add_triage_kwargs)
+
+        # consume results in order to propagate errors
+        for _ in self._executor.map(lambda add_triage: add_triage(), triages_to_add.values()):
+            pass
+
     def _existing_triages(self, analysis_results: AnalysisResult=()):
         if not analysis_results:
             return ()
@@ -13,19 +13,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from copy import deepcopy
 import collections
 import github3.exceptions
 import functools
-import itertools
-import semver
+import os
+import tempfile
+import threading
 import typing
+import urllib.parse
 import yaml
 
 import version
-from github.util import GitHubRepositoryHelper, github_api_ctor
-from util import not_none, check_type, FluentIterable
+from github.util import (
+    GitHubRepositoryHelper,
+    ReleaseAssetFetcher,
+    _create_github_api_object,
+    github_api_ctor,
+)
+from util import not_none, check_type
 from .model import (
+    _DEPENDENCY_ATTRIBUTES,
     COMPONENT_DESCRIPTOR_ASSET_NAME,
     ComponentReference,
     DependencyBase,
@@ -51,6 +60,7 @@ class ResolverBase(object):
         cfg_factory=None,
     ):
         self.cfg_factory=cfg_factory
+        self._asset_fetcher = ReleaseAssetFetcher(github_api_lookup=self._github_api)
 
     @functools.lru_cache()
     def _github_cfg_for_hostname(self, host_name):
@@ -68,48 +78,145 @@ class ResolverBase(object):
         ctor = github_api_ctor(github_url=url)
         return ctor()
 
+    def _github_api(self, host_name):
+        if self.cfg_factory:
+            return _create_github_api_object(
+                github_cfg=self._github_cfg_for_hostname(host_name=host_name),
+            )
+        else:
+            return self._github_api_for_hostname(host_name=host_name)
+
     def _repository_helper(self, component_reference):
         if isinstance(component_reference, tuple):
             name, version = component_reference
             component_reference = ComponentReference.create(name=name, version=version)
 
-        gh_helper_ctor = functools.partial(
-                GitHubRepositoryHelper,
-                owner=component_reference.github_organisation(),
-                name=component_reference.github_repo(),
+        return self._repository_helper_for(
+            host_name=component_reference.github_host(),
+            owner=component_reference.github_organisation(),
+            name=component_reference.github_repo(),
         )
 
-        if self.cfg_factory:
-            return gh_helper_ctor(
-                github_cfg=self._github_cfg_for_hostname(
-                    host_name=component_reference.github_host(),
-                )
-            )
-        else:
-            return gh_helper_ctor(
-                github_api=self._github_api_for_hostname(
-                    host_name=component_reference.github_host(),
-                )
-            )
+    @functools.lru_cache()
+    def _repository_helper_for(self, host_name, owner, name):
+        return GitHubRepositoryHelper(
+            owner=owner,
+            name=name,
+            github_api=self._github_api(host_name=host_name),
+        )
+
+    def _retrieve_asset(self, component_reference, asset_label, as_dict=False):
+        retrieve_asset = self._asset_fetcher.asset_yaml if as_dict \
+            else self._asset_fetcher.asset_contents
+
+        return retrieve_asset(
+            host=component_reference.github_host(),
+            owner=component_reference.github_organisation(),
+            name=component_reference.github_repo(),
+            release_tag=component_reference.version(),
+            asset_label=asset_label,
+        )
 
 
 class ComponentDescriptorResolver(ResolverBase):
+    '''
+    retrieves component descriptors from the GitHub releases of the respective components.
+
+    Retrieved descriptors are memoised per (name, version); concurrent requests for the same
+    descriptor are deduplicated. If a `cache_dir` is given, retrieved descriptors are also
+    stored there and read from there in later runs. As descriptors of released components are
+    immutable, the cache is never invalidated.
+    '''
+    def __init__(
+        self,
+        cfg_factory=None,
+        cache_dir: str=None,
+        max_workers: int=8,
+    ):
+        super().__init__(cfg_factory=cfg_factory)
+        self._cache_dir = cache_dir
+        self._max_workers = max_workers
+        self._descriptors = {} # (name, version): Future
+        self._descriptors_lock = threading.Lock()
+
+    def _cache_path(self, component_reference):
+        return os.path.join(
+            self._cache_dir,
+            urllib.parse.quote(component_reference.name(), safe=''),
+            urllib.parse.quote(component_reference.version(), safe='') + '.yaml',
+        )
+
+    def _read_cached_descriptor(self, component_reference):
+        if not self._cache_dir:
+            return None
+        try:
+            with open(self._cache_path(component_reference)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_cached_descriptor(self, component_reference, descriptor: str):
+        if not self._cache_dir:
+            return
+        cache_path = self._cache_path(component_reference)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # write to temporary file first so that concurrent readers never see partial contents
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path))
+        with os.fdopen(fd, 'w') as f:
+            f.write(descriptor)
+        os.replace(tmp_path, cache_path)
+
     def retrieve_raw_descriptor(self, component_reference, as_dict=False):
         if isinstance(component_reference, tuple):
             name, version = component_reference
             component_reference = ComponentReference.create(name=name, version=version)
 
-        repo_helper = self._repository_helper(component_reference)
-        dependency_descriptor = repo_helper.retrieve_asset_contents(
-                release_tag=component_reference.version(),
+        dependency_descriptor = self._read_cached_descriptor(component_reference)
+
+        if dependency_descriptor is None:
+            if as_dict and not self._cache_dir:
+                # no need to keep the raw descriptor around - parse while downloading
+                return self._retrieve_asset(
+                    component_reference=component_reference,
+                    asset_label=COMPONENT_DESCRIPTOR_ASSET_NAME,
+                    as_dict=True,
+                )
+            dependency_descriptor = self._retrieve_asset(
+                component_reference=component_reference,
                 asset_label=COMPONENT_DESCRIPTOR_ASSET_NAME,
-        )
+            )
+            self._write_cached_descriptor(component_reference, dependency_descriptor)
+
         if as_dict:
-            return yaml.load(dependency_descriptor)
+            return yaml.safe_load(dependency_descriptor)
         else:
             return dependency_descriptor
 
     def retrieve_descriptor(self, component_reference):
+        if isinstance(component_reference, tuple):
+            name, version = component_reference
+            component_reference = ComponentReference.create(name=name, version=version)
+
+        key = (component_reference.name(), component_reference.version())
+        with self._descriptors_lock:
+            descriptor_future = self._descriptors.get(key)
+            is_owner = descriptor_future is None
+            if is_owner:
+                descriptor_future = Future()
+                self._descriptors[key] = descriptor_future
+
+        if is_owner:
+            try:
+                descriptor_future.set_result(self._retrieve_descriptor(component_reference))
+            except BaseException as e:
+                # do not memoise failures
+                with self._descriptors_lock:
+                    del self._descriptors[key]
+                descriptor_future.set_exception(e)
+
+        return descriptor_future.result()
+
+    def _retrieve_descriptor(self, component_reference):
         try:
             dependency_descriptor = self.retrieve_raw_descriptor(
                 component_reference=component_reference,
@@ -127,17 +234,39 @@ class ComponentDescriptorResolver(ResolverBase):
         self,
         product,
     ):
-        def unresolved_references(component):
-            component_references = component.dependencies().components()
-            yield from filter(lambda cr: not product.component(cr), component_references)
+        '''
+        returns a copy of the given product, into which the descriptors of all (transitively)
+        referenced components are merged.
 
+        The dependency graph is resolved breadth-first; the descriptors of each level are
+        retrieved concurrently.
+        '''
         merged = Product.from_dict(deepcopy(dict(product.raw.items())))
 
-        for component_reference in itertools.chain(
-                *map(unresolved_references, product.components())
-        ):
-            resolved_descriptor = self.retrieve_descriptor(component_reference)
-            merged = merge_products(merged, resolved_descriptor)
+        def unresolved_references(components):
+            unresolved = {}
+            for component in components:
+                for component_reference in component.dependencies().components():
+                    if merged.component(component_reference):
+                        continue
+                    unresolved[component_reference] = component_reference
+            return list(unresolved.values())
+
+        executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        try:
+            component_references = unresolved_references(merged.components())
+            while component_references:
+                added_components = []
+                for resolved_descriptor in executor.map(
+                    self.retrieve_descriptor,
+                    component_references,
+                ):
+                    added_components.extend(
+                        _merge_into(target=merged, source=resolved_descriptor)
+                    )
+                component_references = unresolved_references(added_components)
+        finally:
+            executor.shutdown()
 
         return merged
 
@@ -146,20 +275,14 @@ class ComponentResolver(ResolverBase):
     def latest_component_version(self, component_name: str):
         component_reference = ComponentReference.create(name=component_name, version=None)
         repo_helper = self._repository_helper(component_reference)
-        latest_version = version.find_latest_version(repo_helper.release_versions())
-        return latest_version
+        return repo_helper.release_version_index().latest()
 
     def greatest_release_before(self, component_name: str, version: str):
         component_reference = ComponentReference.create(name=component_name, version=version)
         repo_helper = self._repository_helper(component_reference)
-        version = semver.parse_version_info(version)
-
-        versions = sorted(repo_helper.release_versions()) # greatest version comes last
-        versions = [v for v in versions if v < version]
 
-        if len(versions) == 0:
-            return None # no release before current was found
-        return versions[-1]
+        # returns None if no release before current was found
+        return repo_helper.release_version_index().greatest_before(version)
 
 
 def merge_products(left_product, right_product):
@@ -168,8 +291,19 @@ def merge_products(left_product, right_product):
 
     # start with a copy of left_product
     merged = Product.from_dict(deepcopy(dict(left_product.raw.items())))
-    for component in right_product.components():
-        existing_component = merged.component(component)
+    for _ in _merge_into(target=merged, source=right_product):
+        pass
+
+    return merged
+
+
+def _merge_into(target, source):
+    '''
+    adds all components from `source` to `target` (which is modified in place), and yields
+    the components that were not already contained in `target`.
+    '''
+    for component in source.components():
+        existing_component = target.component(component)
         if existing_component:
             # it is acceptable to add an existing component iff it is identical
             if existing_component.raw == component.raw:
@@ -181,9 +315,8 @@ def merge_products(left_product, right_product):
                         c2=':'.join((component.name(), component.version())),
                     )
                 )
-        merged.add_component(component)
-
-    return merged
+        target.add_component(component)
+        yield component
 
 
 def diff_products(left_product, right_product, ignore_component_names=()):
@@ -217,8 +350,14 @@ ComponentDiff = collections.namedtuple(
 
 
 def diff_components(left_components, right_components, ignore_component_names=()) -> ComponentDiff:
-    left_components = set(left_components)
-    right_components = set(right_components)
+    '''
+    calculates the difference between the given iterables of dependencies (despite its name,
+    dependencies of any type may be passed, as long as both sides contain the same type).
+    Dependencies are identified by name and version. Returns `None` if there is no difference.
+    '''
+    ignore_component_names = set(ignore_component_names)
+    left_components = {c for c in left_components if c.name() not in ignore_component_names}
+    right_components = {c for c in right_components if c.name() not in ignore_component_names}
 
     if left_components == right_components:
         return None # no diff
@@ -226,21 +365,17 @@ def diff_components(left_components, right_components, ignore_component_names=()
     components_only_left = left_components - right_components
     components_only_right = right_components - left_components
 
-    def find_changed_component(changed_component, components):
-        for c in components:
-            if c.name() == changed_component.name():
-                return (changed_component, c)
-        return (changed_component, None) # no pair component found
+    right_components_by_name = {c.name(): c for c in right_components}
 
-    components_with_changed_versions = FluentIterable(items=components_only_left) \
-        .map(functools.partial(find_changed_component, components=right_components)) \
-        .filter(lambda cs: cs[1] is not None) \
-        .as_list()
     # pairs of crefs (left-version:right-version)
+    components_with_changed_versions = {
+        (c, right_components_by_name[c.name()]) for c in components_only_left
+        if c.name() in right_components_by_name
+    }
 
-    left_names = set(map(lambda c: c.name(), components_only_left))
-    right_names = set(map(lambda c: c.name(), components_only_right))
-    names_version_changed = set(map(lambda cp: cp[0].name(), components_with_changed_versions))
+    left_names = {c.name() for c in components_only_left}
+    right_names = {c.name() for c in components_only_right}
+    names_version_changed = {cp[0].name() for cp in components_with_changed_versions}
 
     both_names = left_names & right_names
     left_names -= both_names
@@ -249,13 +384,135 @@ def diff_components(left_components, right_components, ignore_component_names=()
     return ComponentDiff(
         crefs_only_left=components_only_left,
         crefs_only_right=components_only_right,
-        crefpairs_version_changed=set(components_with_changed_versions),
+        crefpairs_version_changed=components_with_changed_versions,
         names_only_left=left_names,
         names_only_right=right_names,
         names_version_changed=names_version_changed,
     )
 
 
+def diff_component_dependencies(
+    left_component,
+    right_component,
+    type_names: typing.Iterable[str]=tuple(_DEPENDENCY_ATTRIBUTES.keys()),
+    ignore_names=(),
+):
+    '''
+    calculates the difference between the dependencies of the given components.
+
+    Returns a dict {type_name: ComponentDiff} containing an entry for each dependency type
+    that differs.
+    '''
+    left_dependencies = left_component.dependencies()
+    right_dependencies = right_component.dependencies()
+
+    diffs = {}
+    for type_name in type_names:
+        diff = diff_components(
+            left_components=left_dependencies.references(type_name=type_name),
+            right_components=right_dependencies.references(type_name=type_name),
+            ignore_component_names=ignore_names,
+        )
+        if diff:
+            diffs[type_name] = diff
+    return diffs
+
+
+DependencyChange = collections.namedtuple(
+    'DependencyChange',
+    [
+        'type_name',
+        'name',
+        'left_versions', # empty if dependency was added
+        'right_versions', # empty if dependency was removed
+    ]
+)
+
+
+def _versions_by_name(raw_dependencies: typing.Iterable[dict], ignore_names):
+    versions_by_name = {}
+    for raw_dependency in raw_dependencies:
+        name = raw_dependency['name']
+        if name in ignore_names:
+            continue
+        versions = versions_by_name.setdefault(name, {})
+        versions[raw_dependency['version']] = None # use dict as ordered set
+    return versions_by_name
+
+
+def iter_raw_dependency_changes(
+    left_raw_dependencies: typing.Iterable[dict],
+    right_raw_dependencies: typing.Iterable[dict],
+    type_name: str='component',
+    ignore_names=(),
+):
+    '''
+    compares two sequences of raw dependency dicts (as found in component descriptors) and
+    yields a `DependencyChange` for each dependency name whose set of versions differs.
+
+    Only names and versions are read, so no model objects are created. Changes are yielded
+    in order of first occurrence (left side first).
+    '''
+    ignore_names = set(ignore_names)
+    left_versions = _versions_by_name(left_raw_dependencies, ignore_names)
+    right_versions = _versions_by_name(right_raw_dependencies, ignore_names)
+
+    for name, versions in left_versions.items():
+        other_versions = right_versions.get(name, {})
+        if versions.keys() != other_versions.keys():
+            yield DependencyChange(
+                type_name=type_name,
+                name=name,
+                left_versions=tuple(versions),
+                right_versions=tuple(other_versions),
+            )
+
+    for name, versions in right_versions.items():
+        if name in left_versions:
+            continue
+        yield DependencyChange(
+            type_name=type_name,
+            name=name,
+            left_versions=(),
+            right_versions=tuple(versions),
+        )
+
+
+def iter_raw_component_dependency_changes(
+    left_raw_component: dict,
+    right_raw_component: dict,
+    type_names: typing.Iterable[str]=tuple(_DEPENDENCY_ATTRIBUTES.keys()),
+    ignore_names=(),
+):
+    '''
+    streaming variant of `diff_component_dependencies` operating on raw component dicts
+    (elements of the `components` list of a component descriptor)
+    '''
+    left_dependencies = left_raw_component.get('dependencies') or {}
+    right_dependencies = right_raw_component.get('dependencies') or {}
+
+    for type_name in type_names:
+        attrib_name = _DEPENDENCY_ATTRIBUTES[type_name]
+        yield from iter_raw_dependency_changes(
+            left_raw_dependencies=left_dependencies.get(attrib_name) or (),
+            right_raw_dependencies=right_dependencies.get(attrib_name) or (),
+            type_name=type_name,
+            ignore_names=ignore_names,
+        )
+
+
+def iter_raw_product_changes(left_raw_product: dict, right_raw_product: dict, ignore_names=()):
+    '''
+    streaming variant of `diff_products` operating on raw component descriptor dicts
+    '''
+    yield from iter_raw_dependency_changes(
+        left_raw_dependencies=left_raw_product.get('components') or (),
+        right_raw_dependencies=right_raw_product.get('components') or (),
+        type_name='component',
+        ignore_names=ignore_names,
+    )
+
+
 def greatest_references(references: typing.Iterable[DependencyBase]):
     '''
     yields the component references from the specified iterable of ComponentReference that
@@ -264,28 +521,21 @@ def greatest_references(references: typing.Iterable[DependencyBase]):
     the sequence is returned unchanged.
     '''
     not_none(references)
-    references = list(references)
+    refs_by_name = {} # preserves order of first occurrence
     for ref in references:
         check_type(ref, DependencyBase)
+        refs_by_name.setdefault(ref.name(), []).append(ref)
 
-    names = [
-        ref.name() for ref
-        in references
-    ]
-
-    for name in names:
-        matching_refs = [r for r in references if r.name() == name]
+    for name, matching_refs in refs_by_name.items():
         if len(matching_refs) == 1:
-            # in case reference name was unique, do not bother sorting
+            # in case reference name was unique, do not bother parsing versions
             # (this also works around issues from non-semver versions)
             yield matching_refs[0]
             continue
 
         # there might be multiple component versions of the same name
         # --> use the greatest version in that case
-        matching_refs = sorted(
-            matching_refs,
-            key=lambda r: semver.parse_version_info(r.version()),
-        )
-        # greates version comes last
-        yield matching_refs[-1]
+        version_index = version.VersionIndex()
+        for ref in matching_refs:
+            version_index.add(version=ref.version(), value=ref)
+        yield version_index.latest()
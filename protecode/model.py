@@ -13,8 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import array
+import itertools
 from enum import Enum
-from typing import Iterable
+from typing import Iterable, Set
 
 from model.base import ModelBase
 
@@ -32,11 +34,28 @@ class AnalysisResult(ModelBase):
     def display_name(self):
         return self.raw.get('filename', '<None>')
 
+    def name(self):
+        return self.raw.get('name')
+
     def status(self) -> ProcessingStatus:
         return ProcessingStatus(self.raw.get('status'))
 
     def components(self) -> 'Iterable[Component]':
-        return (Component(raw_dict=raw) for raw in self.raw.get('components'))
+        if getattr(self, '_components', None) is not None:
+            return iter(self._components)
+        # components are absent as long as the scan is pending
+        components = tuple(Component(raw_dict=raw) for raw in self.raw.get('components') or ())
+        if components:
+            self._components = components
+        return iter(components)
+
+    def vulnerability_table(self) -> 'VulnerabilityTable':
+        '''
+        returns the (memoised) columnar representation of this result's vulnerabilities
+        '''
+        if getattr(self, '_vulnerability_table', None) is None:
+            self._vulnerability_table = VulnerabilityTable(analysis_result=self)
+        return self._vulnerability_table
 
     def custom_data(self):
         return self.raw.get('custom_data')
@@ -101,10 +120,13 @@ class Vulnerability(ModelBase):
         return (Triage(raw_dict=raw) for raw in self.raw.get('triage'))
 
     def cve_major_severity(self) -> int:
-        if self.cve_severity_str():
-            return int(self.cve_severity_str().split('.')[0])
-        else:
-            return -1
+        return _major_severity(self.raw.get('vuln').get('cvss'))
+
+
+def _major_severity(cvss) -> int:
+    if cvss is None or cvss == '':
+        return -1
+    return int(str(cvss).split('.')[0])
 
 
 class TriageScope(Enum):
@@ -159,6 +181,132 @@ class ScanResult(ModelBase):
         return self.raw.get('has_binary')
 
 
+class VulnerabilityTable(object):
+    '''
+    columnar representation of the vulnerabilities contained in an `AnalysisResult`.
+
+    The table is built in one pass over the raw analysis result. Each row represents one
+    vulnerability; row attributes are stored in parallel arrays (severity, historical flag,
+    triage flag and the index of the affected component). Component attributes are stored
+    once per component.
+
+    Not intended to be instantiated by users of this module (see
+    `AnalysisResult.vulnerability_table`).
+    '''
+    COLUMNS = (
+        'component_name',
+        'component_version',
+        'license',
+        'cve',
+        'severity',
+        'historical',
+        'triaged',
+    )
+
+    def __init__(self, analysis_result: AnalysisResult):
+        # per-component columns
+        self.component_names = []
+        self.component_versions = []
+        self.component_licenses = []
+
+        # per-vulnerability columns
+        self.component_indices = array.array('l')
+        self.cves = []
+        self.severities = array.array('b')
+        self.historical = array.array('b')
+        self.triaged = array.array('b')
+
+        # greatest severity per component, keyed by (ignore_historical, ignore_triaged)
+        self._component_greatest_severities = {
+            flags: array.array('b')
+            for flags in itertools.product((False, True), repeat=2)
+        }
+        filter_maxima = tuple(self._component_greatest_severities.items())
+
+        for component_index, component_raw in enumerate(
+            analysis_result.raw.get('components') or ()
+        ):
+            self.component_names.append(component_raw.get('lib'))
+            self.component_versions.append(component_raw.get('version'))
+            license_raw = component_raw.get('license')
+            self.component_licenses.append(License(raw_dict=license_raw) if license_raw else None)
+            for _, maxima in filter_maxima:
+                maxima.append(-1)
+
+            for vulnerability_raw in component_raw.get('vulns') or ():
+                vuln = vulnerability_raw.get('vuln')
+                self.component_indices.append(component_index)
+                self.cves.append(vuln.get('cve'))
+                self.severities.append(_major_severity(vuln.get('cvss')))
+                self.historical.append(not vulnerability_raw.get('exact'))
+                self.triaged.append(vulnerability_raw.get('triage') is not None)
+
+                # maintain per-component maxima for each filter while building the table
+                for (ignore_historical, ignore_triaged), maxima in filter_maxima:
+                    if ignore_historical and self.historical[-1]:
+                        continue
+                    if ignore_triaged and self.triaged[-1]:
+                        continue
+                    if self.severities[-1] > maxima[component_index]:
+                        maxima[component_index] = self.severities[-1]
+
+        self._greatest_severities = {
+            flags: max(maxima, default=-1)
+            for flags, maxima in self._component_greatest_severities.items()
+        }
+
+    def __len__(self):
+        return len(self.severities)
+
+    def has_components(self) -> bool:
+        return bool(self.component_names)
+
+    def greatest_severity(self, ignore_historical=True, ignore_triaged=True) -> int:
+        '''
+        returns the greatest major CVE severity of all (relevant) vulnerabilities, or -1 if
+        there are none
+        '''
+        return self._greatest_severities[(bool(ignore_historical), bool(ignore_triaged))]
+
+    def component_greatest_severities(
+        self,
+        ignore_historical=True,
+        ignore_triaged=True,
+    ) -> array.array:
+        '''
+        returns the greatest major CVE severity of the (relevant) vulnerabilities of each
+        component (indexed like `component_names`; -1 for components without any)
+        '''
+        return self._component_greatest_severities[
+            (bool(ignore_historical), bool(ignore_triaged))
+        ]
+
+    def licenses(self) -> Set[License]:
+        return {license for license in self.component_licenses if license}
+
+    def rows(self) -> Iterable[tuple]:
+        '''
+        yields one tuple per vulnerability (see `COLUMNS` for the tuple layout)
+        '''
+        for component_index, cve, severity, historical, triaged in zip(
+            self.component_indices,
+            self.cves,
+            self.severities,
+            self.historical,
+            self.triaged,
+        ):
+            license = self.component_licenses[component_index]
+            yield (
+                self.component_names[component_index],
+                self.component_versions[component_index],
+                license.name() if license else None,
+                cve,
+                severity,
+                bool(historical),
+                bool(triaged),
+            )
+
+
 def highest_major_cve_severity(vulnerabilites: Iterable[Vulnerability]) -> int:
     try:
         return max(
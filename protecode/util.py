@@ -14,8 +14,12 @@
 # limitations under the License.
 
 from concurrent.futures import ThreadPoolExecutor
+import concurrent.futures
+import csv
+import json
 import sys
 import tabulate
+import time
 import typing
 
 import requests.exceptions
@@ -25,11 +29,13 @@ from product.scanning import ProtecodeUtil, ProcessingMode
 from util import info, warning, verbose, error
 from product.model import (
     UploadResult,
+    UploadStatus,
 )
 from protecode.model import (
     AnalysisResult,
     License,
-    highest_major_cve_severity,
+    ProcessingStatus,
+    VulnerabilityTable,
 )
 
 
@@ -44,23 +50,35 @@ def upload_images(
     image_reference_filter=lambda _: True,
     upload_registry_prefix: str=None,
     reference_group_ids=(),
+    vulnerability_report_file: str=None,
+    min_polling_interval_seconds=5,
+    max_polling_interval_seconds=60,
 ) -> typing.Sequence[typing.Tuple[AnalysisResult, int]]:
-    executor = ThreadPoolExecutor(max_workers=parallel_jobs)
     protecode_api = protecode.client.from_cfg(protecode_cfg)
     protecode_api.set_maximum_concurrent_connections(parallel_jobs)
-    protecode_util = ProtecodeUtil(
+    with ProtecodeUtil(
         protecode_api=protecode_api,
         processing_mode=processing_mode,
         group_id=protecode_group_id,
         upload_registry_prefix=upload_registry_prefix,
         reference_group_ids=reference_group_ids,
-    )
-    tasks = _create_tasks(
-        product_descriptor,
-        protecode_util,
-        image_reference_filter
-    )
-    results = tuple(executor.map(lambda task: task(), tasks))
+        parallel_jobs=parallel_jobs,
+    ) as protecode_util:
+        protecode_util.prefetch_products()
+        tasks = _create_tasks(
+            product_descriptor,
+            protecode_util,
+            image_reference_filter
+        )
+        results = tuple(
+            upload_and_wait_for_scans(
+                protecode_api=protecode_api,
+                tasks=tasks,
+                parallel_jobs=parallel_jobs,
+                min_polling_interval_seconds=min_polling_interval_seconds,
+                max_polling_interval_seconds=max_polling_interval_seconds,
+            )
+        )
 
     relevant_results = filter_and_display_upload_results(
         upload_results=results,
@@ -70,18 +88,127 @@ def upload_images(
 
     _license_report = license_report(upload_results=results)
 
+    if vulnerability_report_file:
+        with open(vulnerability_report_file, 'w') as f:
+            write_vulnerability_report(
+                upload_results=results,
+                out_file=f,
+                format='csv' if vulnerability_report_file.endswith('.csv') else 'json',
+            )
+
     return (relevant_results, _license_report)
 
 
+def upload_and_wait_for_scans(
+    protecode_api: protecode.client.ProtecodeApi,
+    tasks: typing.Iterable[typing.Callable[[], UploadResult]],
+    parallel_jobs=8,
+    min_polling_interval_seconds=5,
+    max_polling_interval_seconds=60,
+) -> typing.Iterable[UploadResult]:
+    '''
+    runs the given upload tasks (at most `parallel_jobs` at a time) and yields their upload
+    results as soon as the corresponding scans are finished.
+
+    Upload tasks are expected to not wait for scan results, but to return
+    `UploadStatus.PENDING` instead. Pending scans are polled for together in one loop, so the
+    number of scans in flight is not limited by the number of upload workers. The polling
+    interval is increased (up to `max_polling_interval_seconds`) for as long as no scan
+    finishes, and reset to `min_polling_interval_seconds` otherwise.
+    '''
+    upload_executor = ThreadPoolExecutor(max_workers=parallel_jobs)
+    polling_executor = ThreadPoolExecutor(max_workers=parallel_jobs)
+
+    uploads = set()
+    pending_scans = []
+    polling_interval = min_polling_interval_seconds
+    last_poll = time.monotonic()
+
+    try:
+        for task in tasks:
+            uploads.add(upload_executor.submit(task))
+
+        while uploads or pending_scans:
+            if uploads:
+                done, uploads = concurrent.futures.wait(
+                    uploads,
+                    # do not block polling for pending scans
+                    timeout=polling_interval if pending_scans else None,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for upload in done:
+                    upload_result = upload.result()
+                    if upload_result.status is UploadStatus.PENDING:
+                        pending_scans.append(upload_result)
+                    else:
+                        yield upload_result
+            else:
+                time.sleep(max(0, polling_interval - (time.monotonic() - last_poll)))
+
+            if not pending_scans or time.monotonic() - last_poll < polling_interval:
+                continue
+
+            finished, pending_scans = _poll_scan_results(
+                protecode_api=protecode_api,
+                pending_scans=pending_scans,
+                executor=polling_executor,
+            )
+            last_poll = time.monotonic()
+            verbose(f'{len(finished)} scan(s) finished, {len(pending_scans)} scan(s) pending')
+
+            if finished:
+                polling_interval = min_polling_interval_seconds
+            else:
+                polling_interval = min(polling_interval * 2, max_polling_interval_seconds)
+
+            yield from finished
+    finally:
+        # do not start remaining uploads if aborted (e.g. due to an error)
+        for upload in uploads:
+            upload.cancel()
+        upload_executor.shutdown()
+        polling_executor.shutdown()
+
+
+def _poll_scan_results(
+    protecode_api: protecode.client.ProtecodeApi,
+    pending_scans: typing.Sequence[UploadResult],
+    executor: ThreadPoolExecutor,
+) -> typing.Tuple[typing.List[UploadResult], typing.List[UploadResult]]:
+    '''
+    retrieves the current scan results for all given pending uploads and returns a tuple of
+    (finished, still pending) upload results
+    '''
+    def retrieve_scan_result(upload_result: UploadResult):
+        return protecode_api.scan_result(product_id=upload_result.result.product_id())
+
+    finished = []
+    still_pending = []
+
+    for upload_result, scan_result in zip(
+        pending_scans,
+        executor.map(retrieve_scan_result, pending_scans),
+    ):
+        if scan_result.status() in (ProcessingStatus.READY, ProcessingStatus.FAILED):
+            finished.append(
+                UploadResult(
+                    status=UploadStatus.DONE,
+                    component=upload_result.component,
+                    container_image=upload_result.container_image,
+                    result=scan_result,
+                )
+            )
+        else:
+            still_pending.append(upload_result)
+
+    return finished, still_pending
+
+
 def license_report(
     upload_results: typing.Sequence[UploadResult],
 ) -> typing.Sequence[typing.Tuple[UploadResult, typing.Set[License]]]:
     for upload_result in upload_results:
-        analysis_result = upload_result.result
-        licenses = {
-            component.license() for component in analysis_result.components()
-            if component.license()
-        }
+        licenses = upload_result.result.vulnerability_table().licenses()
         yield (upload_result, licenses)
 
 
@@ -98,20 +225,15 @@ def filter_and_display_upload_results(
     results_above_cve_thresh = []
 
     for result in results:
-        components = result.components()
-        if not components:
-            results_without_components.append()
+        vulnerability_table = result.vulnerability_table()
+        if not vulnerability_table.has_components():
+            results_without_components.append(result)
             continue
 
-        greatest_cve = -1
-
-        for component in components:
-            vulnerabilities = filter(lambda v: not v.historical(), component.vulnerabilities())
-            if ignore_if_triaged:
-                vulnerabilities = filter(lambda v: not v.has_triage(), vulnerabilities)
-            greatest_cve_candidate = highest_major_cve_severity(vulnerabilities)
-            if greatest_cve_candidate > greatest_cve:
-                greatest_cve = greatest_cve_candidate
+        greatest_cve = vulnerability_table.greatest_severity(
+            ignore_historical=True,
+            ignore_triaged=ignore_if_triaged,
+        )
 
         if greatest_cve >= cve_threshold:
             results_above_cve_thresh.append((result, greatest_cve))
@@ -149,12 +271,43 @@ def filter_and_display_upload_results(
     return results_above_cve_thresh
 
 
+def write_vulnerability_report(
+    upload_results: typing.Sequence[UploadResult],
+    out_file,
+    format: str='json',
+):
+    '''
+    writes one record per vulnerability found in the given upload results to the given
+    (text) file object.
+
+    @param format: either `json` (a list of objects) or `csv` (with a header line)
+    '''
+    columns = ('product_id', 'display_name') + VulnerabilityTable.COLUMNS
+
+    def rows():
+        for upload_result in upload_results:
+            analysis_result = upload_result.result
+            prefix = (analysis_result.product_id(), analysis_result.display_name())
+            for row in analysis_result.vulnerability_table().rows():
+                yield prefix + row
+
+    if format == 'json':
+        json.dump([dict(zip(columns, row)) for row in rows()], out_file, indent=2)
+    elif format == 'csv':
+        writer = csv.writer(out_file)
+        writer.writerow(columns)
+        writer.writerows(rows())
+    else:
+        raise NotImplementedError(format)
+
+
 def _create_task(protecode_util, container_image, component):
     def task_function():
         try:
             return protecode_util.upload_image(
                 container_image=container_image,
                 component=component,
+                wait_for_result=False,
             )
         except requests.exceptions.ConnectionError:
             error(
@@ -21,19 +21,125 @@ except ModuleNotFoundError:
     import sys
     sys.modules['requests.packages.urllib3.util.url'] = requests.packages.urllib3.util
 
+import functools
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
 from slackclient import SlackClient
+from slackclient.slackrequest import SlackRequest
 from pydash import _
 
-from util import info
+from util import info, warning
 from model.slack import SlackConfig
 
 
+class _PooledSlackRequest(SlackRequest):
+    '''
+    performs Slack API requests using a shared `requests.Session` (slackclient opens a new
+    connection for each request)
+    '''
+    def __init__(self, proxies=None):
+        super().__init__(proxies=proxies)
+        self.session = requests.Session()
+
+    def do(self, token, request='?', post_data=None, domain='slack.com', timeout=None):
+        post_data = dict(post_data or {})
+        files = None
+        if request == 'files.upload' and 'file' in post_data:
+            files = {'file': post_data.pop('file')}
+        for key, value in post_data.items():
+            if isinstance(value, (list, tuple)) and key in ('channels', 'users', 'types'):
+                post_data[key] = ','.join(value)
+            elif isinstance(value, (list, dict)):
+                post_data[key] = json.dumps(value) # e.g. attachments
+
+        return self.session.post(
+            'https://{d}/api/{r}'.format(d=domain, r=request),
+            headers={
+                'user-agent': self.get_user_agent(),
+                'Authorization': 'Bearer {t}'.format(t=token),
+            },
+            data=post_data,
+            files=files,
+            timeout=timeout,
+            proxies=self.proxies,
+        )
+
+
+@functools.lru_cache()
+def _slack_client(api_token: str):
+    client = SlackClient(token=api_token)
+    client.server.api_requester = _PooledSlackRequest()
+    return client
+
+
+def _retry_after_seconds(result, default: float):
+    headers = {k.lower(): v for k, v in _.get(result, 'headers', {}).items()}
+    try:
+        return float(headers['retry-after'])
+    except (KeyError, ValueError):
+        return default
+
+
 class SlackHelper(object):
+    '''
+    posts messages to Slack, reusing the client (and its connections) for all helpers using the
+    same api token.
+
+    Requests rejected by Slack's rate limiting (error `ratelimited`) are retried after the
+    period given by Slack (Retry-After header); requests failing due to connection errors are
+    retried with exponential backoff.
+    '''
     def __init__(
             self,
-            slack_cfg: SlackConfig
+            slack_cfg: SlackConfig,
+            max_attempts: int=5,
+            timeout_seconds: float=60,
     ):
         self.slack_cfg = slack_cfg
+        self.max_attempts = max_attempts
+        self.timeout_seconds = timeout_seconds
+
+    def _client(self):
+        api_token = self.slack_cfg.api_token()
+
+        if not api_token:
+            raise RuntimeError("can't post to slack as there is no slack api token in config")
+
+        return _slack_client(api_token)
+
+    def _sleep(self, seconds: float):
+        time.sleep(seconds)
+
+    def _api_call(self, method: str, **kwargs):
+        client = self._client()
+        for attempt in range(1, self.max_attempts + 1):
+            backoff_seconds = 2 ** (attempt - 1)
+            try:
+                result = client.api_call(method, timeout=self.timeout_seconds, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_attempts:
+                    raise RuntimeError('failed to call slack api {m}: {e}'.format(m=method, e=e))
+                warning('failed to call slack api {m}: {e} - retrying in {s}s'.format(
+                    m=method,
+                    e=e,
+                    s=backoff_seconds,
+                ))
+                self._sleep(backoff_seconds)
+                continue
+
+            if _.get(result, 'ok', False):
+                return result
+            if _.get(result, 'error') == 'ratelimited' and attempt < self.max_attempts:
+                retry_after_seconds = _retry_after_seconds(result, default=backoff_seconds)
+                info('slack rate limit exceeded - retrying in {s}s'.format(s=retry_after_seconds))
+                self._sleep(retry_after_seconds)
+                continue
+            return result
 
     def post_to_slack(
         self,
@@ -42,26 +148,138 @@ class SlackHelper(object):
         message: str,
         filtetype: str='post'
     ):
-        api_token = self.slack_cfg.api_token()
-
-        if not api_token:
-            raise RuntimeError("can't post to slack as there is no slack api token in config")
+        self.post_to_channels(
+            channels=(channel,),
+            title=title,
+            message=message,
+            filetype=filtetype,
+        )
 
-        info('posting message "{title}" to slack channel {c}'.format(title=title, c=channel))
-        client = SlackClient(token=api_token)
+    def post_to_channels(
+        self,
+        channels: [str],
+        title: str,
+        message: str,
+        filetype: str='post',
+    ):
+        '''
+        posts the given message to all given channels (sharing the message with all channels
+        using a single upload)
+        '''
+        channels = list(channels)
+        info('posting message "{title}" to slack channel(s) {c}'.format(
+            title=title,
+            c=', '.join(channels),
+        ))
         # We expect rather long messages, so we do not use incoming webhooks etc. to post
         # messages as those get truncated, see
         # https://api.slack.com/changelog/2018-04-truncating-really-long-messages
         # Instead we use the file upload mechanism so that this limit does not apply.
-        result = client.api_call(
+        result = self._api_call(
             "files.upload",
-            channels=channel,
+            channels=','.join(channels),
             file=(title, message),
             title=title,
-            filetype=filtetype
+            filetype=filetype
         )
         if not _.get(result, 'ok', False):
-            raise RuntimeError('failed to post to slack channel {c}: {err}'.format(
-                c=channel,
+            raise RuntimeError('failed to post to slack channel(s) {c}: {err}'.format(
+                c=', '.join(channels),
                 err=_.get(result, 'error')
             ))
+        return result
+
+
+_STOP = object()
+
+
+class SlackChannelQueues(object):
+    '''
+    posts messages from one background thread per channel: messages to the same channel are
+    posted in order, at most one per `min_interval_seconds` (Slack's per-channel rate limit),
+    while different channels are served concurrently.
+
+    `submit` returns a `concurrent.futures.Future` for each message.
+    '''
+    def __init__(self, slack_helper: SlackHelper, min_interval_seconds: float=1):
+        self.slack_helper = slack_helper
+        self.min_interval_seconds = min_interval_seconds
+        self._queues = {} # channel: queue.Queue
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, channel: str, title: str, message: str, filetype: str='post') -> Future:
+        future = Future()
+        self._queue(channel).put(([channel], title, message, filetype, future))
+        return future
+
+    def submit_to_channels(self, channels: [str], title: str, message: str, filetype='post'):
+        '''
+        posts the given message to all given channels (with a single upload)
+        @return a future for the upload
+        '''
+        future = Future()
+        channels = list(channels)
+        # serialise with other messages to the first channel (all other channels are served
+        # by the same upload)
+        self._queue(channels[0]).put((channels, title, message, filetype, future))
+        return future
+
+    def flush(self):
+        '''
+        blocks until all submitted messages were posted (or failed)
+        '''
+        with self._lock:
+            queues = list(self._queues.values())
+        for channel_queue in queues:
+            channel_queue.join()
+
+    def close(self):
+        with self._lock:
+            queues, threads = list(self._queues.values()), self._threads
+            self._queues, self._threads = {}, []
+        for channel_queue in queues:
+            channel_queue.put(_STOP)
+        for thread in threads:
+            thread.join()
+
+    def _queue(self, channel: str):
+        with self._lock:
+            channel_queue = self._queues.get(channel)
+            if not channel_queue:
+                channel_queue = self._queues[channel] = queue.Queue()
+                thread = threading.Thread(
+                    target=self._post_queued,
+                    args=(channel, channel_queue),
+                    daemon=True,
+                )
+                self._threads.append(thread)
+                thread.start()
+            return channel_queue
+
+    def _post_queued(self, channel: str, channel_queue: queue.Queue):
+        last_post = None
+        while True:
+            item = channel_queue.get()
+            if item is _STOP:
+                channel_queue.task_done()
+                return
+            channels, title, message, filetype, future = item
+
+            if last_post is not None:
+                wait_seconds = last_post + self.min_interval_seconds - time.monotonic()
+                if wait_seconds > 0:
+                    self.slack_helper._sleep(wait_seconds)
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(self.slack_helper.post_to_channels(
+                        channels=channels,
+                        title=title,
+                        message=message,
+                        filetype=filetype,
+                    ))
+                except Exception as e:
+                    future.set_exception(e)
+                last_post = time.monotonic()
+            channel_queue.task_done()
@@ -0,0 +1,166 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import json
+import threading
+import unittest
+import weakref
+from unittest import mock
+
+import ccc.elasticsearch
+from ccc.elasticsearch import (
+    BulkIndexer,
+    ElasticSearchClient,
+    _inject_metadata,
+    _inject_metadata_into_bulk_body,
+)
+
+METADATA = {'build-name': '42', 'concourse_url': 'https://ci/builds/42'}
+
+
+class FakeElasticsearch(object):
+    def __init__(self, item_statuses=()):
+        # list of per-request item status lists (default: all items succeed)
+        self.item_statuses = list(item_statuses)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def bulk(self, body):
+        lines = body.splitlines()
+        documents = [json.loads(line) for line in lines[1::2]]
+        with self.lock:
+            self.requests.append(documents)
+            statuses = self.item_statuses.pop(0) if self.item_statuses else [201] * len(documents)
+        return {
+            'errors': any(status >= 300 for status in statuses),
+            'items': [{'index': {'status': status}} for status in statuses],
+        }
+
+
+class FakeBulkIndexer(BulkIndexer):
+    def _sleep(self, seconds):
+        pass
+
+
+class MetadataInjectionTest(unittest.TestCase):
+    def setUp(self):
+        patchers = (
+            mock.patch.object(ccc.elasticsearch, '_metadata_dict', lambda: METADATA),
+            mock.patch.object(ccc.elasticsearch, '_metadata_json', lambda: json.dumps(METADATA)),
+        )
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_inject_metadata(self):
+        self.assertEqual(
+            json.loads(_inject_metadata('{"a": 1}')),
+            {'a': 1, 'cc_meta': METADATA},
+        )
+        self.assertEqual(json.loads(_inject_metadata('{}')), {'cc_meta': METADATA})
+        # existing attribute is replaced
+        self.assertEqual(
+            json.loads(_inject_metadata('{"cc_meta": 1, "b": 2}')),
+            {'b': 2, 'cc_meta': METADATA},
+        )
+
+    def test_inject_metadata_into_bulk_body(self):
+        body = '\n'.join((
+            '{"index": {"_index": "i"}}',
+            '{"index": "not an action"}',
+            '{"delete": {"_index": "i", "_id": "1"}}',
+            '{"update": {"_index": "i", "_id": "2"}}',
+            '{"doc": {"a": 1}}',
+        ))
+        lines = _inject_metadata_into_bulk_body(body).splitlines()
+
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(json.loads(lines[1]), {'index': 'not an action', 'cc_meta': METADATA})
+        self.assertEqual(json.loads(lines[4]), {'doc': {'a': 1}})
+
+
+class BulkIndexerTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ccc.elasticsearch, '_metadata_dict', lambda: None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api = FakeElasticsearch()
+        self.client = ElasticSearchClient(self.api)
+
+    def indexer(self, **kwargs):
+        kwargs.setdefault('flush_interval_seconds', 60)
+        return FakeBulkIndexer(elasticsearch_client=self.client, index='metrics', **kwargs)
+
+    def test_documents_are_stored_in_batches(self):
+        indexer = self.indexer(max_documents=3)
+        for i in range(7):
+            indexer.add({'i': i})
+        indexer.close()
+
+        stored = [doc['i'] for request in self.api.requests for doc in request]
+        self.assertEqual(sorted(stored), list(range(7)))
+        self.assertTrue(all(len(request) <= 3 for request in self.api.requests))
+        self.assertEqual(indexer.indexed_count, 7)
+        self.assertEqual(indexer.failed_count, 0)
+
+    def test_batches_are_limited_by_size(self):
+        indexer = self.indexer(max_bytes=200)
+        items = [('{"index": {}}', json.dumps({'payload': 'x' * 50})) for _ in range(10)]
+
+        batches = list(indexer._batches(items))
+
+        self.assertEqual(sum(len(batch) for batch in batches), 10)
+        for batch in batches:
+            self.assertLessEqual(sum(len(a) + len(s) + 2 for a, s in batch), 200)
+
+    def test_retryable_items_are_retried(self):
+        self.api.item_statuses = [[201, 429, 400], [503], [201]]
+        indexer = self.indexer()
+        for i in range(3):
+            indexer.add({'i': i})
+        indexer.flush()
+
+        self.assertEqual([[doc['i'] for doc in r] for r in self.api.requests], [[0, 1, 2], [1], [1]])
+        self.assertEqual(indexer.indexed_count, 2)
+        self.assertEqual(indexer.failed_count, 1)
+        indexer.close()
+
+    def test_retries_are_limited(self):
+        self.api.item_statuses = [[429], [429]]
+        indexer = self.indexer(max_attempts=2)
+        indexer.add({'i': 0})
+        indexer.close()
+
+        self.assertEqual(len(self.api.requests), 2)
+        self.assertEqual(indexer.failed_count, 1)
+
+    def test_add_after_close_fails(self):
+        indexer = self.indexer()
+        indexer.close()
+
+        with self.assertRaises(RuntimeError):
+            indexer.add({})
+
+    def test_closed_indexer_is_not_retained(self):
+        indexer = self.indexer()
+        indexer.add({'i': 0})
+        indexer.close()
+        indexer_ref = weakref.ref(indexer)
+
+        del indexer
+        gc.collect()
+
+        self.assertIsNone(indexer_ref())
@@ -0,0 +1,105 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import types
+
+import pytest
+
+from github3.exceptions import NotFoundError
+
+import github.util
+from github.codeowners import CodeOwnerEntryResolver
+
+
+class FakeGitHubApi(object):
+    def __init__(self, emails, teams):
+        self.session = types.SimpleNamespace(base_url='https://api.example.org')
+        self.emails = emails
+        self.teams = teams
+        self.user_calls = []
+        self.team_calls = []
+        self._lock = threading.Lock()
+
+    def user(self, user_name):
+        with self._lock:
+            self.user_calls.append(user_name.lower())
+        # user names are case-insensitive
+        if user_name.lower() not in self.emails:
+            raise NotFoundError(types.SimpleNamespace(status_code=404, content=b''))
+        return types.SimpleNamespace(login=user_name, email=self.emails.get(user_name.lower()))
+
+    def organization(self, org_name):
+        api = self
+
+        class Organization(object):
+            def team_by_name(self, team_slug):
+                api.team_calls.append(team_slug)
+                if team_slug not in api.teams:
+                    raise NotFoundError(types.SimpleNamespace(status_code=404, content=b''))
+                members = [types.SimpleNamespace(login=m) for m in api.teams[team_slug]]
+                return types.SimpleNamespace(members=lambda: iter(members))
+
+            def teams(self):
+                return iter(())
+
+        return Organization()
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    github.util._user_email_addresses.invalidate()
+    github.util._team_member_names.invalidate()
+    yield
+
+
+def test_resolve_email_addresses():
+    api = FakeGitHubApi(
+        emails={'alice': 'alice@example.org', 'bob': 'bob@example.org', 'carol': None},
+        teams={'team': ['bob', 'carol', 'alice']},
+    )
+    examinee = CodeOwnerEntryResolver(github_api=api)
+
+    entries = ['@alice', 'dave@example.org', 'no-address', '@carol', '@org/team', '@org/absent']
+    assert list(examinee.resolve_email_addresses(entries)) == [
+        'alice@example.org',
+        'dave@example.org',
+        'bob@example.org',
+        'alice@example.org',
+    ]
+    # each user is looked-up only once
+    assert sorted(api.user_calls) == ['alice', 'bob', 'carol']
+
+
+def test_resolution_is_cached_across_resolvers():
+    api = FakeGitHubApi(emails={'alice': 'alice@example.org'}, teams={'team': ['alice']})
+
+    for _ in range(3):
+        resolver = CodeOwnerEntryResolver(github_api=api)
+        assert list(resolver.resolve_email_addresses(['@org/team', '@Alice'])) == \
+            ['alice@example.org', 'alice@example.org']
+
+    assert api.team_calls == ['team']
+    assert api.user_calls == ['alice']
+
+
+def test_unknown_users_are_skipped():
+    api = FakeGitHubApi(emails={'alice': 'alice@example.org'}, teams={'team': ['ghost', 'alice']})
+    examinee = CodeOwnerEntryResolver(github_api=api)
+
+    assert list(examinee.resolve_email_addresses(['@ghost', '@alice', '@org/team'])) == \
+        ['alice@example.org', 'alice@example.org']
+    # unknown users are looked-up only once
+    assert api.user_calls.count('ghost') == 1
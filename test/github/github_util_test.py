@@ -14,8 +14,15 @@
 # limitations under the License.
 
 import functools
+import io
+import json
+import os
+import tempfile
+import types
 import unittest
 
+import requests
+
 import github.util as ghu
 import product.model as pm
 
@@ -126,3 +133,250 @@ class UpgradePullRequestTest(unittest.TestCase):
         self.assertTrue(
             examinee.target_matches(pm.WebDependencyReference.create(name='red', version='2.0.0'))
         )
+
+
+class FakeSession(object):
+    def __init__(self, responses):
+        self.responses = responses # url: (status_code, body)
+        self.requested_urls = []
+
+    def get(self, url, headers=None, stream=False):
+        self.requested_urls.append(url)
+        status_code, body = self.responses.get(url, (404, b'{}'))
+        response = requests.Response()
+        response.status_code = status_code
+        response.raw = io.BytesIO(body)
+        return response
+
+
+class FakeRepository(object):
+    def __init__(self, session):
+        self.url = 'https://api.gh.com/repos/o/r'
+        self.session = session
+
+
+class ReleaseAssetFetcherTest(unittest.TestCase):
+    def setUp(self):
+        repo_url = 'https://api.gh.com/repos/o/r'
+        release = {'assets': [
+            {'id': 42, 'name': 'descriptor.yaml', 'label': 'my_label'},
+            {'id': 43, 'name': 'deleted.yaml', 'label': None},
+        ]}
+        self.session = FakeSession(responses={
+            repo_url + '/releases/tags/1.2.3': (200, json.dumps(release).encode()),
+            repo_url + '/releases/assets/42': (200, b'foo: bar\n'),
+            repo_url + '/releases/assets/43': (404, b'{"message": "asset was deleted"}'),
+        })
+        repository = FakeRepository(session=self.session)
+        self.repository_lookups = []
+
+        class FakeGitHub(object):
+            def repository(_, owner, name):
+                self.repository_lookups.append((owner, name))
+                return repository
+
+        # use a private index in order not to interfere with other tests
+        ghu.ReleaseAssetFetcher._asset_ids = {}
+        self.examinee = ghu.ReleaseAssetFetcher(github_api_lookup=lambda host: FakeGitHub())
+        self.retrieve = functools.partial(
+            self.examinee.asset_contents,
+            host='gh.com',
+            owner='o',
+            name='r',
+            release_tag='1.2.3',
+        )
+
+    def test_asset_contents(self):
+        self.assertEqual(self.retrieve(asset_label='my_label'), 'foo: bar\n')
+        self.assertEqual(self.retrieve(asset_label='descriptor.yaml'), 'foo: bar\n')
+        self.assertEqual(
+            self.examinee.asset_yaml(
+                host='gh.com', owner='o', name='r', release_tag='1.2.3', asset_label='my_label',
+            ),
+            {'foo': 'bar'},
+        )
+
+        # repository and release must only be looked up once
+        self.assertEqual(self.repository_lookups, [('o', 'r')])
+        self.assertEqual(
+            [url for url in self.session.requested_urls if '/releases/tags/' in url],
+            ['https://api.gh.com/repos/o/r/releases/tags/1.2.3'],
+        )
+
+    def test_missing_asset(self):
+        with self.assertRaises(ghu.NotFoundError):
+            self.retrieve(asset_label='no_such_asset')
+        # error details are taken from the response body
+        with self.assertRaisesRegex(ghu.NotFoundError, 'asset was deleted'):
+            self.retrieve(asset_label='deleted.yaml')
+        with self.assertRaises(ghu.NotFoundError):
+            self.examinee.asset_contents(
+                host='gh.com', owner='o', name='r', release_tag='0.0.0', asset_label='my_label',
+            )
+
+
+class FakeTeam(object):
+    def __init__(self, name, repo_names, failing_repo_names=()):
+        self.name = name
+        self.repo_names = list(repo_names)
+        self.failing_repo_names = failing_repo_names
+        self.added = []
+
+    def repositories(self):
+        return (FakeShortRepository(name) for name in self.repo_names)
+
+    def add_repository(self, repository, permission):
+        if repository in self.failing_repo_names:
+            return False
+        self.added.append((repository, permission))
+        return True
+
+
+class FakeShortRepository(object):
+    def __init__(self, full_name):
+        self.full_name = full_name
+
+
+class FakeOrganization(object):
+    def __init__(self, repo_names, teams):
+        self.repo_names = repo_names
+        self.teams_by_slug = {ghu._team_slug(team.name): team for team in teams}
+        self.listed_teams = False
+
+    def repositories(self):
+        return (FakeShortRepository(name) for name in self.repo_names)
+
+    def team_by_name(self, team_slug):
+        if team_slug not in self.teams_by_slug:
+            raise ghu._not_found_error(team_slug)
+        return self.teams_by_slug[team_slug]
+
+    def teams(self):
+        self.listed_teams = True
+        return iter(self.teams_by_slug.values())
+
+
+class FakeGitHub(object):
+    def __init__(self, organization):
+        self._organization = organization
+
+    def organization(self, name):
+        return self._organization
+
+
+class AddAllReposToTeamTest(unittest.TestCase):
+    def setUp(self):
+        self.team = FakeTeam(name='CI Team', repo_names=['org/a', 'Org/C'])
+        self.organization = FakeOrganization(
+            repo_names=['org/a', 'org/b', 'org/c', 'org/d'],
+            teams=[self.team],
+        )
+        self.github = FakeGitHub(self.organization)
+
+    def test_add_missing_repositories(self):
+        added = ghu._add_all_repos_to_team(
+            github=self.github,
+            organization_name='org',
+            team_name='CI Team',
+            permission=ghu.RepoPermission.PUSH,
+        )
+
+        self.assertEqual(added, ['org/b', 'org/d'])
+        self.assertEqual(sorted(self.team.added), [('org/b', 'push'), ('org/d', 'push')])
+        # team was found by its slug
+        self.assertFalse(self.organization.listed_teams)
+
+    def test_dry_run(self):
+        added = ghu._add_all_repos_to_team(
+            github=self.github,
+            organization_name='org',
+            team_name='CI Team',
+            dry_run=True,
+        )
+
+        self.assertEqual(added, ['org/b', 'org/d'])
+        self.assertEqual(self.team.added, [])
+
+    def test_failing_additions(self):
+        self.team.failing_repo_names = ('org/b',)
+
+        with self.assertRaises(ghu.util.Failure):
+            ghu._add_all_repos_to_team(
+                github=self.github,
+                organization_name='org',
+                team_name='CI Team',
+            )
+        self.assertEqual(self.team.added, [('org/d', 'admin')])
+
+
+class FakeUserGitHub(object):
+    def __init__(self, emails):
+        self.session = types.SimpleNamespace(base_url='https://api.example.org')
+        self.emails = emails
+        self.user_calls = []
+
+    def user(self, user_name):
+        self.user_calls.append(user_name)
+        if user_name.lower() not in self.emails:
+            raise ghu._not_found_error(user_name)
+        return types.SimpleNamespace(email=self.emails[user_name.lower()])
+
+
+class RetrieveEmailAddressesTest(unittest.TestCase):
+    def setUp(self):
+        ghu._user_email_addresses.invalidate()
+        self.github = FakeUserGitHub(emails={
+            'a': 'a@example.org',
+            'b': None,
+            'c': 'c@example.org',
+            'c2': 'c@example.org',
+            'd': 'd@example.org',
+        })
+        self._create_github_api_object = ghu._create_github_api_object
+        ghu._create_github_api_object = lambda github_cfg: self.github
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        ghu._create_github_api_object = self._create_github_api_object
+        ghu._user_email_addresses.invalidate()
+        self.tmp_dir.cleanup()
+
+    def retrieve(self, github_users, cache_file=None):
+        out_file = os.path.join(self.tmp_dir.name, 'out.txt')
+        ghu.retrieve_email_addresses(
+            github_cfg=None,
+            github_users=github_users,
+            out_file=out_file,
+            cache_file=cache_file,
+        )
+        with open(out_file) as f:
+            return f.read().split()
+
+    def test_retrieve_email_addresses(self):
+        email_addresses = self.retrieve(['d', 'a', 'b', 'A', 'unknown', 'c', 'c2', 'd'])
+
+        self.assertEqual(email_addresses, ['d@example.org', 'a@example.org', 'c@example.org'])
+        self.assertEqual(sorted(self.github.user_calls), ['a', 'b', 'c', 'c2', 'd', 'unknown'])
+
+    def test_persistent_cache(self):
+        cache_file = os.path.join(self.tmp_dir.name, 'cache', 'emails.json')
+        self.retrieve(['a', 'b'], cache_file=cache_file)
+        ghu._user_email_addresses.invalidate()
+        self.github.user_calls.clear()
+
+        self.assertEqual(self.retrieve(['b', 'a', 'c'], cache_file=cache_file),
+                         ['a@example.org', 'c@example.org'])
+        self.assertEqual(self.github.user_calls, ['c'])
+        # shared with CODEOWNERS resolution
+        self.assertEqual(ghu.user_email_address(self.github, 'A'), 'a@example.org')
+        self.assertEqual(self.github.user_calls, ['c'])
+
+    def test_cache_file_ttl(self):
+        cache_file = os.path.join(self.tmp_dir.name, 'emails.json')
+        self.retrieve(['a'])
+        self.retrieve(['c'], cache_file=cache_file)
+
+        ttls = {key[1]: ttl for key, ttl, _ in ghu._user_email_addresses.items()}
+        # in-process entries expire after an hour, entries retrieved for the cache file after a day
+        self.assertLessEqual(ttls['a'], 3600)
+        self.assertGreater(ttls['c'], 3600)
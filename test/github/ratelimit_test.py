@@ -0,0 +1,163 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+
+import pytest
+import requests
+
+import github.ratelimit as examinee
+
+
+class FakeClock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def response(status_code=200, remaining=None, limit=5000, reset_at=None, headers={}, body={}):
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp._content = json.dumps(body).encode('utf-8')
+    resp.raw = io.BytesIO()
+    if remaining is not None:
+        resp.headers['X-RateLimit-Remaining'] = str(remaining)
+        resp.headers['X-RateLimit-Limit'] = str(limit)
+        resp.headers['X-RateLimit-Reset'] = str(reset_at)
+    resp.headers.update(headers)
+    return resp
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def budget(clock):
+    return examinee.RateLimitBudget(host='github.example', clock=clock)
+
+
+def test_no_throttling_above_low_watermark(budget, clock):
+    assert budget.acquire() == 0 # no quota known yet
+    budget.update(response(remaining=4000, reset_at=clock.now + 3600))
+
+    for _ in range(100):
+        assert budget.acquire() == 0
+
+
+def test_throttling_below_low_watermark(budget, clock):
+    # 370 requests left for 3600s (minus reserve of 10) -> one request per 10s
+    assert not budget.update(response(remaining=370, reset_at=clock.now + 3600))
+
+    waits = [budget.acquire() for _ in range(3)]
+    assert waits[0] == 0
+    assert waits[1] == pytest.approx(10)
+    assert waits[2] == pytest.approx(20)
+
+    metrics = budget.metrics()
+    assert metrics['remaining'] == 370
+    assert metrics['throttled_request_count'] == 2
+    assert metrics['total_wait_seconds'] == pytest.approx(30)
+
+
+def test_blocked_until_reset_if_exhausted(budget, clock):
+    reset_at = clock.now + 120
+    # primary limit exhausted: retry (reset is near enough)
+    assert budget.update(response(status_code=403, remaining=0, reset_at=reset_at))
+    assert budget.acquire() == pytest.approx(120)
+
+
+def test_stale_quota_is_ignored(budget, clock):
+    reset_at = clock.now + 3600
+    budget.update(response(remaining=100, reset_at=reset_at))
+    budget.update(response(remaining=4000, reset_at=reset_at)) # arrived late
+    assert budget.metrics()['remaining'] == 100
+
+
+def test_secondary_rate_limit(budget, clock):
+    # honour Retry-After
+    assert budget.update(response(status_code=403, headers={'Retry-After': '30'}))
+    assert budget.acquire() == pytest.approx(30)
+
+    # w/o Retry-After: exponential backoff
+    clock.now += 30
+    secondary_limit = response(
+        status_code=403,
+        body={'message': 'You have exceeded a secondary rate limit.'},
+    )
+    assert budget.update(secondary_limit)
+    assert budget.acquire() == pytest.approx(60)
+    assert budget.update(secondary_limit)
+    assert budget.acquire() == pytest.approx(120)
+    assert budget.metrics()['secondary_limit_count'] == 3
+
+    # other 403s are not retried
+    assert not budget.update(response(status_code=403, body={'message': 'Forbidden'}))
+
+
+def test_budgets_are_shared_per_host_and_token():
+    budget = examinee.budget_for(host='github.example', auth_token='token1')
+    assert examinee.budget_for(host='github.example', auth_token='token1') is budget
+    assert examinee.budget_for(host='github.example', auth_token='token2') is not budget
+    assert examinee.budget_for(host='other.example', auth_token='token1') is not budget
+
+
+def test_adapter_retries_rate_limited_requests(budget, monkeypatch):
+    responses = [
+        response(status_code=403, headers={'Retry-After': '5'}),
+        response(status_code=200),
+    ]
+
+    class FakeHTTPAdapter(examinee.RateLimitedHTTPAdapter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.sleeps = []
+            self._sleep = self.sleeps.append
+
+    adapter = FakeHTTPAdapter(budget=budget)
+    # bypass network
+    monkeypatch.setattr(
+        examinee.HTTPAdapter,
+        'send',
+        lambda self, request, *args, **kwargs: responses.pop(0),
+    )
+    result = adapter.send(requests.Request('GET', 'https://github.example/x').prepare())
+
+    assert result.status_code == 200
+    assert adapter.sleeps == [pytest.approx(5)]
+
+
+def test_adapter_does_not_retry_streamed_bodies(budget, monkeypatch):
+    responses = [
+        response(status_code=403, headers={'Retry-After': '5'}),
+        response(status_code=200),
+    ]
+    adapter = examinee.RateLimitedHTTPAdapter(budget=budget)
+    adapter._sleep = lambda seconds: None
+    monkeypatch.setattr(
+        examinee.HTTPAdapter,
+        'send',
+        lambda self, request, *args, **kwargs: responses.pop(0),
+    )
+    request = requests.Request('POST', 'https://github.example/x', data=io.BytesIO(b'x'))
+
+    result = adapter.send(request.prepare())
+
+    assert result.status_code == 403
+    assert len(responses) == 1
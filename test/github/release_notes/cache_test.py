@@ -0,0 +1,85 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import github.release_notes.util
+from github.release_notes.cache import ReleaseNotesCache
+from github.release_notes.model import REF_TYPE_COMMIT
+from test.github.release_notes.default_util import (
+    release_note_block_with_defaults,
+    CURRENT_REPO,
+)
+
+
+class ReleaseNotesCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.tmp_dir.name, 'cache.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_roundtrip(self):
+        blocks = [
+            release_note_block_with_defaults(),
+            release_note_block_with_defaults(
+                text='from other repo',
+                reference_type=REF_TYPE_COMMIT,
+                reference_id='abc',
+                user_login=None,
+                source_repo='github.com/madeup/other-repo',
+            ),
+        ]
+        commit_key = ReleaseNotesCache.commit_key('madeup/current-repo', 'abc')
+        pr_key = ReleaseNotesCache.pull_request_key('madeup/current-repo', '42', '2019-01-01')
+
+        examinee = ReleaseNotesCache(cache_file=self.cache_file)
+        self.assertIsNone(examinee.get(commit_key, CURRENT_REPO))
+        examinee.put(commit_key, blocks)
+        examinee.put(pr_key, [])
+        examinee.store()
+
+        examinee = ReleaseNotesCache(cache_file=self.cache_file)
+        self.assertEqual(blocks, examinee.get(commit_key, CURRENT_REPO))
+        self.assertEqual([], examinee.get(pr_key, CURRENT_REPO))
+
+    def test_store_retains_only_used_entries(self):
+        examinee = ReleaseNotesCache(cache_file=self.cache_file)
+        examinee.put('used', [])
+        examinee.put('unused', [])
+        examinee.store()
+
+        examinee = ReleaseNotesCache(cache_file=self.cache_file)
+        self.assertEqual([], examinee.get('used', CURRENT_REPO))
+        examinee.store()
+
+        examinee = ReleaseNotesCache(cache_file=self.cache_file)
+        self.assertEqual([], examinee.get('used', CURRENT_REPO))
+        self.assertIsNone(examinee.get('unused', CURRENT_REPO))
+
+    def test_create_uses_cache_file_from_env(self):
+        def rls_note_objs(cache, **kwargs):
+            cache.put('key', [])
+            return []
+
+        with mock.patch.object(github.release_notes.util, '_rls_note_objs', rls_note_objs), \
+                mock.patch.dict(os.environ, {'CC_RELEASE_NOTES_CACHE_FILE': self.cache_file}):
+            github.release_notes.util.ReleaseNotes.create(github_helper=None, git_helper=None)
+
+        self.assertEqual([], ReleaseNotesCache(cache_file=self.cache_file).get('key', CURRENT_REPO))
@@ -0,0 +1,93 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Benchmarks rendering of a large, synthetic set of release notes (as found in aggregated
+landscape release notes).
+
+usage (from repository root):
+
+    python -m test.github.release_notes.renderer_benchmark --notes 10000
+'''
+
+import argparse
+import random
+import time
+
+from github.release_notes.model import (
+    REF_TYPE_COMMIT,
+    REF_TYPE_PULL_REQUEST,
+    ReleaseNoteBlock,
+)
+from github.release_notes.renderer import (
+    CATEGORIES,
+    TARGET_GROUPS,
+    MarkdownRenderer,
+)
+from product.model import ComponentName
+
+CURRENT_REPO = ComponentName('github.com/madeup/landscape')
+
+
+def synthetic_release_notes(note_count: int, repo_count: int, seed: int=42):
+    rnd = random.Random(seed)
+    repos = ['github.com/madeup/repo-{i}'.format(i=i) for i in range(repo_count)]
+    repos.append('other.github.example/madeup/foreign-repo')
+
+    for i in range(note_count):
+        reference_type = rnd.choice((REF_TYPE_PULL_REQUEST, REF_TYPE_COMMIT))
+        if reference_type == REF_TYPE_COMMIT:
+            reference_id = '{i:040x}'.format(i=i)
+        else:
+            reference_id = str(i)
+
+        yield ReleaseNoteBlock(
+            category_id=rnd.choice(CATEGORIES).identifier,
+            target_group_id=rnd.choice(TARGET_GROUPS).identifier,
+            text='\n'.join(
+                '* release note {i}, line {n}'.format(i=i, n=n)
+                for n in range(rnd.randint(1, 3))
+            ),
+            reference_type=reference_type,
+            reference_id=reference_id,
+            user_login=rnd.choice((None, 'user-{u}'.format(u=i % 50))),
+            source_repo=rnd.choice(repos),
+            cn_current_repo=CURRENT_REPO,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=10000)
+    parser.add_argument('--repos', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=3)
+    parsed = parser.parse_args()
+
+    release_notes = list(synthetic_release_notes(note_count=parsed.notes, repo_count=parsed.repos))
+
+    timings = []
+    for _ in range(parsed.rounds):
+        start = time.monotonic()
+        rendered = MarkdownRenderer(release_note_objs=release_notes).render()
+        timings.append(time.monotonic() - start)
+
+    print('notes:    {n} (from {r} repositories)'.format(n=len(release_notes), r=parsed.repos))
+    print('lines:    {n}'.format(n=rendered.count('\n') + 1))
+    print('best:     {t:.3f}s'.format(t=min(timings)))
+    print('mean:     {t:.3f}s'.format(t=sum(timings) / len(timings)))
+
+
+if __name__ == '__main__':
+    main()
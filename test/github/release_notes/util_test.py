@@ -13,8 +13,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import io
+import os
+import tempfile
 import unittest
 
+import git
+
+from github.release_notes.cache import ReleaseNotesCache
 from github.release_notes.model import (
     Commit,
     REF_TYPE_PULL_REQUEST,
@@ -24,7 +30,10 @@ from github.release_notes.util import (
     ReleaseNotes,
     pr_number_from_subject,
     commits_from_logs,
-    fetch_release_notes_from_commits
+    commits_from_log_stream,
+    fetch_release_notes_from_commits,
+    fetch_release_notes_from_prs,
+    reachable_release_tags_from_commit,
 )
 from github.release_notes.renderer import (
     CATEGORY_ACTION_ID,
@@ -472,6 +481,26 @@ default release note text
         ]
         self.assertEqual(expected_commits, actual_commits)
 
+    def test_commits_from_log_stream(self):
+        self.assertEqual([], list(commits_from_log_stream(io.BytesIO(b''))))
+
+        log = (
+            'commit-id1\x1fsubject1\x1fmessage1\n\nwith body\x00'
+            '\ncommit-id2\x1fsubject2\x1fmessage2 \u2713\x00'
+        ).encode('utf-8')
+
+        class ChunkedStream(io.BytesIO):
+            # return at most 3 bytes per read to exercise records spanning several chunks
+            def read(self, size=-1):
+                return super().read(3)
+
+        actual_commits = list(commits_from_log_stream(ChunkedStream(log)))
+        expected_commits = [
+            Commit(hash='commit-id1', subject='subject1', message='message1\n\nwith body'),
+            Commit(hash='commit-id2', subject='subject2', message='message2 \u2713'),
+        ]
+        self.assertEqual(expected_commits, actual_commits)
+
     def test_fetch_release_notes_from_commits(self):
         commits = [
             Commit(hash='commit-id1', subject='subject1', message='message1'),
@@ -509,3 +538,157 @@ default release note text
         ]
 
         self.assertEqual(expected_rls_note_objs, actual_rls_note_objs)
+
+    def test_fetch_release_notes_from_prs(self):
+        class FakePullRequest(object):
+            def __init__(self, number, body):
+                self.number = number
+                self.body = body
+
+            def as_dict(self):
+                return {
+                    'number': self.number,
+                    'body': self.body,
+                    'user': {'login': 'foo'},
+                    'updated_at': '2019-01-01T00:00:00Z',
+                }
+
+        class FakeRepository(object):
+            def __init__(self):
+                self.requested_numbers = []
+
+            def pull_request(self, number):
+                self.requested_numbers.append(number)
+                return FakePullRequest(
+                    number=number,
+                    body='```improvement user\nrelease note text in pr {n}\n```'.format(n=number),
+                )
+
+        class FakeGitHubHelper(object):
+            owner = 'madeup'
+            repository_name = 'current-repo'
+            repository = FakeRepository()
+
+        github_helper = FakeGitHubHelper()
+        actual_rls_note_objs = fetch_release_notes_from_prs(
+            github_helper,
+            {'10', '9'},
+            CURRENT_REPO,
+        )
+
+        # only the requested PRs must be retrieved
+        self.assertEqual({9, 10}, set(github_helper.repository.requested_numbers))
+        self.assertEqual(
+            [
+                release_note_block_with_defaults(
+                    text='release note text in pr ' + number,
+                    reference_id=number,
+                )
+                for number in ('9', '10')
+            ],
+            actual_rls_note_objs,
+        )
+
+    def test_fetch_release_notes_from_prs_with_persistent_cache(self):
+        class FakePullRequest(object):
+            def __init__(self, number, updated_at, text):
+                self.number = number
+                self.updated_at = updated_at
+                self.body = '```improvement user\n{t}\n```'.format(t=text)
+
+            def as_dict(self):
+                return {
+                    'number': self.number,
+                    'body': self.body,
+                    'user': {'login': 'foo'},
+                    'updated_at': self.updated_at,
+                }
+
+        class FakeRepository(object):
+            def __init__(self):
+                self.pulls = {}
+                self.requested_numbers = []
+                self.listed_numbers = []
+
+            def pull_request(self, number):
+                self.requested_numbers.append(number)
+                return self.pulls[number]
+
+            def pull_requests(self, state, sort, direction):
+                for pull in sorted(self.pulls.values(), key=lambda p: p.updated_at, reverse=True):
+                    self.listed_numbers.append(pull.number)
+                    yield pull
+
+        class FakeGitHubHelper(object):
+            owner = 'madeup'
+            repository_name = 'current-repo'
+            repository = FakeRepository()
+
+        github_helper = FakeGitHubHelper()
+        repository = github_helper.repository
+        for number in (8, 9, 10):
+            updated_at = f'2019-01-0{number - 7}'
+            repository.pulls[number] = FakePullRequest(number, updated_at, f'pr {number}')
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = os.path.join(tmp_dir, 'cache.json')
+
+            def release_note_texts(pr_numbers):
+                cache = ReleaseNotesCache(cache_file=cache_file)
+                rls_note_objs = fetch_release_notes_from_prs(
+                    github_helper,
+                    pr_numbers,
+                    CURRENT_REPO,
+                    cache=cache,
+                )
+                cache.store()
+                return [rls_note_obj.text for rls_note_obj in rls_note_objs]
+
+            self.assertEqual(['pr 9', 'pr 10'], release_note_texts({'9', '10'}))
+            self.assertEqual({9, 10}, set(repository.requested_numbers))
+
+            # modify one cached pull request and add another one
+            repository.pulls[10] = FakePullRequest(10, '2019-02-01', 'pr 10 modified')
+            repository.pulls[11] = FakePullRequest(11, '2019-02-02', 'pr 11')
+            repository.requested_numbers.clear()
+
+            self.assertEqual(
+                ['pr 9', 'pr 10 modified', 'pr 11'],
+                release_note_texts({'9', '10', '11'}),
+            )
+            # unmodified (9) and modified (10, 11) pull requests were not requested individually
+            self.assertEqual([], repository.requested_numbers)
+            # listing stopped at the first pull request not modified since the last run
+            self.assertEqual([11, 10, 9], repository.listed_numbers)
+
+    def test_reachable_release_tags_from_commit(self):
+        class FakeGitHubHelper(object):
+            def release_tags(self):
+                return ['1.0.0', '1.1.0', '2.0.0', 'not-semver']
+
+        with tempfile.TemporaryDirectory() as repo_dir:
+            repo = git.Repo.init(repo_dir)
+            with repo.config_writer() as cfg:
+                cfg.set_value('user', 'name', 'test')
+                cfg.set_value('user', 'email', 'test@example.com')
+
+            def commit(msg):
+                return repo.index.commit(msg)
+
+            root_commit = commit('root')
+            self.assertEqual(
+                [root_commit.hexsha],
+                reachable_release_tags_from_commit(FakeGitHubHelper(), repo, root_commit),
+            )
+
+            repo.create_tag('1.0.0', ref=commit('first'))
+            repo.create_tag('1.1.0', ref=commit('second'), message='annotated tag')
+            repo.create_tag('0.0.1', ref=commit('third')) # not a github release
+            repo.create_tag('not-semver', ref=repo.head.commit)
+            head = commit('head')
+            repo.create_tag('2.0.0', ref=commit('after head'))
+
+            self.assertEqual(
+                ['1.1.0', '1.0.0'],
+                reachable_release_tags_from_commit(FakeGitHubHelper(), repo, head),
+            )
@@ -0,0 +1,172 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Benchmarks creating commits from a worktree (`GitHelper.index_to_commit`) and updating a
+submodule (`update_submodule`) in a repository with a large tree, comparing against the
+previous approach (`git add` / `git mktree` subprocesses).
+
+usage (from repository root):
+
+    python -m test.gitutil_benchmark --entries 50000 --changes 10
+'''
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+import git
+
+import gitutil
+
+
+def create_repository(repo_dir: str, entry_count: int, dir_count: int):
+    repo = git.Repo.init(repo_dir)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'bench')
+        config.set_value('user', 'email', 'bench@example.org')
+    for i in range(entry_count):
+        if dir_count:
+            path = os.path.join(repo_dir, 'dir-{d}'.format(d=i % dir_count))
+        else:
+            path = repo_dir
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, 'file-{i}.txt'.format(i=i)), 'w') as f:
+            f.write(str(i))
+
+    with open(os.path.join(repo_dir, '.gitmodules'), 'w') as f:
+        f.write('[submodule "sub"]\n\tpath = sub\n\turl = https://example.org/sub\n')
+    repo.git.add('.')
+    repo.git.update_index('--add', '--cacheinfo', '160000', '0' * 39 + '1', 'sub')
+    repo.git.commit('--quiet', '-m', 'initial')
+    return repo
+
+
+def modify_worktree(repo, change_count: int, round_idx: int):
+    paths = repo.git.ls_files().split('\n')
+    step = max(1, len(paths) // change_count)
+    for path in paths[1::step][:change_count]:
+        with open(os.path.join(repo.working_tree_dir, path), 'a') as f:
+            f.write('round {r}\n'.format(r=round_idx))
+
+
+def index_to_commit_subprocess(repo):
+    # previous implementation: stage everything, then write the tree from the index
+    git.cmd.Git(repo.working_tree_dir).add('.')
+    tree = repo.index.write_tree()
+    commit = git.Commit.create_from_tree(
+        repo=repo, tree=tree, parent_commits=[repo.head.commit], message='bench',
+    )
+    repo.index.reset()
+    return commit
+
+
+def update_submodule_subprocess(repo, commit_hash):
+    # previous implementation: serialise the tree and pipe it through git mktree
+    def serialise(tree_element):
+        if tree_element.type == 'submodule':
+            element_type, element_sha = 'commit', commit_hash
+        else:
+            element_type, element_sha = tree_element.type, tree_element.hexsha
+        return '{mode} {type} {sha}\t{path}'.format(
+            mode=format(tree_element.mode, 'o'),
+            type=element_type,
+            sha=element_sha,
+            path=tree_element.path,
+        )
+    tree_representation = '\n'.join(map(serialise, repo.tree('HEAD')))
+    auto_interrupt = repo.git.mktree(istream=subprocess.PIPE, as_process=True)
+    stdout, _ = auto_interrupt.proc.communicate(input=tree_representation.encode())
+    return stdout.decode('utf-8').strip()
+
+
+def timed(function, rounds: int, setup=lambda round_idx: None, teardown=lambda: None):
+    timings = []
+    for round_idx in range(rounds):
+        setup(round_idx)
+        start = time.monotonic()
+        function()
+        timings.append(time.monotonic() - start)
+        teardown()
+    return timings
+
+
+def report(label: str, timings):
+    print('{l:<40} best: {b:.3f}s  mean: {m:.3f}s'.format(
+        l=label,
+        b=min(timings),
+        m=sum(timings) / len(timings),
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--entries', type=int, default=50000)
+    parser.add_argument('--dirs', type=int, default=50, help='0: all entries in root tree')
+    parser.add_argument('--changes', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=3)
+    parsed = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as repo_dir:
+        start = time.monotonic()
+        repo = create_repository(repo_dir, entry_count=parsed.entries, dir_count=parsed.dirs)
+        print('entries: {e} in {d} dir(s) (setup took {t:.1f}s)'.format(
+            e=parsed.entries,
+            d=parsed.dirs or 1,
+            t=time.monotonic() - start,
+        ))
+        helper = gitutil.GitHelper(repo=repo, github_cfg=None, github_repo_path='bench/bench')
+
+        def time_index_to_commit(index_to_commit):
+            return timed(
+                index_to_commit,
+                parsed.rounds,
+                setup=lambda round_idx: modify_worktree(
+                    repo, change_count=parsed.changes, round_idx=round_idx,
+                ),
+                teardown=lambda: repo.git.checkout('.'),
+            )
+
+        report(
+            'index_to_commit ({c} changes)'.format(c=parsed.changes),
+            time_index_to_commit(lambda: helper.index_to_commit(message='bench')),
+        )
+        report(
+            'git add / write-tree ({c} changes)'.format(c=parsed.changes),
+            time_index_to_commit(lambda: index_to_commit_subprocess(repo)),
+        )
+
+        commit_hash = repo.head.commit.hexsha
+        report(
+            'update_submodule',
+            timed(lambda: gitutil.update_submodule(
+                repo_path=repo_dir,
+                tree_ish='HEAD',
+                submodule_path='sub',
+                commit_hash=commit_hash,
+                author='bench',
+                email='bench@example.org',
+            ), parsed.rounds),
+        )
+        report(
+            'ls-tree / mktree',
+            timed(lambda: update_submodule_subprocess(repo, commit_hash), parsed.rounds),
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import git
+import pytest
+
+import gitutil
+
+
+def _commit(repo, file_name, contents):
+    with open(os.path.join(repo.working_tree_dir, file_name), 'w') as f:
+        f.write(contents)
+    repo.index.add([file_name])
+    actor = git.Actor('test', 'test@example.org')
+    return repo.index.commit(f'add {file_name}', author=actor, committer=actor)
+
+
+@pytest.fixture
+def upstream_repo(tmp_path):
+    repo = git.Repo.init(str(tmp_path / 'upstream'))
+    _commit(repo, 'a.txt', 'a')
+    return repo
+
+
+def test_url_without_credentials():
+    assert gitutil._url_without_credentials('https://u:p@example.org:8443/o/r') == \
+        'https://example.org:8443/o/r'
+    assert gitutil._url_without_credentials('https://example.org/o/r') == \
+        'https://example.org/o/r'
+
+
+def test_mirror_cache_update(tmp_path, upstream_repo):
+    examinee = gitutil.MirrorCache(cache_dir=str(tmp_path))
+    url = upstream_repo.working_tree_dir
+
+    mirror_dir = examinee.update(url)
+    mirror = git.Repo(mirror_dir)
+    assert mirror.bare
+    assert mirror.commit('master') == upstream_repo.head.commit
+
+    # incremental update
+    new_commit = _commit(upstream_repo, 'b.txt', 'b')
+    upstream_repo.create_tag('v1')
+    assert examinee.update(url) == mirror_dir
+    assert mirror.commit('master').hexsha == new_commit.hexsha
+    assert mirror.commit('v1').hexsha == new_commit.hexsha
+
+
+def test_clone_into_uses_mirror(tmp_path, upstream_repo, monkeypatch):
+    url = upstream_repo.working_tree_dir
+    monkeypatch.setattr(gitutil, 'url_with_credentials', lambda cfg, path: url)
+    mirror_cache = gitutil.MirrorCache(cache_dir=str(tmp_path))
+
+    for dissociate in (True, False):
+        target_dir = str(tmp_path / f'clone-{dissociate}')
+        helper = gitutil.GitHelper.clone_into(
+            target_directory=target_dir,
+            github_cfg=None,
+            github_repo_path='o/r',
+            mirror_cache=mirror_cache,
+            dissociate=dissociate,
+        )
+        assert helper.repo.head.commit == upstream_repo.head.commit
+        alternates = os.path.join(target_dir, '.git', 'objects', 'info', 'alternates')
+        assert os.path.exists(alternates) != dissociate
+
+
+def _expected_tree(repo):
+    # tree git itself would create from the worktree (leaves the index untouched)
+    index_file = os.path.join(repo.git_dir, 'expected-index')
+    env = {'GIT_INDEX_FILE': index_file}
+    repo.git.read_tree('HEAD', env=env)
+    repo.git.add('--all', env=env)
+    return repo.git.write_tree(env=env)
+
+
+def test_index_to_commit(upstream_repo):
+    work_dir = upstream_repo.working_tree_dir
+    _commit(upstream_repo, 'b.txt', 'b')
+    os.makedirs(os.path.join(work_dir, 'dir', 'nested'))
+    _commit(upstream_repo, 'dir/nested/c.txt', 'c')
+    _commit(upstream_repo, 'dir/d.txt', 'd')
+    head_commit = upstream_repo.head.commit
+
+    def write(path, contents):
+        abs_path = os.path.join(work_dir, path)
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+        with open(abs_path, 'w') as f:
+            f.write(contents)
+
+    write('a.txt', 'changed')
+    os.unlink(os.path.join(work_dir, 'b.txt'))
+    os.unlink(os.path.join(work_dir, 'dir', 'nested', 'c.txt')) # leaves empty tree
+    write('new/deeply/nested.txt', 'new')
+    write('run.sh', 'true')
+    os.chmod(os.path.join(work_dir, 'run.sh'), 0o755)
+    os.symlink('a.txt', os.path.join(work_dir, 'link'))
+
+    expected_tree = _expected_tree(upstream_repo)
+    examinee = gitutil.GitHelper(repo=upstream_repo, github_cfg=None, github_repo_path='o/r')
+    commit = examinee.index_to_commit(message='test')
+
+    assert commit.tree.hexsha == expected_tree
+    assert list(commit.parents) == [head_commit]
+    assert upstream_repo.head.commit == head_commit
+    # trees left empty are removed
+    assert [t.name for t in commit.tree['dir'].trees] == []
+
+
+def test_update_submodule(tmp_path, upstream_repo):
+    repo = git.Repo.init(str(tmp_path / 'repo'))
+    _commit(repo, 'file.txt', 'contents')
+    repo.git(c='protocol.file.allow=always').submodule(
+        'add', '--quiet', upstream_repo.working_tree_dir, 'sub',
+    )
+    repo.index.commit('add submodule')
+    new_commit = _commit(upstream_repo, 'b.txt', 'b')
+
+    commit_hash = gitutil.update_submodule(
+        repo_path=repo.working_tree_dir,
+        tree_ish='master',
+        submodule_path='sub',
+        commit_hash=new_commit.hexsha,
+        author='test',
+        email='test@example.org',
+    )
+
+    commit = repo.commit(commit_hash)
+    assert commit.parents == (repo.commit('master'),)
+    assert repo.git.rev_parse(f'{commit_hash}:sub') == new_commit.hexsha
+    assert repo.git.ls_tree(commit_hash, 'sub').startswith('160000 commit')
+    assert commit.tree['file.txt'] == repo.commit('master').tree['file.txt']
@@ -0,0 +1,82 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import unittest
+
+import requests
+
+import http_requests as examinee
+
+
+def response(url='https://github.example/api/v3/repos/o/r', method='GET'):
+    resp = requests.Response()
+    resp.url = url
+    resp.request = requests.Request(method, url).prepare()
+    return resp
+
+
+class FakeElasticSearchClient(object):
+    def __init__(self):
+        self.bodies = []
+
+    def store_bulk(self, body: str):
+        self.bodies.append(body)
+
+
+class StackTraceTelemetryTest(unittest.TestCase):
+    def setUp(self):
+        self.examinee = examinee.StackTraceTelemetry(buffer_size=5, flush_interval_seconds=3600)
+        self.elastic_client = FakeElasticSearchClient()
+        self.examinee._elastic_client = self.elastic_client
+
+    def test_aggregation_by_stack_signature(self):
+        def call_site_a():
+            self.examinee.record(response())
+
+        def call_site_b():
+            self.examinee.record(response(method='POST'))
+
+        for _ in range(3):
+            call_site_a()
+        call_site_b()
+        self.examinee.flush()
+
+        self.assertEqual(len(self.elastic_client.bodies), 1)
+        lines = self.elastic_client.bodies[0].splitlines()
+        documents = [json.loads(line) for line in lines[1::2]]
+        self.assertEqual(
+            sorted((d['req_method'], d['count']) for d in documents),
+            [('GET', 3), ('POST', 1)],
+        )
+        self.assertTrue(any('call_site_a' in line for line in documents[0]['stacktrace']))
+
+        # nothing left to flush
+        self.examinee.flush()
+        self.assertEqual(len(self.elastic_client.bodies), 1)
+
+    def test_buffer_is_bounded(self):
+        for _ in range(10):
+            self.examinee.record(response())
+        self.examinee.flush()
+
+        documents = [json.loads(line) for line in self.elastic_client.bodies[0].splitlines()[1::2]]
+        self.assertEqual(sum(d['count'] for d in documents), 5)
+
+    def test_sampling(self):
+        self.examinee.sample_rate = 0
+        self.examinee.record(response())
+        self.examinee.flush()
+        self.assertEqual(self.elastic_client.bodies, [])
@@ -0,0 +1,135 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import smtplib
+import time
+import unittest
+
+from mail.delivery import MailDeliveryService
+from mail.template_mailer import create_mail
+
+from fake_smtp import FakeSmtpServer
+
+
+def _mail(idx: int):
+    return create_mail(
+        subject=f'mail {idx}',
+        sender='sender@example.org',
+        recipients=['a@example.org'],
+        text=f'body {idx}',
+    )
+
+
+class MailDeliveryServiceTest(unittest.TestCase):
+    def service(self, server, **kwargs):
+        service = MailDeliveryService(
+            smtp_host='127.0.0.1',
+            smtp_port=server.port,
+            username='user',
+            password='passwd',
+            **kwargs,
+        )
+        self.addCleanup(service.close)
+        return service
+
+    def test_reuses_connection(self):
+        with FakeSmtpServer() as server:
+            examinee = self.service(server)
+            message_count = 1000
+
+            start = time.monotonic()
+            deliveries = [
+                examinee.submit(msg=_mail(i), sender='user', recipients=['a@example.org'])
+                for i in range(message_count)
+            ]
+            for delivery in deliveries:
+                self.assertEqual(delivery.result(timeout=60), {})
+            duration = time.monotonic() - start
+
+            self.assertEqual(len(server.state.messages), message_count)
+            self.assertEqual(server.state.connection_count, 1)
+            self.assertEqual(server.state.login_count, 1)
+            # mails are delivered in order
+            self.assertIn(b'mail 999', server.state.messages[-1][2])
+            # throughput (for information): usually several hundred mails per second
+            self.assertLess(duration, 60)
+
+    def test_reconnects_after_connection_loss(self):
+        with FakeSmtpServer(disconnect_after=3) as server:
+            examinee = self.service(server)
+            deliveries = [
+                examinee.submit(msg=_mail(i), sender='user', recipients=['a@example.org'])
+                for i in range(10)
+            ]
+            for delivery in deliveries:
+                delivery.result(timeout=10)
+
+            self.assertEqual(len(server.state.messages), 10)
+            self.assertEqual(server.state.connection_count, 4)
+
+    def test_rejected_mail(self):
+        with FakeSmtpServer() as server:
+            examinee = self.service(server)
+            rejected = examinee.submit(msg='rejected', sender='user', recipients=['reject@x'])
+            partially_refused = examinee.submit(
+                msg='partially refused',
+                sender='user',
+                recipients=['a@example.org', 'reject@x'],
+            )
+            delivered = examinee.submit(msg='delivered', sender='user', recipients=['b@x'])
+
+            with self.assertRaises(smtplib.SMTPRecipientsRefused):
+                rejected.result(timeout=10)
+            self.assertEqual(list(partially_refused.result(timeout=10)), ['reject@x'])
+            self.assertEqual(delivered.result(timeout=10), {})
+            self.assertEqual(server.state.connection_count, 1)
+
+    def test_unencodable_recipient(self):
+        with FakeSmtpServer() as server:
+            examinee = self.service(server)
+            bad = examinee.submit(msg='bad', sender='user', recipients=['j\u00fcrgen@example.org'])
+            good = examinee.submit(msg='good', sender='user', recipients=['b@example.org'])
+
+            with self.assertRaises(UnicodeEncodeError):
+                bad.result(timeout=10)
+            # worker thread must still deliver subsequent mails
+            self.assertEqual(good.result(timeout=10), {})
+            examinee.flush()
+            self.assertEqual(len(server.state.messages), 1)
+
+    def test_close_delivers_queued_mails(self):
+        with FakeSmtpServer(response_delay_seconds=0.01) as server:
+            examinee = self.service(server, batch_size=5)
+            for i in range(20):
+                examinee.submit(msg=_mail(i), sender='user', recipients=['a@example.org'])
+            examinee.close()
+
+            self.assertEqual(len(server.state.messages), 20)
+            self.assertEqual(examinee.delivered_count, 20)
+
+    def test_connection_failure(self):
+        with FakeSmtpServer() as server:
+            port = server.port
+        examinee = MailDeliveryService(
+            smtp_host='127.0.0.1',
+            smtp_port=port,
+            username='user',
+            password='passwd',
+            max_attempts=2,
+        )
+        self.addCleanup(examinee.close)
+
+        with self.assertRaises(OSError):
+            examinee.submit(msg='mail', sender='user', recipients=['a@x']).result(timeout=10)
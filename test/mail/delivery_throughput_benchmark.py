@@ -0,0 +1,119 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Benchmarks `mail.delivery.MailDeliveryService` against a local `FakeSmtpServer`, comparing
+against opening a new (authenticated) SMTP connection per mail.
+
+usage (from repository root):
+
+    python -m test.mail.delivery_throughput_benchmark --mails 1000 --connect-delay 0.05
+'''
+
+import argparse
+import smtplib
+import time
+
+from mail.delivery import MailDeliveryService
+from mail.template_mailer import create_mail
+
+from fake_smtp import FakeSmtpServer
+
+
+class SlowSMTP(smtplib.SMTP):
+    # simulates network latency of connection establishment (e.g. TCP and TLS handshakes)
+    connect_delay_seconds = 0
+
+    def connect(self, *args, **kwargs):
+        time.sleep(self.connect_delay_seconds)
+        return super().connect(*args, **kwargs)
+
+
+def synthetic_mails(mail_count: int):
+    return [
+        create_mail(
+            subject=f'mail {i}',
+            sender='sender@example.org',
+            recipients=['a@example.org'],
+            text=f'body of mail {i}\n' * 20,
+        ) for i in range(mail_count)
+    ]
+
+
+def send_with_new_connections(port: int, mails):
+    # previous implementation of mailutil._send_mail
+    for mail in mails:
+        smtp = SlowSMTP('127.0.0.1', port)
+        smtp.login(user='user', password='passwd')
+        smtp.sendmail('user', ['a@example.org'], mail.as_string())
+        smtp.quit()
+
+
+def send_with_delivery_service(port: int, mails):
+    service = MailDeliveryService(
+        smtp_host='127.0.0.1',
+        smtp_port=port,
+        username='user',
+        password='passwd',
+    )
+    smtplib_smtp = smtplib.SMTP
+    smtplib.SMTP = SlowSMTP
+    try:
+        deliveries = [
+            service.submit(msg=mail, sender='user', recipients=['a@example.org'])
+            for mail in mails
+        ]
+        submitted = time.monotonic()
+        for delivery in deliveries:
+            delivery.result()
+    finally:
+        service.close()
+        smtplib.SMTP = smtplib_smtp
+    return submitted
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mails', type=int, default=1000)
+    parser.add_argument('--connect-delay', type=float, default=0.0)
+    parsed = parser.parse_args()
+
+    SlowSMTP.connect_delay_seconds = parsed.connect_delay
+    mails = synthetic_mails(parsed.mails)
+
+    with FakeSmtpServer() as server:
+        start = time.monotonic()
+        send_with_new_connections(server.port, mails)
+        duration = time.monotonic() - start
+        print('connection per mail: {d:.2f}s ({r:.0f} mails/s, {c} connections)'.format(
+            d=duration,
+            r=len(mails) / duration,
+            c=server.state.connection_count,
+        ))
+
+    with FakeSmtpServer() as server:
+        start = time.monotonic()
+        submitted = send_with_delivery_service(server.port, mails)
+        duration = time.monotonic() - start
+        print('delivery service:    {d:.2f}s ({r:.0f} mails/s, {c} connections)'.format(
+            d=duration,
+            r=len(mails) / duration,
+            c=server.state.connection_count,
+        ))
+        print('  (callers blocked for {b:.3f}s)'.format(b=submitted - start))
+
+
+if __name__ == '__main__':
+    main()
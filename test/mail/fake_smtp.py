@@ -0,0 +1,118 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+A minimal local SMTP server (EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT), intended
+as a stand-in for offline tests and benchmarks of mail delivery.
+'''
+
+import socketserver
+import threading
+
+
+class FakeSmtpState(object):
+    def __init__(self, disconnect_after: int=0, response_delay_seconds: float=0):
+        # if set, connections are dropped after having received the given number of mails
+        self.disconnect_after = disconnect_after
+        self.response_delay_seconds = response_delay_seconds
+        self.lock = threading.Lock()
+        self.connection_count = 0
+        self.login_count = 0
+        self.messages = [] # (sender, [recipient], data)
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        state = self.server.state
+        with state.lock:
+            state.connection_count += 1
+        received_count = 0
+        sender, recipients = None, []
+
+        self.reply('220 fake-smtp ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb in ('EHLO', 'HELO'):
+                self.wfile.write(b'250-fake-smtp\r\n')
+                self.reply('250 AUTH PLAIN')
+            elif verb == 'AUTH':
+                with state.lock:
+                    state.login_count += 1
+                self.reply('235 authenticated')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip('<> '), []
+                self.reply('250 ok')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip('<> ')
+                if 'reject' in recipient:
+                    self.reply('550 no such user')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 ok')
+            elif verb == 'DATA':
+                self.reply('354 go ahead')
+                data = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if data_line in (b'.\r\n', b''):
+                        break
+                    data.append(data_line)
+                if state.response_delay_seconds:
+                    threading.Event().wait(state.response_delay_seconds)
+                with state.lock:
+                    state.messages.append((sender, recipients, b''.join(data)))
+                self.reply('250 queued')
+                received_count += 1
+                if received_count == state.disconnect_after:
+                    return # drop connection
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 ok')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('502 not implemented')
+
+
+class FakeSmtpServer(socketserver.ThreadingTCPServer):
+    '''
+    context manager running a `FakeSmtpServer` on a random local port in a background thread
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, **state_kwargs):
+        super().__init__(('127.0.0.1', 0), _SmtpHandler)
+        self.state = FakeSmtpState(**state_kwargs)
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -167,6 +167,44 @@ class ProductModelTest(unittest.TestCase):
         self.assertIsNotNone(merged.component(('x/y/lcomp1', '1')))
         self.assertIsNotNone(merged.component(('x/y/rcomp1', '2')))
 
+    def test_component_lookup_reflects_raw_modifications(self):
+        examinee = product.model.Product.from_dict(raw_dict=deepcopy(self.raw_dict))
+        key = ('example.org/foo/first_component', 'first_version')
+        self.assertIsNotNone(examinee.component(key))
+
+        # lookups must still be correct after raw dict was modified in place
+        examinee.raw['components'][0]['version'] = 'changed_version'
+        self.assertIsNone(examinee.component(key))
+        changed_key = ('example.org/foo/first_component', 'changed_version')
+        self.assertIsNotNone(examinee.component(changed_key))
+
+        examinee.raw['components'].append({'name': 'example.org/foo/third', 'version': '3'})
+        self.assertIsNotNone(examinee.component(('example.org/foo/third', '3')))
+
+        examinee.raw['components'] = []
+        self.assertIsNone(examinee.component(('example.org/foo/third', '3')))
+
+    def test_component_lookup_after_list_replacement(self):
+        examinee = product.model.Product.from_dict(raw_dict=deepcopy(self.raw_dict))
+        key = ('example.org/foo/first_component', 'first_version')
+        self.assertIsNotNone(examinee.component(key))
+
+        # replace list with another one of the same length
+        examinee.raw['components'] = [
+            {'name': 'example.org/foo/other', 'version': str(i)}
+            for i in range(len(examinee.raw['components']))
+        ]
+        self.assertIsNone(examinee.component(key))
+        self.assertIsNotNone(examinee.component(('example.org/foo/other', '0')))
+
+    def test_component_wrappers_are_memoised(self):
+        examinee = product.model.Product.from_dict(raw_dict=deepcopy(self.raw_dict))
+        key = ('example.org/foo/first_component', 'first_version')
+
+        self.assertIs(examinee.component(key), examinee.component(key))
+        self.assertIs(examinee.component(key), next(examinee.components()))
+        self.assertIs(examinee.component(key).dependencies(), examinee.component(key).dependencies())
+
 
 class ComponentModelTest(unittest.TestCase, AssertMixin):
     def test_create(self):
@@ -189,6 +227,49 @@ class ComponentModelTest(unittest.TestCase, AssertMixin):
 
         self.assertEqual(tuple(deps.components()), (component_dep,))
 
+        # adding an equal dependency again must be a no-op
+        deps.add_component_dependency(
+            product.model.ComponentReference.create(name='github.com/foo/bar', version='2')
+        )
+        self.assertEqual(tuple(deps.components()), (component_dep,))
+
+    def test_add_dependency_after_in_place_modification(self):
+        examinee = product.model.Component.create(name='github.com/example/name', version='1.2.3')
+        deps = examinee.dependencies()
+        deps.add_component_dependency(
+            product.model.ComponentReference.create(name='github.com/foo/bar', version='1')
+        )
+
+        # the modified entry must no longer be found by its former key
+        deps.raw['components'][0]['version'] = '2'
+        deps.add_component_dependency(
+            product.model.ComponentReference.create(name='github.com/foo/bar', version='1')
+        )
+        self.assertEqual(len(tuple(deps.components())), 2)
+
+        deps.add_component_dependency(
+            product.model.ComponentReference.create(name='github.com/foo/bar', version='2')
+        )
+        self.assertEqual(len(tuple(deps.components())), 2)
+
+    def test_add_container_image_dependencies(self):
+        examinee = product.model.Component.create(name='github.com/example/name', version='1.2.3')
+        deps = examinee.dependencies()
+
+        image = product.model.ContainerImage.create(name='i', version='1', image_reference='r:1')
+        other_image = product.model.ContainerImage.create(
+            name='i',
+            version='1',
+            image_reference='o:1',
+        )
+
+        deps.add_container_image_dependency(image)
+        deps.add_container_image_dependency(image)
+        # container images are only considered equal if all attributes are equal
+        deps.add_container_image_dependency(other_image)
+
+        self.assertEqual(tuple(deps.container_images()), (image, other_image))
+
 
 class ComponentReferenceModelTest(unittest.TestCase):
     def test_component_name_parsing(self):
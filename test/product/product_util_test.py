@@ -13,8 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import unittest
+from unittest import mock
+
 import pytest
+import yaml
 
 import product.util as util
 import product.model as model
@@ -86,3 +90,172 @@ def test_diff_components(cref):
     assert result.names_only_left == {'gh.com/o/c3'}
     assert result.names_only_right == {'gh.com/o/c4'}
     assert result.names_version_changed == {'gh.com/o/c1'}
+
+
+def test_diff_components_without_changes(cref):
+    components = (cref('c1', '1.2.3'), cref('c2', '1.2.3'))
+    assert diff_components(components, reversed(components)) is None
+    assert diff_components(
+        components,
+        (cref('c1', '1.2.3'), cref('c2', '2.0.0')),
+        ignore_component_names=('gh.com/o/c2',),
+    ) is None
+
+
+def test_diff_component_dependencies():
+    left = model.Component.create(name='gh.com/o/c', version='1.0.0')
+    right = model.Component.create(name='gh.com/o/c', version='2.0.0')
+    for component, image_version in ((left, '1.0'), (right, '1.1')):
+        component.dependencies().add_container_image_dependency(
+            model.ContainerImage.create(
+                name='image', version=image_version, image_reference='r:' + image_version,
+            )
+        )
+        component.dependencies().add_web_dependency(
+            model.WebDependency.create(name='web', version='1.0', url='https://x')
+        )
+
+    result = util.diff_component_dependencies(left, right)
+
+    assert set(result.keys()) == {'container_image'}
+    assert result['container_image'].names_version_changed == {'image'}
+
+
+def test_iter_raw_dependency_changes():
+    left = [
+        {'name': 'a', 'version': '1'},
+        {'name': 'b', 'version': '1'},
+        {'name': 'c', 'version': '1'},
+    ]
+    right = [
+        {'name': 'd', 'version': '1'},
+        {'name': 'c', 'version': '1'},
+        {'name': 'a', 'version': '2'},
+    ]
+
+    result = list(util.iter_raw_dependency_changes(left, right, type_name='web'))
+
+    assert result == [
+        util.DependencyChange('web', 'a', left_versions=('1',), right_versions=('2',)),
+        util.DependencyChange('web', 'b', left_versions=('1',), right_versions=()),
+        util.DependencyChange('web', 'd', left_versions=(), right_versions=('1',)),
+    ]
+
+
+def test_iter_raw_component_dependency_changes():
+    left = {'dependencies': {'generic': [{'name': 'g', 'version': '1'}]}}
+    right = {'dependencies': {'generic': [{'name': 'g', 'version': '2'}], 'web': []}}
+
+    result = list(util.iter_raw_component_dependency_changes(left, right))
+
+    assert result == [
+        util.DependencyChange('generic', 'g', left_versions=('1',), right_versions=('2',)),
+    ]
+
+
+class FakeComponentDescriptorResolver(util.ComponentDescriptorResolver):
+    def __init__(self, descriptors, **kwargs):
+        super().__init__(**kwargs)
+        self.descriptors = descriptors
+        self.retrieval_counts = collections.Counter()
+
+    def _retrieve_asset(self, component_reference, asset_label, as_dict=False):
+        key = (component_reference.name(), component_reference.version())
+        self.retrieval_counts[key] += 1
+        if as_dict:
+            return yaml.safe_load(self.descriptors[key])
+        return self.descriptors[key]
+
+
+def _descriptor(name, version, dependencies=()):
+    return yaml.dump({'components': [{
+        'name': name,
+        'version': version,
+        'dependencies': {
+            'components': [
+                {'name': dep_name, 'version': dep_version}
+                for dep_name, dep_version in dependencies
+            ],
+        },
+    }]})
+
+
+@pytest.fixture
+def descriptors():
+    # diamond: c1 -> (c2, c3) -> c4
+    return {
+        ('gh.com/o/c2', '1.0.0'): _descriptor(
+            'gh.com/o/c2', '1.0.0', dependencies=(('gh.com/o/c4', '1.0.0'),),
+        ),
+        ('gh.com/o/c3', '1.0.0'): _descriptor(
+            'gh.com/o/c3', '1.0.0', dependencies=(('gh.com/o/c4', '1.0.0'),),
+        ),
+        ('gh.com/o/c4', '1.0.0'): _descriptor('gh.com/o/c4', '1.0.0'),
+    }
+
+
+def _root_product():
+    return model.Product.from_dict(yaml.safe_load(_descriptor(
+        'gh.com/o/c1',
+        '1.0.0',
+        dependencies=(('gh.com/o/c2', '1.0.0'), ('gh.com/o/c3', '1.0.0')),
+    )))
+
+
+def test_resolve_component_references_transitively(descriptors):
+    resolver = FakeComponentDescriptorResolver(descriptors=descriptors)
+
+    resolved = resolver.resolve_component_references(product=_root_product())
+
+    assert [(c.name(), c.version()) for c in resolved.components()] == [
+        ('gh.com/o/c1', '1.0.0'),
+        ('gh.com/o/c2', '1.0.0'),
+        ('gh.com/o/c3', '1.0.0'),
+        ('gh.com/o/c4', '1.0.0'),
+    ]
+    # each descriptor is retrieved exactly once
+    assert set(resolver.retrieval_counts.values()) == {1}
+
+
+def test_resolve_component_references_uses_cache_dir(descriptors, tmpdir):
+    resolver = FakeComponentDescriptorResolver(descriptors=descriptors, cache_dir=str(tmpdir))
+    resolver.resolve_component_references(product=_root_product())
+    assert len(resolver.retrieval_counts) == 3
+
+    # a new resolver (i.e. a later run) must read all descriptors from the cache
+    resolver = FakeComponentDescriptorResolver(descriptors=descriptors, cache_dir=str(tmpdir))
+    resolved = resolver.resolve_component_references(product=_root_product())
+
+    assert len(list(resolved.components())) == 4
+    assert len(resolver.retrieval_counts) == 0
+
+
+def _product_with_components(names, version='1'):
+    product = model.Product.from_dict({})
+    for name in names:
+        product.add_component(model.Component.create(name='gh.com/o/' + name, version=version))
+    return product
+
+
+def test_disjoint_merge_scales_linearly():
+    key_func_calls = collections.Counter()
+
+    def counting_name_and_version(raw_dict):
+        key_func_calls['count'] += 1
+        return (raw_dict.get('name'), raw_dict.get('version'))
+
+    def key_func_calls_for_merge(component_count):
+        key_func_calls.clear()
+        left = _product_with_components(f'l{i}' for i in range(component_count))
+        right = _product_with_components(f'r{i}' for i in range(component_count))
+        merged = util.merge_products(left, right)
+        assert len(merged.raw['components']) == 2 * component_count
+        return key_func_calls['count']
+
+    with mock.patch.object(model, '_name_and_version', counting_name_and_version):
+        small = key_func_calls_for_merge(500)
+        large = key_func_calls_for_merge(2000)
+
+    # linear growth: four times the components cause about four times the key computations
+    # (quadratic growth would cause 16 times as many)
+    assert large <= 5 * small
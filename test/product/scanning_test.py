@@ -0,0 +1,175 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+from protecode.model import AnalysisResult, Triage, TriageScope
+from product.model import Component, ContainerImage
+from product.scanning import ProtecodeUtil
+
+
+def triage(cve, scope, component='lib', version='1.0'):
+    return {
+        'vuln_id': cve,
+        'component': component,
+        'version': version,
+        'scope': scope.value,
+        'reason': 'FP',
+    }
+
+
+def analysis_result(product_id, triages=()):
+    return AnalysisResult(raw_dict={
+        'product_id': product_id,
+        'components': [{
+            'lib': 'lib',
+            'version': '1.0',
+            'vulns': [
+                {'vuln': {'cve': t['vuln_id'], 'cvss': '5.0'}, 'exact': True, 'triage': [t]}
+                for t in triages
+            ],
+        }],
+    })
+
+
+class FakeProtecodeApi(object):
+    def __init__(self, products=()):
+        self.added_triages = []
+        self.products = list(products)
+        self.deleted_product_ids = []
+        self.lock = threading.Lock()
+
+    def login(self):
+        pass
+
+    def list_apps(self, group_id, custom_attribs=None):
+        return list(self.products)
+
+    def delete_product(self, product_id):
+        with self.lock:
+            self.deleted_product_ids.append(product_id)
+
+    def scan_result(self, product_id):
+        return analysis_result(product_id=product_id)
+
+    def set_product_name(self, product_id, name):
+        pass
+
+    def add_triage(self, triage, scope, product_id=None, group_id=None):
+        with self.lock:
+            self.added_triages.append((triage.vulnerability_id(), scope, product_id, group_id))
+
+
+class TransportTriagesTest(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeProtecodeApi()
+        self.examinee = ProtecodeUtil(protecode_api=self.api, group_id=1)
+        self.addCleanup(self.examinee.close)
+
+    def test_existing_group_triages_are_skipped(self):
+        previous_result = analysis_result(product_id=1, triages=(
+            triage('CVE-1', TriageScope.GROUP),
+            triage('CVE-2', TriageScope.RESULT),
+        ))
+        reference_result = analysis_result(product_id=2, triages=(
+            triage('CVE-1', TriageScope.GROUP),
+            triage('CVE-3', TriageScope.GROUP),
+        ))
+        triages = [
+            Triage(raw_dict=raw)
+            for result in (previous_result, reference_result)
+            for raw in (
+                t for c in result.raw['components'] for v in c['vulns'] for t in v['triage']
+            )
+        ]
+
+        self.examinee._transport_triages(
+            triages=triages,
+            target_result=analysis_result(product_id=3),
+            previous_result=previous_result,
+        )
+
+        self.assertEqual(
+            sorted(self.api.added_triages),
+            [
+                ('CVE-2', TriageScope.RESULT, 3, None),
+                ('CVE-3', TriageScope.GROUP, None, 1),
+            ],
+        )
+
+    def test_all_triages_are_added_without_previous_result(self):
+        triages = [
+            Triage(raw_dict=triage('CVE-1', TriageScope.GROUP)),
+            Triage(raw_dict=triage('CVE-1', TriageScope.GROUP)),
+        ]
+
+        self.examinee._transport_triages(triages=triages, target_result=analysis_result(3))
+
+        self.assertEqual(self.api.added_triages, [('CVE-1', TriageScope.GROUP, None, 1)])
+
+
+class ProtecodeUtilTest(unittest.TestCase):
+    def test_close_stops_executor(self):
+        with ProtecodeUtil(protecode_api=FakeProtecodeApi(), group_id=1) as examinee:
+            examinee._executor.submit(lambda: None).result()
+
+        with self.assertRaises(RuntimeError):
+            examinee._executor.submit(lambda: None)
+
+
+class ProductIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.component = Component.create(name='github.com/o/c', version='1.0')
+        self.image = ContainerImage.create(name='img', version='1.0', image_reference='r/img:1.0')
+        custom_data = {'COMPONENT_NAME': 'github.com/o/c', 'IMAGE_REFERENCE_NAME': 'img'}
+        self.api = FakeProtecodeApi(products=[
+            AnalysisResult(raw_dict={'product_id': i, 'name': 'n', 'custom_data': custom_data})
+            for i in (1, 2)
+        ])
+        self.examinee = ProtecodeUtil(protecode_api=self.api, group_id=1)
+        self.addCleanup(self.examinee.close)
+        self.examinee.prefetch_products()
+
+    def test_duplicates_are_deleted_once(self):
+        for _ in range(2):
+            result = self.examinee.retrieve_scan_result(
+                container_image=self.image,
+                component=self.component,
+            )
+            self.assertEqual(result.product_id(), 1)
+
+        self.assertEqual(self.api.deleted_product_ids, [2])
+
+    def test_index_reflects_uploads_and_deletions(self):
+        self.examinee._add_to_product_index(
+            container_image=self.image,
+            component=self.component,
+            group_id=1,
+            product=analysis_result(product_id=3),
+        )
+        self.assertTrue(self.examinee._remove_from_product_index(
+            container_image=self.image,
+            component=self.component,
+            group_id=1,
+            product_id=1,
+        ))
+
+        existing_products = self.examinee._existing_products(
+            container_image=self.image,
+            component=self.component,
+            group_id=1,
+        )
+        self.assertEqual([p.product_id() for p in existing_products], [2, 3])
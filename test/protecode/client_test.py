@@ -0,0 +1,96 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import protecode.client
+from model.protecode import ProtecodeConfig
+from protecode.model import ProcessingStatus, Triage, TriageScope
+
+from fake_protecode import FakeProtecodeServer
+
+
+@pytest.fixture
+def fake_server():
+    with FakeProtecodeServer(components_per_scan=1, vulnerabilities_per_component=1) as server:
+        yield server
+
+
+@pytest.fixture
+def api(fake_server):
+    protecode_cfg = ProtecodeConfig(
+        name='fake',
+        raw_dict={
+            'api_url': fake_server.base_url(),
+            'tls_verify': False,
+            'credentials': {'username': 'user', 'password': 'passwd'},
+        },
+    )
+    api = protecode.client.from_cfg(protecode_cfg)
+    api.login()
+    return api
+
+
+def test_upload_and_scan_result(api, fake_server):
+    uploaded = api.upload(
+        application_name='image_1.0_component',
+        group_id=5,
+        data=b'image-data',
+        custom_attribs={'COMPONENT_NAME': 'component', 'IMAGE_REFERENCE_NAME': 'image'},
+    )
+
+    result = api.wait_for_scan_result(product_id=uploaded.product_id())
+    assert result.status() is ProcessingStatus.READY
+    assert result.custom_data() == {'COMPONENT_NAME': 'component', 'IMAGE_REFERENCE_NAME': 'image'}
+    assert len(list(result.components())) == 1
+
+    assert fake_server.state.request_counts[('PUT', 'upload')] == 1
+    assert fake_server.state.request_counts[('POST', 'login')] == 1
+
+
+def test_list_apps_by_metadata(api):
+    for name in ('first', 'second'):
+        api.upload(
+            application_name=name,
+            group_id=5,
+            data=b'',
+            custom_attribs={'IMAGE_REFERENCE_NAME': name},
+        )
+
+    assert len(api.list_apps(group_id=5)) == 2
+    assert len(api.list_apps(group_id=6)) == 0
+
+    matching = api.list_apps(group_id=5, custom_attribs={'IMAGE_REFERENCE_NAME': 'second'})
+    assert [p.name() for p in matching] == ['second']
+
+
+def test_triages_are_reported_on_product(api):
+    product_id = api.upload(application_name='image', group_id=5, data=b'').product_id()
+    vulnerability = next(next(api.scan_result(product_id).components()).vulnerabilities())
+
+    api.add_triage(
+        triage=Triage(raw_dict={
+            'vuln_id': vulnerability.cve(),
+            'component': 'lib-0',
+            'version': '1.0',
+            'scope': TriageScope.RESULT.value,
+            'reason': 'FP',
+            'description': 'not affected',
+        }),
+        product_id=product_id,
+    )
+
+    vulnerability = next(next(api.scan_result(product_id).components()).vulnerabilities())
+    assert vulnerability.has_triage()
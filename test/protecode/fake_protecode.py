@@ -0,0 +1,319 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+A local stand-in for the subset of the Protecode HTTP API used by `protecode.client.ProtecodeApi`.
+
+Intended for offline tests and benchmarks. Scans are simulated: an uploaded (or rescanned)
+product is reported as busy for a configurable duration and then as ready (or failed).
+'''
+
+import collections
+import http.server
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+
+class FakeProtecodeState(object):
+    def __init__(
+        self,
+        scan_duration_seconds: float=0,
+        scan_failure_rate: float=0,
+        http_error_rate: float=0,
+        components_per_scan: int=2,
+        vulnerabilities_per_component: int=2,
+        seed: int=0,
+    ):
+        self.scan_duration_seconds = scan_duration_seconds
+        self.scan_failure_rate = scan_failure_rate
+        self.http_error_rate = http_error_rate
+        self.components_per_scan = components_per_scan
+        self.vulnerabilities_per_component = vulnerabilities_per_component
+
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.product_ids = itertools.count(1)
+        self.products = {} # product_id: dict
+        self.triages = [] # list of dicts (as sent by clients)
+        self.request_counts = collections.Counter() # (method, route): count
+
+    def count_request(self, method, route):
+        with self.lock:
+            self.request_counts[(method, route)] += 1
+            return self.random.random() < self.http_error_rate
+
+    def create_product(self, name, group_id, custom_data):
+        with self.lock:
+            product_id = next(self.product_ids)
+            self.products[product_id] = {
+                'product_id': product_id,
+                'name': name,
+                'filename': name,
+                'group_id': group_id,
+                'custom_data': custom_data,
+                'scan_started': time.monotonic(),
+                'fails': self.random.random() < self.scan_failure_rate,
+            }
+            return self.products[product_id]
+
+    def status(self, product):
+        if time.monotonic() - product['scan_started'] < self.scan_duration_seconds:
+            return 'B'
+        return 'F' if product['fails'] else 'R'
+
+    def product_summary(self, product):
+        return {
+            'product_id': product['product_id'],
+            'name': product['name'],
+            'filename': product['filename'],
+            'custom_data': product['custom_data'],
+            'status': self.status(product),
+        }
+
+    def product_details(self, product):
+        result = self.product_summary(product)
+        if result['status'] != 'R':
+            return result
+
+        triaged = {
+            (t['component'], t['version'], vuln_id): t
+            for t in self.triages
+            if t.get('product_id') == product['product_id']
+            or t.get('group_id') == product['group_id']
+            for vuln_id in t['vulns']
+        }
+
+        def vulnerability(component_name, cve):
+            triage = triaged.get((component_name, '1.0', cve))
+            return {
+                'vuln': {'cve': cve, 'cvss': str(self.random.choice((4.3, 5.0, 7.5, 9.8)))},
+                'exact': True,
+                'triage': [{
+                    'vuln_id': cve,
+                    'component': component_name,
+                    'version': '1.0',
+                    'scope': triage['scope'],
+                    'reason': triage['reason'],
+                    'description': triage['description'],
+                }] if triage else None,
+            }
+
+        result['components'] = [
+            {
+                'lib': f'lib-{c}',
+                'version': '1.0',
+                'license': {'name': 'MIT', 'type': 'permissive', 'url': 'https://example.org'},
+                'vulns': [
+                    vulnerability(f'lib-{c}', f'CVE-2019-{c:03}{v:03}')
+                    for v in range(self.vulnerabilities_per_component)
+                ],
+            }
+            for c in range(self.components_per_scan)
+        ]
+        return result
+
+
+def _custom_data_from_headers(headers):
+    # protecode implicitly converts dashes to underscores
+    return {
+        name[len('META-'):].replace('-', '_'): value
+        for name, value in headers.items()
+        if name.upper().startswith('META-')
+    }
+
+
+class FakeProtecodeRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    routes = (
+        ('GET', 'apps', re.compile(r'/api/apps/(?P<group_id>\d+)/?')),
+        ('PUT', 'upload', re.compile(r'/api/upload/(?P<name>[^/]+)')),
+        ('GET', 'product', re.compile(r'/api/product/(?P<product_id>\d+)/?')),
+        ('DELETE', 'product', re.compile(r'/api/product/(?P<product_id>\d+)/?')),
+        ('POST', 'custom-data', re.compile(r'/api/product/(?P<product_id>\d+)/custom-data/?')),
+        ('POST', 'rescan', re.compile(r'/api/product/(?P<product_id>\d+)/rescan/?')),
+        ('PUT', 'triage', re.compile(r'/api/triage/vulnerability/?')),
+        ('GET', 'scans', re.compile(r'/rest/scans/(?P<product_id>\d+)/?')),
+        ('PATCH', 'scans', re.compile(r'/rest/scans/(?P<product_id>\d+)/?')),
+        ('POST', 'login', re.compile(r'/login/?')),
+        ('GET', 'index', re.compile(r'/?')),
+    )
+
+    def log_message(self, *args):
+        pass # keep benchmark and test output clean
+
+    @property
+    def state(self) -> FakeProtecodeState:
+        return self.server.state
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            return self.rfile.read(length)
+        return b''
+
+    def _respond(self, status=200, body=None, headers=()):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self):
+        parsed = urllib.parse.urlparse(self.path)
+        body = self._body()
+        for method, route, pattern in self.routes:
+            if method != self.command:
+                continue
+            match = pattern.fullmatch(parsed.path)
+            if not match:
+                continue
+            if self.state.count_request(method, route):
+                return self._respond(status=503, body={'error': 'injected failure'})
+            handler = getattr(self, '_' + route.replace('-', '_'))
+            return handler(body=body, query=urllib.parse.parse_qs(parsed.query), **match.groupdict())
+        self._respond(status=404, body={'error': 'not found'})
+
+    do_GET = do_PUT = do_POST = do_PATCH = do_DELETE = _dispatch
+
+    def _product_or_404(self, product_id):
+        product = self.state.products.get(int(product_id))
+        if not product:
+            self._respond(status=404, body={'error': 'no such product'})
+        return product
+
+    def _login(self, body, query):
+        self._respond(
+            status=302,
+            headers=(
+                ('Location', '/'),
+                ('Set-Cookie', 'sessionid=fake-session; Path=/'),
+                ('Set-Cookie', 'csrftoken=fake-csrf-token; Path=/'),
+            ),
+        )
+
+    def _index(self, body, query):
+        self._respond(body={})
+
+    def _apps(self, body, query, group_id):
+        query_attribs = dict(
+            token[len('meta:'):].split('=', 1)
+            for token in ' '.join(query.get('q', ())).split()
+            if token.startswith('meta:')
+        )
+        with self.state.lock:
+            products = [
+                self.state.product_summary(p) for p in self.state.products.values()
+                if p['group_id'] == int(group_id)
+                and all(p['custom_data'].get(k) == v for k, v in query_attribs.items())
+            ]
+        self._respond(body={'products': products})
+
+    def _upload(self, body, query, name):
+        product = self.state.create_product(
+            name=urllib.parse.unquote_plus(name),
+            group_id=int(self.headers['Group']),
+            custom_data=_custom_data_from_headers(self.headers),
+        )
+        self._respond(body={'results': self.state.product_summary(product)})
+
+    def _product(self, body, query, product_id):
+        product = self._product_or_404(product_id)
+        if not product:
+            return
+        if self.command == 'DELETE':
+            with self.state.lock:
+                del self.state.products[product['product_id']]
+            return self._respond(status=204)
+        with self.state.lock:
+            details = self.state.product_details(product)
+        self._respond(body={'results': details})
+
+    def _custom_data(self, body, query, product_id):
+        product = self._product_or_404(product_id)
+        if not product:
+            return
+        product['custom_data'].update(_custom_data_from_headers(self.headers))
+        self._respond(body={'custom_data': product['custom_data']})
+
+    def _rescan(self, body, query, product_id):
+        product = self._product_or_404(product_id)
+        if not product:
+            return
+        product['scan_started'] = time.monotonic()
+        self._respond(body={})
+
+    def _triage(self, body, query):
+        triage = json.loads(body)
+        with self.state.lock:
+            self.state.triages.append(triage)
+        self._respond(body={'triage': triage})
+
+    def _scans(self, body, query, product_id):
+        product = self._product_or_404(product_id)
+        if not product:
+            return
+        if self.command == 'PATCH':
+            product['name'] = json.loads(body)['name']
+        self._respond(body={
+            'name': product['name'],
+            'is_stale': False,
+            'has_binary': True,
+        })
+
+
+class FakeProtecodeServer(object):
+    '''
+    runs a `FakeProtecodeRequestHandler` on a random local port in a background thread.
+    Can be used as a context manager.
+    '''
+    def __init__(self, **state_kwargs):
+        self.state = FakeProtecodeState(**state_kwargs)
+        self._server = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0),
+            FakeProtecodeRequestHandler,
+        )
+        self._server.daemon_threads = True
+        self._server.state = self.state
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={'poll_interval': 0.05},
+            daemon=True,
+        )
+
+    def base_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
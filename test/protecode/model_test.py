@@ -0,0 +1,119 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import json
+import itertools
+import unittest
+
+from protecode.model import (
+    AnalysisResult,
+    License,
+    highest_major_cve_severity,
+)
+
+
+def vulnerability(cve, cvss, exact=True, triage=None):
+    return {
+        'vuln': {'cve': cve, 'cvss': cvss},
+        'exact': exact,
+        'triage': triage,
+    }
+
+
+class VulnerabilityTableTest(unittest.TestCase):
+    def setUp(self):
+        self.license = {'name': 'MIT', 'type': 'permissive', 'url': 'https://example.org'}
+        self.analysis_result = AnalysisResult(raw_dict={
+            'product_id': 42,
+            'filename': 'example',
+            'components': [
+                {
+                    'lib': 'first',
+                    'version': '1.0',
+                    'license': self.license,
+                    'vulns': [
+                        vulnerability('CVE-1', '9.8', exact=False), # historical
+                        vulnerability('CVE-2', '8.1', triage=[{'vuln_id': 'CVE-2'}]),
+                        vulnerability('CVE-3', '5.0'),
+                    ],
+                },
+                {
+                    'lib': 'second',
+                    'version': '2.0',
+                    'license': None,
+                    'vulns': [
+                        vulnerability('CVE-4', None),
+                    ],
+                },
+            ],
+        })
+        self.examinee = self.analysis_result.vulnerability_table()
+
+    def test_table_is_memoised(self):
+        self.assertIs(self.examinee, self.analysis_result.vulnerability_table())
+
+    def test_columns(self):
+        self.assertEqual(len(self.examinee), 4)
+        self.assertEqual(list(self.examinee.component_indices), [0, 0, 0, 1])
+        self.assertEqual(list(self.examinee.severities), [9, 8, 5, -1])
+        self.assertEqual(list(self.examinee.historical), [1, 0, 0, 0])
+        self.assertEqual(list(self.examinee.triaged), [0, 1, 0, 0])
+
+    def test_greatest_severity(self):
+        self.assertEqual(self.examinee.greatest_severity(), 5)
+        self.assertEqual(self.examinee.greatest_severity(ignore_triaged=False), 8)
+        self.assertEqual(
+            self.examinee.greatest_severity(ignore_historical=False, ignore_triaged=False),
+            9,
+        )
+
+    def test_component_greatest_severities(self):
+        self.assertEqual(list(self.examinee.component_greatest_severities()), [5, -1])
+        self.assertEqual(
+            list(self.examinee.component_greatest_severities(ignore_historical=False)),
+            [9, -1],
+        )
+        for ignore_historical, ignore_triaged in itertools.product((False, True), repeat=2):
+            self.assertEqual(
+                self.examinee.greatest_severity(ignore_historical, ignore_triaged),
+                max(self.examinee.component_greatest_severities(
+                    ignore_historical, ignore_triaged,
+                )),
+            )
+
+    def test_greatest_severity_matches_wrapper_based_calculation(self):
+        vulnerabilities = [
+            v for c in self.analysis_result.components() for v in c.vulnerabilities()
+            if not v.historical() and not v.has_triage()
+        ]
+        self.assertEqual(
+            self.examinee.greatest_severity(),
+            highest_major_cve_severity(vulnerabilities),
+        )
+
+    def test_licenses(self):
+        self.assertEqual(self.examinee.licenses(), {License(raw_dict=self.license)})
+
+    def test_rows(self):
+        rows = list(self.examinee.rows())
+        self.assertEqual(rows[1], ('first', '1.0', 'MIT', 'CVE-2', 8, False, True))
+        self.assertEqual(rows[3], ('second', '2.0', None, 'CVE-4', -1, False, False))
+        json.dump(rows, io.StringIO()) # rows must be serialisable
+
+    def test_empty_result(self):
+        examinee = AnalysisResult(raw_dict={'product_id': 1}).vulnerability_table()
+        self.assertFalse(examinee.has_components())
+        self.assertEqual(examinee.greatest_severity(), -1)
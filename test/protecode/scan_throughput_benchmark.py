@@ -0,0 +1,137 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+'''
+Benchmarks `protecode.util.upload_images` against a local `FakeProtecodeServer`, using a
+synthetic product descriptor. Container images are not retrieved from a registry, but
+replaced with a small synthetic payload.
+
+usage (from repository root):
+
+    python -m test.protecode.scan_throughput_benchmark --components 10 --images 20
+'''
+
+import argparse
+import contextlib
+import io
+import resource
+import time
+import tracemalloc
+
+import product.scanning
+import protecode.util
+from model.protecode import ProtecodeConfig
+from product.model import Component, ContainerImage, Product
+
+from fake_protecode import FakeProtecodeServer
+
+
+def synthetic_product(component_count: int, image_count: int) -> Product:
+    product = Product()
+    for c in range(component_count):
+        component = Component.create(name=f'example.org/bench/component-{c}', version='1.0.0')
+        dependencies = component.dependencies()
+        for i in range(image_count):
+            dependencies.add_container_image_dependency(
+                ContainerImage.create(
+                    name=f'image-{i}',
+                    version='1.0.0',
+                    image_reference=f'registry.example.org/bench/c{c}/image-{i}:1.0.0',
+                )
+            )
+        product.add_component(component)
+    return product
+
+
+def _retrieve_synthetic_image(image_size_bytes):
+    def retrieve_container_image(image_reference, outfileobj):
+        outfileobj.write(b'\0' * image_size_bytes)
+        outfileobj.flush()
+        outfileobj.seek(0)
+        return outfileobj
+    return retrieve_container_image
+
+
+def run_benchmark(
+    component_count: int,
+    image_count: int,
+    parallel_jobs: int,
+    scan_duration_seconds: float,
+    scan_failure_rate: float,
+    image_size_bytes: int,
+):
+    product.scanning.retrieve_container_image = _retrieve_synthetic_image(image_size_bytes)
+    descriptor = synthetic_product(component_count=component_count, image_count=image_count)
+
+    with FakeProtecodeServer(
+        scan_duration_seconds=scan_duration_seconds,
+        scan_failure_rate=scan_failure_rate,
+    ) as server:
+        protecode_cfg = ProtecodeConfig(
+            name='fake',
+            raw_dict={
+                'api_url': server.base_url(),
+                'tls_verify': False,
+                'credentials': {'username': 'bench', 'password': 'bench'},
+            },
+        )
+
+        tracemalloc.start()
+        start = time.monotonic()
+        with contextlib.redirect_stdout(io.StringIO()):
+            protecode.util.upload_images(
+                protecode_cfg=protecode_cfg,
+                product_descriptor=descriptor,
+                parallel_jobs=parallel_jobs,
+                min_polling_interval_seconds=min(1, scan_duration_seconds or 1),
+                max_polling_interval_seconds=max(1, scan_duration_seconds),
+            )
+        wall_time = time.monotonic() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        request_counts = dict(server.state.request_counts)
+
+    print(f'images:            {component_count * image_count}')
+    print(f'wall time:         {wall_time:.2f}s')
+    print(f'peak memory:       {peak_memory / 1024 / 1024:.1f} MiB (traced)')
+    print(f'max RSS:           {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB')
+    print(f'requests (total):  {sum(request_counts.values())}')
+    for (method, route), count in sorted(request_counts.items()):
+        print(f'  {method:6} {route:12} {count}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--components', type=int, default=10)
+    parser.add_argument('--images', type=int, default=10, help='images per component')
+    parser.add_argument('--parallel-jobs', type=int, default=8)
+    parser.add_argument('--scan-duration', type=float, default=2)
+    parser.add_argument('--scan-failure-rate', type=float, default=0)
+    parser.add_argument('--image-size', type=int, default=1024, help='bytes per image')
+    args = parser.parse_args()
+
+    run_benchmark(
+        component_count=args.components,
+        image_count=args.images,
+        parallel_jobs=args.parallel_jobs,
+        scan_duration_seconds=args.scan_duration,
+        scan_failure_rate=args.scan_failure_rate,
+        image_size_bytes=args.image_size,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# Copyright (c) 2019 SAP SE or an SAP affiliate company. All rights reserved. This file is licensed
+# under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import types
+import unittest
+
+import slack.util
+from slack.util import SlackChannelQueues, SlackHelper
+
+
+class FakeSlackClient(object):
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def api_call(self, method, timeout=None, **kwargs):
+        with self.lock:
+            self.calls.append((method, kwargs))
+            if self.results:
+                return self.results.pop(0)
+        return {'ok': True}
+
+
+class FakeSlackHelper(SlackHelper):
+    def __init__(self, client, **kwargs):
+        super().__init__(slack_cfg=None, **kwargs)
+        self.client = client
+        self.sleeps = []
+
+    def _client(self):
+        return self.client
+
+    def _sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+class SlackHelperTest(unittest.TestCase):
+    def test_retry_when_rate_limited(self):
+        client = FakeSlackClient(results=[
+            {'ok': False, 'error': 'ratelimited', 'headers': {'Retry-After': '7'}},
+            {'ok': False, 'error': 'ratelimited', 'headers': {}},
+        ])
+        examinee = FakeSlackHelper(client)
+
+        examinee.post_to_slack(channel='c1', title='title', message='message')
+
+        self.assertEqual(examinee.sleeps, [7.0, 2])
+        self.assertEqual(len(client.calls), 3)
+        method, kwargs = client.calls[-1]
+        self.assertEqual(method, 'files.upload')
+        self.assertEqual(kwargs['channels'], 'c1')
+        self.assertEqual(kwargs['file'], ('title', 'message'))
+
+    def test_give_up(self):
+        client = FakeSlackClient(results=[{'ok': False, 'error': 'channel_not_found'}])
+        examinee = FakeSlackHelper(client)
+        with self.assertRaisesRegex(RuntimeError, 'channel_not_found'):
+            examinee.post_to_slack(channel='c1', title='title', message='message')
+        self.assertEqual(examinee.sleeps, [])
+
+        client = FakeSlackClient(results=[{'ok': False, 'error': 'ratelimited'}] * 3)
+        examinee = FakeSlackHelper(client, max_attempts=3)
+        with self.assertRaisesRegex(RuntimeError, 'ratelimited'):
+            examinee.post_to_slack(channel='c1', title='title', message='message')
+        self.assertEqual(len(client.calls), 3)
+
+    def test_post_to_channels(self):
+        client = FakeSlackClient()
+        FakeSlackHelper(client).post_to_channels(channels=['c1', 'c2'], title='t', message='m')
+        self.assertEqual(len(client.calls), 1)
+        self.assertEqual(client.calls[0][1]['channels'], 'c1,c2')
+
+    def test_pooled_slack_request(self):
+        examinee = slack.util._PooledSlackRequest()
+        posted = []
+        examinee.session = types.SimpleNamespace(
+            post=lambda url, **kwargs: posted.append((url, kwargs)),
+        )
+
+        examinee.do(
+            'token',
+            'files.upload',
+            {'channels': ['c1', 'c2'], 'file': ('t', 'm'), 'attachments': [{'a': 1}]},
+        )
+
+        url, kwargs = posted[0]
+        self.assertEqual(url, 'https://slack.com/api/files.upload')
+        self.assertEqual(kwargs['headers']['Authorization'], 'Bearer token')
+        self.assertEqual(kwargs['files'], {'file': ('t', 'm')})
+        self.assertEqual(kwargs['data'], {'channels': 'c1,c2', 'attachments': '[{"a": 1}]'})
+
+
+class SlackChannelQueuesTest(unittest.TestCase):
+    def test_post_queued(self):
+        client = FakeSlackClient()
+        helper = FakeSlackHelper(client)
+        examinee = SlackChannelQueues(slack_helper=helper, min_interval_seconds=60)
+        self.addCleanup(examinee.close)
+
+        futures = [
+            examinee.submit(channel=f'c{i % 2}', title=f'title {i}', message='m')
+            for i in range(6)
+        ]
+        futures.append(examinee.submit_to_channels(channels=['c1', 'c2'], title='all', message='m'))
+        examinee.flush()
+
+        for future in futures:
+            self.assertTrue(future.result()['ok'])
+
+        def titles(channels):
+            return [k['title'] for _, k in client.calls if k['channels'] == channels]
+
+        # messages to the same channel are posted in order
+        self.assertEqual(titles('c0'), ['title 0', 'title 2', 'title 4'])
+        self.assertEqual(titles('c1'), ['title 1', 'title 3', 'title 5'])
+        self.assertEqual(titles('c1,c2'), ['all'])
+        # ... respecting the minimum interval between posts (after the first post per channel)
+        self.assertEqual(len(helper.sleeps), 5)
+        self.assertTrue(all(55 < s <= 60 for s in helper.sleeps))
+
+    def test_failing_post(self):
+        client = FakeSlackClient(results=[{'ok': False, 'error': 'not_in_channel'}])
+        examinee = SlackChannelQueues(slack_helper=FakeSlackHelper(client))
+        self.addCleanup(examinee.close)
+
+        with self.assertRaisesRegex(RuntimeError, 'not_in_channel'):
+            examinee.submit(channel='c', title='t', message='m').result(timeout=10)
@@ -123,3 +123,27 @@ class UtilTest(unittest.TestCase):
             merged,
             {1: [3, 1, 0, 2, 4]},
         )
+
+    def test_ttl_cache(self):
+        now = [0]
+        cache = examinee.TTLCache(ttl_seconds=10, clock=lambda: now[0])
+
+        self.assertEqual(cache.get_or_compute('k', lambda: 'v1'), 'v1')
+        now[0] = 9
+        self.assertEqual(cache.get_or_compute('k', lambda: 'v2'), 'v1')
+        now[0] = 10 # expired
+        self.assertIsNone(cache.get('k'))
+        self.assertEqual(cache.get_or_compute('k', lambda: 'v3'), 'v3')
+
+        cache.invalidate('k')
+        self.assertEqual(cache.get('k', default='default'), 'default')
+
+        cache.put('a', 'va')
+        cache.put('b', 'vb', ttl_seconds=2)
+        now[0] = 11
+        self.assertEqual(sorted(cache.items()), [('a', 9, 'va'), ('b', 1, 'vb')])
+        now[0] = 12
+        self.assertEqual(cache.items(), [('a', 8, 'va')])
+
+        cache.get_or_compute('c', lambda: 'vc', ttl_seconds=100)
+        self.assertIn(('c', 100, 'vc'), cache.items())
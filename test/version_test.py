@@ -213,3 +213,55 @@ class Version_process_version_Test(unittest.TestCase):
     def test_bump_patch(self):
         parsed = examinee.process_version(version_str='2.4.6', operation='bump_patch')
         self.assertEqual(parsed, '2.4.7')
+
+
+class VersionIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.examinee = examinee.VersionIndex(
+            versions=('1.2.3', '0.1.0', '2.0.0-rc1', '1.10.0', '2.0.0', '3.0.0-dev'),
+        )
+
+    def test_versions_are_sorted(self):
+        self.assertEqual(
+            [str(v) for v in self.examinee.versions()],
+            ['0.1.0', '1.2.3', '1.10.0', '2.0.0-rc1', '2.0.0', '3.0.0-dev'],
+        )
+
+    def test_latest(self):
+        self.assertEqual(str(self.examinee.latest()), '3.0.0-dev')
+        self.assertIsNone(self.examinee.latest(name='unknown'))
+
+    def test_greatest_before(self):
+        self.assertEqual(str(self.examinee.greatest_before('2.0.0')), '2.0.0-rc1')
+        self.assertEqual(str(self.examinee.greatest_before('1.10.0')), '1.2.3')
+        self.assertEqual(str(self.examinee.greatest_before('1.5.0')), '1.2.3')
+        self.assertIsNone(self.examinee.greatest_before('0.1.0'))
+
+    def test_latest_with_matching_major(self):
+        latest = self.examinee.latest_with_matching_major
+        # pre-release of next major version must be ignored
+        self.assertEqual(str(latest('1.0.0')), '1.10.0')
+        self.assertEqual(str(latest('2.0.0-rc1')), '2.0.0')
+        self.assertIsNone(latest('1.10.0'))
+        self.assertIsNone(latest('5.0.0'))
+
+        # must agree with linear implementation
+        versions = self.examinee.versions()
+        for reference in ('0.0.1', '1.2.3', '1.2.4', '2.0.0-alpha', '3.0.0-a', '4.0.0'):
+            self.assertEqual(
+                latest(reference),
+                examinee.find_latest_version_with_matching_major(
+                    semver.parse_version_info(reference),
+                    versions,
+                ),
+            )
+
+    def test_values(self):
+        index = examinee.VersionIndex()
+        index.add(name='a', version='1.0.0', value='first')
+        index.add(name='a', version='2.0.0', value='second')
+        index.add(name='b', version='0.0.1', value='other')
+
+        self.assertEqual(index.latest(name='a'), 'second')
+        self.assertEqual(index.greatest_before('2.0.0', name='a'), 'first')
+        self.assertEqual(set(index.names()), {'a', 'b'})
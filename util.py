@@ -17,6 +17,8 @@ import os
 import pathlib
 import shutil
 import sys
+import threading
+import time
 import yaml
 
 import termcolor
@@ -343,3 +345,71 @@ class FluentIterable(object):
 
     def as_list(self):
         return list(self.as_generator())
+
+
+class TTLCache(object):
+    '''
+    a thread-safe cache whose entries expire `ttl_seconds` after they were stored.
+
+    Example:
+        cache = TTLCache(ttl_seconds=600)
+        value = cache.get_or_compute(key, lambda: expensive_computation(key))
+    '''
+    _MISSING = object()
+
+    def __init__(self, ttl_seconds: float, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = {} # key: (expiry, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expiry, value = entry
+            if expiry <= self._clock():
+                del self._entries[key]
+                return default
+            return value
+
+    def put(self, key, value, ttl_seconds: float=None):
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_seconds
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl_seconds, value)
+
+    def items(self):
+        '''
+        returns a list of (key, remaining seconds to live, value) for all unexpired entries
+        '''
+        with self._lock:
+            now = self._clock()
+            return [
+                (key, expiry - now, value)
+                for key, (expiry, value) in self._entries.items()
+                if expiry > now
+            ]
+
+    def get_or_compute(self, key, compute_func, ttl_seconds: float=None):
+        '''
+        returns the cached value for the given key; if absent (or expired), the value is
+        computed by calling `compute_func` (w/o arguments) and stored (for `ttl_seconds`, if
+        given, instead of the cache's default).
+        '''
+        value = self.get(key, default=self._MISSING)
+        if value is self._MISSING:
+            value = compute_func()
+            self.put(key, value, ttl_seconds=ttl_seconds)
+        return value
+
+    def invalidate(self, key=None):
+        '''
+        removes the entry for the given key (or all entries if no key is given)
+        '''
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
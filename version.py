@@ -13,6 +13,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import bisect
+import collections
 import os
 import semver
 import sys
@@ -117,3 +119,82 @@ def find_latest_version_with_matching_major(reference_version: semver.VersionInf
             if not latest_candidate or latest_candidate < candidate:
                 latest_candidate = candidate
     return latest_candidate
+
+
+def _parse_version(version):
+    if isinstance(version, semver.VersionInfo):
+        return version
+    return semver.parse_version_info(version)
+
+
+class VersionIndex(object):
+    '''
+    an index of semver versions, grouped by name. The versions of each name are kept in
+    ascending order, so lookups are done using binary search.
+
+    Each version may be associated with a value (e.g. the object the version was read from),
+    which is returned from lookups instead of the version itself. If no value is given, the
+    (parsed) version is used. Indices containing versions of only one "thing" (e.g. the
+    releases of a repository) may omit the name.
+    '''
+    def __init__(self, versions=(), name=None):
+        self._versions = collections.defaultdict(list) # name: [semver.VersionInfo]
+        self._values = collections.defaultdict(list) # name: [value]
+        for version in versions:
+            self.add(version=version, name=name)
+
+    def add(self, version, name=None, value=None):
+        version = _parse_version(version)
+        if value is None:
+            value = version
+
+        versions = self._versions[name]
+        # insert after equal versions (last added wins in lookups)
+        idx = bisect.bisect_right(versions, version)
+        versions.insert(idx, version)
+        self._values[name].insert(idx, value)
+
+    def names(self):
+        return self._versions.keys()
+
+    def versions(self, name=None):
+        '''
+        returns the versions of the given name in ascending order
+        '''
+        return list(self._versions.get(name, ()))
+
+    def latest(self, name=None):
+        values = self._values.get(name)
+        if not values:
+            return None
+        return values[-1]
+
+    def greatest_before(self, version, name=None):
+        '''
+        returns the greatest version less than the given version (or `None`)
+        '''
+        versions = self._versions.get(name, ())
+        idx = bisect.bisect_left(versions, _parse_version(version))
+        if idx == 0:
+            return None
+        return self._values[name][idx - 1]
+
+    def latest_with_matching_major(self, reference_version, name=None):
+        '''
+        returns the greatest version greater than the given reference version that has the
+        same major version (or `None`). Semantics match `find_latest_version_with_matching_major`.
+        '''
+        reference_version = _parse_version(reference_version)
+        versions = self._versions.get(name, ())
+
+        next_major = semver.VersionInfo(reference_version.major + 1, 0, 0)
+        idx = bisect.bisect_left(versions, next_major)
+        # skip pre-releases of the next major version (they sort before it)
+        while idx > 0 and versions[idx - 1].major > reference_version.major:
+            idx -= 1
+        if idx == 0:
+            return None
+        candidate = versions[idx - 1]
+        if candidate.major != reference_version.major or not candidate > reference_version:
+            return None
+        return self._values[name][idx - 1]